@@ -0,0 +1,43 @@
+"""webhook payload archive
+
+Revision ID: a4c6e8a0b2d3
+Revises: f3b5d7f9a1c2
+Create Date: 2026-10-18 20:00:00.000000
+
+New webhook events reference a gzip-compressed, content-addressed payload instead of
+carrying the JSON text. Existing events keep their text payload until they are pruned.
+Downgrading drops the archived payloads.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "a4c6e8a0b2d3"
+down_revision: Union[str, Sequence[str], None] = "f3b5d7f9a1c2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "garmin_webhook_payloads",
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column("encoding", sa.String(), nullable=False),
+        sa.Column("body", sa.LargeBinary(), nullable=False),
+        sa.Column("size_bytes", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("content_hash"),
+    )
+    op.add_column("garmin_webhook_events", sa.Column("payload_hash", sa.String(length=64), nullable=True))
+    op.create_index("ix_garmin_webhook_events_payload_hash", "garmin_webhook_events", ["payload_hash"])
+    op.alter_column("garmin_webhook_events", "payload", existing_type=sa.Text(), nullable=True)
+
+
+def downgrade() -> None:
+    op.execute("UPDATE garmin_webhook_events SET payload = '{}' WHERE payload IS NULL")
+    op.alter_column("garmin_webhook_events", "payload", existing_type=sa.Text(), nullable=False)
+    op.drop_index("ix_garmin_webhook_events_payload_hash", table_name="garmin_webhook_events")
+    op.drop_column("garmin_webhook_events", "payload_hash")
+    op.drop_table("garmin_webhook_payloads")
@@ -0,0 +1,87 @@
+"""garmin health hypertable
+
+Revision ID: a8c0e2f4b6d7
+Revises: f7b9d1e3a5c6
+Create Date: 2026-10-18 14:00:00.000000
+
+Timescale requires every unique index of a hypertable to include the partitioning
+column, so the summary_id uniqueness becomes (summary_id, start_time) everywhere and
+the primary key becomes (id, start_time) where the hypertable is created. On plain
+Postgres without the timescaledb extension only the unique key changes.
+
+Compression uses TIMESCALE_COMPRESS_AFTER_DAYS (default 30) and the chunk interval
+TIMESCALE_CHUNK_INTERVAL_DAYS (default 7). Upserts into compressed chunks need
+TimescaleDB >= 2.11.
+
+garmin_activity_auxiliary_data (activityDetails samples) stays a plain table: its
+start_time is nullable and its upsert key (summary_type, summary_id) has no time
+column, and at about one row per activity there is little to prune.
+
+Offline (`alembic upgrade --sql`) the extension cannot be probed; set
+TIMESCALE_ENABLED=1 to emit the hypertable statements into the script.
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision: str = "a8c0e2f4b6d7"
+down_revision: Union[str, Sequence[str], None] = "f7b9d1e3a5c6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _timescale_available() -> bool:
+    if context.is_offline_mode():
+        return (
+            context.get_context().dialect.name == "postgresql"
+            and os.getenv("TIMESCALE_ENABLED", "").lower() in {"1", "true", "yes"}
+        )
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return False
+    return bind.execute(
+        sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'timescaledb'")
+    ).first() is not None
+
+
+def upgrade() -> None:
+    op.drop_constraint("garmin_health_data_summary_id_key", "garmin_health_data", type_="unique")
+    op.create_unique_constraint(
+        "uq_garmin_health_data_summary_start", "garmin_health_data", ["summary_id", "start_time"]
+    )
+
+    if not _timescale_available():
+        return
+
+    compress_after_days = int(os.getenv("TIMESCALE_COMPRESS_AFTER_DAYS", "30"))
+    chunk_interval_days = int(os.getenv("TIMESCALE_CHUNK_INTERVAL_DAYS", "7"))
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS timescaledb")
+    op.drop_constraint("garmin_health_data_pkey", "garmin_health_data", type_="primary")
+    op.create_primary_key("garmin_health_data_pkey", "garmin_health_data", ["id", "start_time"])
+    op.execute(
+        "SELECT create_hypertable('garmin_health_data', 'start_time', "
+        f"chunk_time_interval => INTERVAL '{chunk_interval_days} days', migrate_data => true)"
+    )
+    op.execute(
+        "ALTER TABLE garmin_health_data SET ("
+        "timescaledb.compress, "
+        "timescaledb.compress_segmentby = 'user_id, summary_type', "
+        "timescaledb.compress_orderby = 'start_time DESC')"
+    )
+    op.execute(
+        f"SELECT add_compression_policy('garmin_health_data', INTERVAL '{compress_after_days} days')"
+    )
+
+
+def downgrade() -> None:
+    # A hypertable cannot be turned back into a plain table in place; only the
+    # compression policy and the unique key are reverted.
+    if _timescale_available():
+        op.execute("SELECT remove_compression_policy('garmin_health_data', if_exists => true)")
+
+    op.drop_constraint("uq_garmin_health_data_summary_start", "garmin_health_data", type_="unique")
+    op.create_unique_constraint("garmin_health_data_summary_id_key", "garmin_health_data", ["summary_id"])
@@ -0,0 +1,34 @@
+"""add garmin activity file chunks
+
+Revision ID: b3d5e7f9a1c2
+Revises: 91b2c3d4e5f6
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "b3d5e7f9a1c2"
+down_revision: Union[str, Sequence[str], None] = "91b2c3d4e5f6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "garmin_activity_file_chunks",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column("chunk_index", sa.Integer(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("content_hash", "chunk_index", name="uq_garmin_activity_file_chunks_hash_index"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("garmin_activity_file_chunks")
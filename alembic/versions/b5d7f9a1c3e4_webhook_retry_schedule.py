@@ -0,0 +1,37 @@
+"""webhook retry schedule
+
+Revision ID: b5d7f9a1c3e4
+Revises: a4c6e8a0b2d3
+Create Date: 2026-10-18 22:00:00.000000
+
+Partial and failed webhook events are retried in the background with exponential
+backoff; the event tracks its attempts and when it is due again, and ends in
+'dead_letter' once the attempts run out.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "b5d7f9a1c3e4"
+down_revision: Union[str, Sequence[str], None] = "a4c6e8a0b2d3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("garmin_webhook_events", sa.Column("attempts", sa.Integer(), nullable=True, server_default="0"))
+    op.add_column("garmin_webhook_events", sa.Column("next_attempt_at", sa.DateTime(), nullable=True))
+    op.create_index(
+        "ix_garmin_webhook_events_status_next_attempt",
+        "garmin_webhook_events",
+        ["status", "next_attempt_at"],
+    )
+
+
+def downgrade() -> None:
+    op.execute("UPDATE garmin_webhook_events SET status = 'failed' WHERE status = 'dead_letter'")
+    op.drop_index("ix_garmin_webhook_events_status_next_attempt", table_name="garmin_webhook_events")
+    op.drop_column("garmin_webhook_events", "next_attempt_at")
+    op.drop_column("garmin_webhook_events", "attempts")
@@ -0,0 +1,106 @@
+"""add garmin activity daily rollup
+
+Revision ID: b9d1f3a5c7e8
+Revises: a8c0e2f4b6d7
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "b9d1f3a5c7e8"
+down_revision: Union[str, Sequence[str], None] = "a8c0e2f4b6d7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _load(duration_seconds, avg_hr, max_hr):
+    # Same formula as app.core.activity_rollup.hr_weighted_load at the time of this revision.
+    minutes = duration_seconds / 60
+    if not minutes:
+        return 0
+    if avg_hr and max_hr:
+        intensity = max(0.45, min(1.15, avg_hr / max(max_hr, 1)))
+    elif avg_hr:
+        intensity = max(0.45, min(1.05, avg_hr / 190))
+    else:
+        intensity = 0.65
+    return round(minutes * (intensity ** 2), 1)
+
+
+def upgrade() -> None:
+    rollup = op.create_table(
+        "garmin_activity_daily_rollup",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("activity_type", sa.String(), nullable=False),
+        sa.Column("sessions", sa.Integer(), nullable=False),
+        sa.Column("duration_seconds", sa.Integer(), nullable=False),
+        sa.Column("distance_meters", sa.Float(), nullable=False),
+        sa.Column("calories", sa.Integer(), nullable=False),
+        sa.Column("load", sa.Float(), nullable=False),
+        sa.Column("hr_sum", sa.Integer(), nullable=False),
+        sa.Column("hr_count", sa.Integer(), nullable=False),
+        sa.Column("max_heart_rate", sa.Integer(), nullable=True),
+        sa.Column("longest_duration_seconds", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user_profile.user_id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "day", "activity_type", name="uq_garmin_activity_daily_rollup_user_day_type"),
+    )
+
+    # Backfill from the typed activity columns; no JSON payloads are read.
+    bind = op.get_bind()
+    result = bind.execute(
+        sa.text(
+            "SELECT user_id, start_time, activity_type, duration, distance, calories, "
+            "average_heart_rate, max_heart_rate FROM garmin_activity_data "
+            "WHERE summary_type IN ('activities', 'manuallyUpdatedActivities')"
+        )
+    )
+    totals = {}
+    for user_id, start_time, activity_type, duration, distance, calories, avg_hr, max_hr in result:
+        if start_time is None:
+            continue
+        key = (user_id, start_time.date(), activity_type or "")
+        row = totals.setdefault(
+            key,
+            {
+                "user_id": user_id,
+                "day": key[1],
+                "activity_type": key[2],
+                "sessions": 0,
+                "duration_seconds": 0,
+                "distance_meters": 0.0,
+                "calories": 0,
+                "load": 0.0,
+                "hr_sum": 0,
+                "hr_count": 0,
+                "max_heart_rate": None,
+                "longest_duration_seconds": 0,
+            },
+        )
+        duration = int(duration or 0)
+        row["sessions"] += 1
+        row["duration_seconds"] += duration
+        row["distance_meters"] += float(distance or 0.0)
+        row["calories"] += int(calories or 0)
+        row["load"] = round(row["load"] + _load(duration, avg_hr, max_hr), 1)
+        if avg_hr:
+            row["hr_sum"] += int(avg_hr)
+            row["hr_count"] += 1
+        if max_hr and (row["max_heart_rate"] is None or max_hr > row["max_heart_rate"]):
+            row["max_heart_rate"] = max_hr
+        row["longest_duration_seconds"] = max(row["longest_duration_seconds"], duration)
+
+    rows = list(totals.values())
+    for offset in range(0, len(rows), 1000):
+        op.bulk_insert(rollup, rows[offset:offset + 1000])
+
+
+def downgrade() -> None:
+    op.drop_table("garmin_activity_daily_rollup")
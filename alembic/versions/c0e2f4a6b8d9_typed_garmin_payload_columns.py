@@ -0,0 +1,154 @@
+"""typed garmin payload columns
+
+Revision ID: c0e2f4a6b8d9
+Revises: b9d1f3a5c7e8
+Create Date: 2026-10-18 16:00:00.000000
+
+The raw Garmin payloads move from JSON text to JSONB, and the metrics the API reads
+on every request get their own columns, backfilled from the payloads. Compression on
+the garmin_health_data hypertable is switched off for the rewrite and restored after.
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "c0e2f4a6b8d9"
+down_revision: Union[str, Sequence[str], None] = "b9d1f3a5c7e8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PAYLOAD_TABLES = ("garmin_health_data", "garmin_activity_data", "garmin_activity_auxiliary_data")
+
+ACTIVITY_COLUMNS = {
+    "elevation_gain": "totalElevationGainInMeters",
+    "average_speed": "averageSpeedInMetersPerSecond",
+    "average_pace": "averagePaceInMinutesPerKilometer",
+    "average_run_cadence": "averageRunCadenceInStepsPerMinute",
+}
+
+# Numeric JSON values only; strings and nulls leave the column NULL.
+_NUMBER = "CASE WHEN jsonb_typeof({expr}) = 'number' THEN ({expr})::text::{cast} END"
+
+
+def _health_compression_enabled() -> bool:
+    bind = op.get_bind()
+    has_catalog = bind.execute(
+        sa.text("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'")
+    ).first() is not None
+    if not has_catalog:
+        return False
+    return bool(
+        bind.execute(
+            sa.text(
+                "SELECT compression_enabled FROM timescaledb_information.hypertables "
+                "WHERE hypertable_name = 'garmin_health_data'"
+            )
+        ).scalar()
+    )
+
+
+def _disable_health_compression() -> None:
+    op.execute("SELECT remove_compression_policy('garmin_health_data', if_exists => true)")
+    op.execute(
+        "SELECT decompress_chunk(chunk, if_compressed => true) "
+        "FROM show_chunks('garmin_health_data') AS chunk"
+    )
+    op.execute("ALTER TABLE garmin_health_data SET (timescaledb.compress = false)")
+
+
+def _enable_health_compression() -> None:
+    # Same settings as revision a8c0e2f4b6d7.
+    compress_after_days = int(os.getenv("TIMESCALE_COMPRESS_AFTER_DAYS", "30"))
+    op.execute(
+        "ALTER TABLE garmin_health_data SET ("
+        "timescaledb.compress, "
+        "timescaledb.compress_segmentby = 'user_id, summary_type', "
+        "timescaledb.compress_orderby = 'start_time DESC')"
+    )
+    op.execute(
+        f"SELECT add_compression_policy('garmin_health_data', INTERVAL '{compress_after_days} days')"
+    )
+
+
+def upgrade() -> None:
+    compressed = _health_compression_enabled()
+    if compressed:
+        _disable_health_compression()
+
+    for table in PAYLOAD_TABLES:
+        op.alter_column(
+            table,
+            "data",
+            type_=postgresql.JSONB(),
+            existing_type=sa.Text(),
+            existing_nullable=False,
+            postgresql_using="data::jsonb",
+        )
+
+    for column in ACTIVITY_COLUMNS:
+        op.add_column("garmin_activity_data", sa.Column(column, sa.Float(), nullable=True))
+    op.add_column("garmin_health_data", sa.Column("resting_heart_rate", sa.Integer(), nullable=True))
+    op.add_column("garmin_health_data", sa.Column("sleep_score", sa.Integer(), nullable=True))
+    op.add_column("garmin_health_data", sa.Column("hrv_last_night_avg", sa.Integer(), nullable=True))
+
+    op.execute(
+        "UPDATE garmin_activity_data SET "
+        + ", ".join(
+            f"{column} = " + _NUMBER.format(expr=f"data->'{field}'", cast="double precision")
+            for column, field in ACTIVITY_COLUMNS.items()
+        )
+    )
+    op.execute(
+        "UPDATE garmin_health_data SET resting_heart_rate = "
+        + _NUMBER.format(expr="data->'restingHeartRateInBeatsPerMinute'", cast="numeric")
+        + "::integer WHERE summary_type = 'dailies'"
+    )
+    op.execute(
+        "UPDATE garmin_health_data SET sleep_score = COALESCE("
+        + _NUMBER.format(expr="data->'overallSleepScore'->'value'", cast="numeric")
+        + ", "
+        + _NUMBER.format(expr="data->'sleepScores'->'overall'->'value'", cast="numeric")
+        + ")::integer WHERE summary_type = 'sleeps'"
+    )
+    # lastNightAvg, else the mean of the positive hrvValues (as recovery_snapshot._nightly_hrv).
+    op.execute(
+        "UPDATE garmin_health_data SET hrv_last_night_avg = COALESCE("
+        "CASE WHEN jsonb_typeof(data->'lastNightAvg') = 'number' "
+        "AND (data->>'lastNightAvg')::numeric > 0 THEN trunc((data->>'lastNightAvg')::numeric) END, "
+        "(SELECT trunc(avg(trunc(value::text::numeric))) FROM jsonb_each(data->'hrvValues') "
+        "WHERE jsonb_typeof(data->'hrvValues') = 'object' AND jsonb_typeof(value) = 'number' "
+        "AND value::text::numeric > 0)"
+        ")::integer WHERE summary_type = 'hrv'"
+    )
+
+    if compressed:
+        _enable_health_compression()
+
+
+def downgrade() -> None:
+    compressed = _health_compression_enabled()
+    if compressed:
+        _disable_health_compression()
+
+    op.drop_column("garmin_health_data", "hrv_last_night_avg")
+    op.drop_column("garmin_health_data", "sleep_score")
+    op.drop_column("garmin_health_data", "resting_heart_rate")
+    for column in reversed(list(ACTIVITY_COLUMNS)):
+        op.drop_column("garmin_activity_data", column)
+
+    for table in PAYLOAD_TABLES:
+        op.alter_column(
+            table,
+            "data",
+            type_=sa.Text(),
+            existing_type=postgresql.JSONB(),
+            existing_nullable=False,
+            postgresql_using="data::text",
+        )
+
+    if compressed:
+        _enable_health_compression()
@@ -0,0 +1,36 @@
+"""add garmin fit series cache
+
+Revision ID: c4e6a8b0d2f3
+Revises: b3d5e7f9a1c2
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "c4e6a8b0d2f3"
+down_revision: Union[str, Sequence[str], None] = "b3d5e7f9a1c2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "garmin_fit_series",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("summary_id", sa.String(), nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("record_count", sa.Integer(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("summary_id", "content_hash", name="uq_garmin_fit_series_summary_hash"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("garmin_fit_series")
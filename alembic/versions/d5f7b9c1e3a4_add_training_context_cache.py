@@ -0,0 +1,38 @@
+"""add training context cache
+
+Revision ID: d5f7b9c1e3a4
+Revises: c4e6a8b0d2f3
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "d5f7b9c1e3a4"
+down_revision: Union[str, Sequence[str], None] = "c4e6a8b0d2f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "training_context_cache",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("period_days", sa.Integer(), nullable=False),
+        sa.Column("current_days", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("source_stamp", sa.String(), nullable=False),
+        sa.Column("context", sa.Text(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user_profile.user_id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "period_days", "current_days", name="uq_training_context_cache_user_window"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("training_context_cache")
@@ -0,0 +1,54 @@
+"""store activity detail segments
+
+Revision ID: e2a4c6e8f0b1
+Revises: d1f3a5c7e9b0
+Create Date: 2026-10-18 18:00:00.000000
+
+Effort segments of activityDetails rows are extracted at ingest from now on. Existing
+rows keep NULL and are extracted on read until Garmin redelivers them.
+
+Per-day, per-sport effort sketches behind the personal training targets are kept by
+ingest as well. There is no backfill: a user's sketches are built on their first
+training profile read.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "e2a4c6e8f0b1"
+down_revision: Union[str, Sequence[str], None] = "d1f3a5c7e9b0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("garmin_activity_auxiliary_data", sa.Column("segments", postgresql.JSONB(), nullable=True))
+    op.create_table(
+        "training_effort_sketches",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("sport", sa.String(), nullable=False),
+        sa.Column("sketch", sa.Text(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user_profile.user_id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "day", "sport", name="uq_training_effort_sketches_user_day_sport"),
+    )
+    op.create_table(
+        "training_effort_sketch_state",
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("built_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user_profile.user_id"]),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("training_effort_sketch_state")
+    op.drop_table("training_effort_sketches")
+    op.drop_column("garmin_activity_auxiliary_data", "segments")
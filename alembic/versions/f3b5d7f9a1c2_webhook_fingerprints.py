@@ -0,0 +1,37 @@
+"""webhook fingerprints
+
+Revision ID: f3b5d7f9a1c2
+Revises: e2a4c6e8f0b1
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "f3b5d7f9a1c2"
+down_revision: Union[str, Sequence[str], None] = "e2a4c6e8f0b1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "garmin_webhook_fingerprints",
+        sa.Column("fingerprint", sa.String(length=40), nullable=False),
+        sa.Column("summary_type", sa.String(), nullable=False),
+        sa.Column("user_id", sa.BigInteger(), nullable=True),
+        sa.Column("processed_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user_profile.user_id"]),
+        sa.PrimaryKeyConstraint("fingerprint"),
+    )
+    op.create_index("ix_garmin_webhook_fingerprints_processed_at", "garmin_webhook_fingerprints", ["processed_at"])
+    op.add_column("garmin_webhook_events", sa.Column("skipped_count", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("garmin_webhook_events", "skipped_count")
+    op.drop_index("ix_garmin_webhook_fingerprints_processed_at", table_name="garmin_webhook_fingerprints")
+    op.drop_table("garmin_webhook_fingerprints")
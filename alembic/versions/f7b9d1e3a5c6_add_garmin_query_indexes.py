@@ -0,0 +1,51 @@
+"""add garmin query indexes
+
+Revision ID: f7b9d1e3a5c6
+Revises: e6a8c0d2f4b5
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "f7b9d1e3a5c6"
+down_revision: Union[str, Sequence[str], None] = "e6a8c0d2f4b5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_garmin_health_data_user_type_start",
+        "garmin_health_data",
+        ["user_id", "summary_type", sa.text("start_time DESC")],
+    )
+    op.create_index("ix_garmin_health_data_user_calendar_date", "garmin_health_data", ["user_id", "calendar_date"])
+    op.create_index(
+        "ix_garmin_activity_data_user_type_start",
+        "garmin_activity_data",
+        ["user_id", "summary_type", sa.text("start_time DESC")],
+    )
+    op.create_index(
+        "ix_garmin_activity_aux_user_type_start",
+        "garmin_activity_auxiliary_data",
+        ["user_id", "summary_type", sa.text("start_time DESC")],
+    )
+    op.create_index(
+        "ix_garmin_activity_aux_user_type_activity",
+        "garmin_activity_auxiliary_data",
+        ["user_id", "summary_type", "activity_id"],
+    )
+    op.create_index("ix_garmin_webhook_events_status_created", "garmin_webhook_events", ["status", "created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_garmin_webhook_events_status_created", table_name="garmin_webhook_events")
+    op.drop_index("ix_garmin_activity_aux_user_type_activity", table_name="garmin_activity_auxiliary_data")
+    op.drop_index("ix_garmin_activity_aux_user_type_start", table_name="garmin_activity_auxiliary_data")
+    op.drop_index("ix_garmin_activity_data_user_type_start", table_name="garmin_activity_data")
+    op.drop_index("ix_garmin_health_data_user_calendar_date", table_name="garmin_health_data")
+    op.drop_index("ix_garmin_health_data_user_type_start", table_name="garmin_health_data")
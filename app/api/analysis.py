@@ -1,15 +1,16 @@
 """Deep athlete profile analysis from Garmin activity and health data."""
-import json
 import logging
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Optional
 from collections import defaultdict
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field
+from sqlalchemy import case, func
 from sqlalchemy.orm import Session
 
-from app.database.database import get_db
+from app.database.database import get_read_db
 from app.database.models import GarminActivityData, GarminHealthData
 
 logger = logging.getLogger(__name__)
@@ -31,60 +32,216 @@ class ActivityAnalysisRequest(BaseModel):
     last_context: Optional[dict[str, Any]] = None
 
 
-def _parse_raw(activity: GarminActivityData) -> dict:
-    raw = activity.data
-    return json.loads(raw) if isinstance(raw, str) else raw
-
+PROFILE_STREAM_BATCH = 1000
+
+# Typed columns the athlete profile reads; payloads are never loaded.
+_PROFILE_COLUMNS = (
+    GarminActivityData.activity_type,
+    GarminActivityData.activity_name,
+    GarminActivityData.start_time,
+    GarminActivityData.duration,
+    GarminActivityData.distance,
+    GarminActivityData.calories,
+    GarminActivityData.average_heart_rate,
+    GarminActivityData.max_heart_rate,
+    GarminActivityData.average_pace,
+    GarminActivityData.average_speed,
+    GarminActivityData.elevation_gain,
+    GarminActivityData.average_run_cadence,
+)
+
+
+@dataclass
+class _Stat:
+    """Sum, count and extremes over the truthy values seen."""
+    total: float = 0
+    count: int = 0
+    low: Optional[float] = None
+    high: Optional[float] = None
+
+    def add(self, value: Optional[float]) -> None:
+        if not value:
+            return
+        self.total += value
+        self.count += 1
+        self.low = value if self.low is None else min(self.low, value)
+        self.high = value if self.high is None else max(self.high, value)
+
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+
+class _Best:
+    """Row with the lowest or highest key; ties go to the later row, i.e. the most recent one."""
+
+    def __init__(self, lowest: bool = False):
+        self.lowest = lowest
+        self.key: Any = None
+        self.row: Any = None
+
+    def offer(self, key: Any, row: Any) -> None:
+        if self.row is None or (key <= self.key if self.lowest else key >= self.key):
+            self.key = key
+            self.row = row
+
+
+@dataclass
+class _SportProfile:
+    sessions: int = 0
+    heart_rate: _Stat = field(default_factory=_Stat)
+    max_heart_rate: _Stat = field(default_factory=_Stat)
+    distance: _Stat = field(default_factory=_Stat)
+    duration: _Stat = field(default_factory=_Stat)
+    calories: _Stat = field(default_factory=_Stat)
+    pace: _Stat = field(default_factory=_Stat)
+    speed: _Stat = field(default_factory=_Stat)
+    elevation: _Stat = field(default_factory=_Stat)
+    cadence: _Stat = field(default_factory=_Stat)
+
+    def add(self, row: Any) -> None:
+        self.sessions += 1
+        self.heart_rate.add(row.average_heart_rate)
+        self.max_heart_rate.add(row.max_heart_rate)
+        self.distance.add(row.distance)
+        self.duration.add(row.duration)
+        self.calories.add(row.calories)
+        self.pace.add(row.average_pace)
+        self.speed.add(row.average_speed)
+        self.elevation.add(row.elevation_gain)
+        self.cadence.add(row.average_run_cadence)
+
+    def result(self, sport: str) -> Optional[Dict]:
+        if not self.sessions:
+            return None
+        distance, duration, calories = self.distance, self.duration, self.calories
+        profile: Dict = {
+            "total_sessions": self.sessions,
+            "total_distance_km": round(distance.total / 1000, 1) if distance.count else 0,
+            "total_duration_hours": round(duration.total / 3600, 1) if duration.count else 0,
+            "total_calories": calories.total if calories.count else 0,
+            "total_elevation_m": round(self.elevation.total, 0) if self.elevation.count else 0,
+            "avg_distance_km": round(distance.mean() / 1000, 2) if distance.count else None,
+            "avg_duration_min": round(duration.mean() / 60, 1) if duration.count else None,
+            "avg_heart_rate": round(self.heart_rate.mean()) if self.heart_rate.count else None,
+            "max_heart_rate_observed": self.max_heart_rate.high,
+            "avg_calories_per_session": round(calories.mean()) if calories.count else None,
+        }
 
-def _build_sport_profile(activities: List[GarminActivityData], sport: str) -> Optional[Dict]:
-    sport_acts = [a for a in activities if (a.activity_type or "").upper() == sport.upper()]
-    if not sport_acts:
-        return None
+        if sport == "RUNNING":
+            profile["avg_pace_min_km"] = round(self.pace.mean(), 2) if self.pace.count else None
+            profile["best_pace_min_km"] = round(self.pace.low, 2) if self.pace.low else None
+            profile["avg_cadence_spm"] = round(self.cadence.mean(), 1) if self.cadence.count else None
+            profile["longest_run_km"] = round(distance.high / 1000, 2) if distance.high else None
+            profile["longest_run_min"] = round(duration.high / 60, 1) if duration.high else None
+        elif sport == "CYCLING":
+            profile["avg_speed_kmh"] = round(self.speed.mean() * 3.6, 1) if self.speed.count else None
+            profile["max_speed_kmh"] = round(self.speed.high * 3.6, 1) if self.speed.high else None
+            profile["avg_elevation_m"] = round(self.elevation.mean(), 0) if self.elevation.count else None
+            profile["longest_ride_km"] = round(distance.high / 1000, 2) if distance.high else None
+            profile["longest_ride_min"] = round(duration.high / 60, 1) if duration.high else None
+
+        return profile
+
+
+@dataclass
+class _TrainingPatterns:
+    sessions: int = 0
+    day_counts: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    hour_counts: Dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    last_seen: Dict[Any, datetime] = field(default_factory=dict)
+    first: Optional[datetime] = None
+    last: Optional[datetime] = None
+    gap_total: int = 0
+    gap_count: int = 0
+    gap_max: Optional[int] = None
+
+    def add(self, start_time: Optional[datetime]) -> None:
+        self.sessions += 1
+        if not start_time:
+            return
+        day, hour = start_time.strftime("%A"), start_time.hour
+        self.day_counts[day] += 1
+        self.hour_counts[hour] += 1
+        self.last_seen[day] = self.last_seen[("hour", hour)] = start_time
+        if self.last is not None:
+            gap = (start_time - self.last).days
+            self.gap_total += gap
+            self.gap_count += 1
+            self.gap_max = gap if self.gap_max is None else max(self.gap_max, gap)
+        self.first = self.first or start_time
+        self.last = start_time
+
+    def _favorites(self, counts: Dict, seen_key) -> list:
+        # Most frequent first; equal counts rank the most recently used first.
+        return sorted(counts.items(), key=lambda item: (item[1], self.last_seen[seen_key(item[0])]), reverse=True)[:3]
+
+    def result(self) -> Dict:
+        if not self.sessions:
+            return {}
+        span_weeks = ((self.last - self.first).days / 7) if self.first and self.last else 0
+        return {
+            "favorite_days": [{"day": d, "count": c} for d, c in self._favorites(self.day_counts, lambda day: day)],
+            "favorite_hours": [
+                {"hour": h, "count": c} for h, c in self._favorites(self.hour_counts, lambda hour: ("hour", hour))
+            ],
+            "avg_days_between_sessions": round(self.gap_total / self.gap_count, 1) if self.gap_count else None,
+            "max_days_between_sessions": self.gap_max,
+            "sessions_per_week": round(self.sessions / max(span_weeks, 1), 1),
+            "first_activity": self.first.isoformat() if self.first else None,
+            "last_activity": self.last.isoformat() if self.last else None,
+            "total_active_weeks": round(span_weeks, 1) if span_weeks else 0,
+        }
 
-    hrs = [a.average_heart_rate for a in sport_acts if a.average_heart_rate]
-    max_hrs = [a.max_heart_rate for a in sport_acts if a.max_heart_rate]
-    distances = [a.distance for a in sport_acts if a.distance]
-    durations = [a.duration for a in sport_acts if a.duration]
-    calories = [a.calories for a in sport_acts if a.calories]
-
-    raws = [_parse_raw(a) for a in sport_acts]
-    paces = [r.get("averagePaceInMinutesPerKilometer") for r in raws if r.get("averagePaceInMinutesPerKilometer")]
-    speeds = [r.get("averageSpeedInMetersPerSecond") for r in raws if r.get("averageSpeedInMetersPerSecond")]
-    elevations = [r.get("totalElevationGainInMeters") for r in raws if r.get("totalElevationGainInMeters")]
-    cadences = [r.get("averageRunCadenceInStepsPerMinute") for r in raws if r.get("averageRunCadenceInStepsPerMinute")]
-
-    best_distance = max(distances) if distances else None
-    best_duration = max(durations) if durations else None
-    fastest_pace = min(paces) if paces else None
-    max_speed = max(speeds) if speeds else None
-
-    profile: Dict = {
-        "total_sessions": len(sport_acts),
-        "total_distance_km": round(sum(distances) / 1000, 1) if distances else 0,
-        "total_duration_hours": round(sum(durations) / 3600, 1) if durations else 0,
-        "total_calories": sum(calories) if calories else 0,
-        "total_elevation_m": round(sum(elevations), 0) if elevations else 0,
-        "avg_distance_km": round(sum(distances) / len(distances) / 1000, 2) if distances else None,
-        "avg_duration_min": round(sum(durations) / len(durations) / 60, 1) if durations else None,
-        "avg_heart_rate": round(sum(hrs) / len(hrs)) if hrs else None,
-        "max_heart_rate_observed": max(max_hrs) if max_hrs else None,
-        "avg_calories_per_session": round(sum(calories) / len(calories)) if calories else None,
-    }
 
-    if sport.upper() == "RUNNING":
-        profile["avg_pace_min_km"] = round(sum(paces) / len(paces), 2) if paces else None
-        profile["best_pace_min_km"] = round(fastest_pace, 2) if fastest_pace else None
-        profile["avg_cadence_spm"] = round(sum(cadences) / len(cadences), 1) if cadences else None
-        profile["longest_run_km"] = round(best_distance / 1000, 2) if best_distance else None
-        profile["longest_run_min"] = round(best_duration / 60, 1) if best_duration else None
-    elif sport.upper() == "CYCLING":
-        profile["avg_speed_kmh"] = round(sum(speeds) / len(speeds) * 3.6, 1) if speeds else None
-        profile["max_speed_kmh"] = round(max_speed * 3.6, 1) if max_speed else None
-        profile["avg_elevation_m"] = round(sum(elevations) / len(elevations), 0) if elevations else None
-        profile["longest_ride_km"] = round(best_distance / 1000, 2) if best_distance else None
-        profile["longest_ride_min"] = round(best_duration / 60, 1) if best_duration else None
+class _PersonalRecords:
+    def __init__(self):
+        self.fastest_run = _Best(lowest=True)
+        self.longest_run = _Best()
+        self.max_hr_run = _Best()
+        self.fastest_ride = _Best()
+        self.longest_ride = _Best()
+        self.most_elevation_ride = _Best()
+        self.max_hr_ride = _Best()
+
+    def add(self, sport: str, row: Any) -> None:
+        if sport == "RUNNING":
+            self.fastest_run.offer(row.average_pace or 999, row)
+            self.longest_run.offer(row.distance or 0, row)
+            self.max_hr_run.offer(row.max_heart_rate or 0, row)
+        elif sport == "CYCLING":
+            self.fastest_ride.offer(row.average_speed or 0, row)
+            self.longest_ride.offer(row.distance or 0, row)
+            self.most_elevation_ride.offer(row.elevation_gain or 0, row)
+            self.max_hr_ride.offer(row.max_heart_rate or 0, row)
+
+    @staticmethod
+    def _record(value: Any, unit: str, row: Any) -> Dict:
+        return {
+            "value": value,
+            "unit": unit,
+            "date": row.start_time.isoformat() if row.start_time else None,
+            "activity": row.activity_name,
+        }
 
-    return profile
+    def result(self) -> Dict:
+        records: Dict = {}
+        if self.fastest_run.row is not None:
+            fastest, longest, max_hr = self.fastest_run.row, self.longest_run.row, self.max_hr_run.row
+            records["running"] = {
+                "fastest_pace": self._record(round(fastest.average_pace or 0, 2), "min/km", fastest),
+                "longest_distance": self._record(round((longest.distance or 0) / 1000, 2), "km", longest),
+                "max_heart_rate": self._record(max_hr.max_heart_rate, "bpm", max_hr),
+            }
+        if self.fastest_ride.row is not None:
+            fastest, longest = self.fastest_ride.row, self.longest_ride.row
+            most_elevation, max_hr = self.most_elevation_ride.row, self.max_hr_ride.row
+            records["cycling"] = {
+                "fastest_avg_speed": self._record(round((fastest.average_speed or 0) * 3.6, 1), "km/h", fastest),
+                "longest_distance": self._record(round((longest.distance or 0) / 1000, 2), "km", longest),
+                "most_elevation": self._record(round(most_elevation.elevation_gain or 0), "m", most_elevation),
+                "max_heart_rate": self._record(max_hr.max_heart_rate, "bpm", max_hr),
+            }
+        return records
 
 
 def _estimate_hr_zones(max_hr: int) -> Dict:
@@ -98,137 +255,29 @@ def _estimate_hr_zones(max_hr: int) -> Dict:
     }
 
 
-def _training_patterns(activities: List[GarminActivityData]) -> Dict:
-    if not activities:
-        return {}
-
-    day_counts: Dict[str, int] = defaultdict(int)
-    hour_counts: Dict[int, int] = defaultdict(int)
-
-    for a in activities:
-        if a.start_time:
-            day_counts[a.start_time.strftime("%A")] += 1
-            hour_counts[a.start_time.hour] += 1
-
-    sorted_days = sorted(day_counts.items(), key=lambda x: x[1], reverse=True)
-    sorted_hours = sorted(hour_counts.items(), key=lambda x: x[1], reverse=True)
-
-    dates = sorted([a.start_time for a in activities if a.start_time])
-    gaps = []
-    for i in range(1, len(dates)):
-        gap = (dates[i] - dates[i - 1]).days
-        gaps.append(gap)
-
-    avg_gap = round(sum(gaps) / len(gaps), 1) if gaps else None
-    max_gap = max(gaps) if gaps else None
-
-    first_activity = min(dates) if dates else None
-    last_activity = max(dates) if dates else None
-    span_weeks = ((last_activity - first_activity).days / 7) if first_activity and last_activity else 0
-    sessions_per_week = round(len(activities) / max(span_weeks, 1), 1)
-
-    return {
-        "favorite_days": [{"day": d, "count": c} for d, c in sorted_days[:3]],
-        "favorite_hours": [{"hour": h, "count": c} for h, c in sorted_hours[:3]],
-        "avg_days_between_sessions": avg_gap,
-        "max_days_between_sessions": max_gap,
-        "sessions_per_week": sessions_per_week,
-        "first_activity": first_activity.isoformat() if first_activity else None,
-        "last_activity": last_activity.isoformat() if last_activity else None,
-        "total_active_weeks": round(span_weeks, 1) if span_weeks else 0,
-    }
-
-
-def _personal_records(activities: List[GarminActivityData]) -> Dict:
-    records: Dict = {}
-
-    runs = [a for a in activities if (a.activity_type or "").upper() == "RUNNING"]
-    rides = [a for a in activities if (a.activity_type or "").upper() == "CYCLING"]
-
-    if runs:
-        fastest = min(runs, key=lambda a: _parse_raw(a).get("averagePaceInMinutesPerKilometer", 999))
-        longest = max(runs, key=lambda a: a.distance or 0)
-        max_hr_run = max(runs, key=lambda a: a.max_heart_rate or 0)
-        records["running"] = {
-            "fastest_pace": {
-                "value": round(_parse_raw(fastest).get("averagePaceInMinutesPerKilometer", 0), 2),
-                "unit": "min/km",
-                "date": fastest.start_time.isoformat() if fastest.start_time else None,
-                "activity": fastest.activity_name,
-            },
-            "longest_distance": {
-                "value": round((longest.distance or 0) / 1000, 2),
-                "unit": "km",
-                "date": longest.start_time.isoformat() if longest.start_time else None,
-                "activity": longest.activity_name,
-            },
-            "max_heart_rate": {
-                "value": max_hr_run.max_heart_rate,
-                "unit": "bpm",
-                "date": max_hr_run.start_time.isoformat() if max_hr_run.start_time else None,
-                "activity": max_hr_run.activity_name,
-            },
-        }
-
-    if rides:
-        fastest = max(rides, key=lambda a: _parse_raw(a).get("averageSpeedInMetersPerSecond", 0))
-        longest = max(rides, key=lambda a: a.distance or 0)
-        most_elevation = max(rides, key=lambda a: _parse_raw(a).get("totalElevationGainInMeters", 0))
-        max_hr_ride = max(rides, key=lambda a: a.max_heart_rate or 0)
-        records["cycling"] = {
-            "fastest_avg_speed": {
-                "value": round(_parse_raw(fastest).get("averageSpeedInMetersPerSecond", 0) * 3.6, 1),
-                "unit": "km/h",
-                "date": fastest.start_time.isoformat() if fastest.start_time else None,
-                "activity": fastest.activity_name,
-            },
-            "longest_distance": {
-                "value": round((longest.distance or 0) / 1000, 2),
-                "unit": "km",
-                "date": longest.start_time.isoformat() if longest.start_time else None,
-                "activity": longest.activity_name,
-            },
-            "most_elevation": {
-                "value": round(_parse_raw(most_elevation).get("totalElevationGainInMeters", 0)),
-                "unit": "m",
-                "date": most_elevation.start_time.isoformat() if most_elevation.start_time else None,
-                "activity": most_elevation.activity_name,
-            },
-            "max_heart_rate": {
-                "value": max_hr_ride.max_heart_rate,
-                "unit": "bpm",
-                "date": max_hr_ride.start_time.isoformat() if max_hr_ride.start_time else None,
-                "activity": max_hr_ride.activity_name,
-            },
-        }
-
-    return records
-
-
-def _health_summary(health_data: List[GarminHealthData]) -> Optional[Dict]:
-    dailies = [h for h in health_data if h.summary_type == "dailies"]
-    if not dailies:
+def _health_summary(db: Session, user_id: int) -> Optional[Dict]:
+    """Resting HR summary over the user's dailies, aggregated in the database."""
+    resting_hr = case((GarminHealthData.resting_heart_rate > 0, GarminHealthData.resting_heart_rate))
+    days, avg_hr, min_hr, max_hr = (
+        db.query(func.count(GarminHealthData.id), func.avg(resting_hr), func.min(resting_hr), func.max(resting_hr))
+        .filter(GarminHealthData.user_id == user_id, GarminHealthData.summary_type == "dailies")
+        .one()
+    )
+    if not days:
         return None
 
-    resting_hrs = []
-    for d in dailies:
-        raw = json.loads(d.data) if isinstance(d.data, str) else d.data
-        rhr = raw.get("restingHeartRateInBeatsPerMinute")
-        if rhr and rhr > 0:
-            resting_hrs.append(rhr)
-
     return {
-        "days_with_data": len(dailies),
-        "avg_resting_hr": round(sum(resting_hrs) / len(resting_hrs)) if resting_hrs else None,
-        "min_resting_hr": min(resting_hrs) if resting_hrs else None,
-        "max_resting_hr": max(resting_hrs) if resting_hrs else None,
+        "days_with_data": days,
+        "avg_resting_hr": round(avg_hr) if avg_hr is not None else None,
+        "min_resting_hr": min_hr,
+        "max_resting_hr": max_hr,
     }
 
 
 @router.post("/activity")
-async def activity_analysis(
+def activity_analysis(
     payload: ActivityAnalysisRequest,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Return a chart-ready activity analysis from a structured or natural-language request."""
     from app.tools.activity_analysis import (
@@ -256,49 +305,58 @@ async def activity_analysis(
             status_code=422,
             detail="Geen ondersteunde activiteitenanalyse herkend.",
         )
+    db.for_user(payload.user_id)
     return build_activity_analysis(db, payload.user_id, request)
 
 
 @router.get("/profile")
-async def athlete_profile(
+def athlete_profile(
     user_id: int = Query(..., description="Internal user ID"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    """Build a comprehensive athlete profile from all stored Garmin data."""
-    activities = (
-        db.query(GarminActivityData)
+    """
+    Build a comprehensive athlete profile from all stored Garmin data.
+
+    Activities are streamed oldest first in batches of typed columns and folded into
+    running totals, so memory does not grow with the length of the history.
+    """
+    db.for_user(user_id)
+    sports = {"RUNNING": _SportProfile(), "CYCLING": _SportProfile()}
+    records = _PersonalRecords()
+    patterns = _TrainingPatterns()
+    max_hr = _Stat()
+    total_distance = total_duration = total_calories = total_elevation = 0
+
+    rows = (
+        db.query(*_PROFILE_COLUMNS)
         .filter(GarminActivityData.user_id == user_id)
-        .order_by(GarminActivityData.start_time.desc())
-        .all()
+        .order_by(GarminActivityData.start_time.asc())
+        .yield_per(PROFILE_STREAM_BATCH)
     )
-
-    health_data = (
-        db.query(GarminHealthData)
-        .filter(GarminHealthData.user_id == user_id)
-        .order_by(GarminHealthData.start_time.desc())
-        .all()
-    )
-
-    all_max_hrs = [a.max_heart_rate for a in activities if a.max_heart_rate]
-    overall_max_hr = max(all_max_hrs) if all_max_hrs else None
-
-    total_distance = sum(a.distance or 0 for a in activities)
-    total_duration = sum(a.duration or 0 for a in activities)
-    total_calories = sum(a.calories or 0 for a in activities)
-    total_elevation = sum(_parse_raw(a).get("totalElevationGainInMeters", 0) for a in activities)
+    for row in rows:
+        sport = (row.activity_type or "").upper()
+        if sport in sports:
+            sports[sport].add(row)
+        records.add(sport, row)
+        patterns.add(row.start_time)
+        max_hr.add(row.max_heart_rate)
+        total_distance += row.distance or 0
+        total_duration += row.duration or 0
+        total_calories += row.calories or 0
+        total_elevation += row.elevation_gain or 0
 
     return {
         "overview": {
-            "total_activities": len(activities),
+            "total_activities": patterns.sessions,
             "total_distance_km": round(total_distance / 1000, 1),
             "total_duration_hours": round(total_duration / 3600, 1),
             "total_calories": total_calories,
             "total_elevation_m": round(total_elevation),
         },
-        "heart_rate_zones": _estimate_hr_zones(overall_max_hr) if overall_max_hr else None,
-        "running": _build_sport_profile(activities, "RUNNING"),
-        "cycling": _build_sport_profile(activities, "CYCLING"),
-        "personal_records": _personal_records(activities),
-        "training_patterns": _training_patterns(activities),
-        "health": _health_summary(health_data),
+        "heart_rate_zones": _estimate_hr_zones(max_hr.high) if max_hr.high else None,
+        "running": sports["RUNNING"].result("RUNNING"),
+        "cycling": sports["CYCLING"].result("CYCLING"),
+        "personal_records": records.result(),
+        "training_patterns": patterns.result(),
+        "health": _health_summary(db, user_id),
     }
@@ -1,12 +1,13 @@
 """Garmin OAuth2 and webhook API endpoints."""
 from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
 from pydantic import BaseModel, Field
-from sqlalchemy import func, or_
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Mapping, Optional
+from collections import Counter
 import logging
-import requests
 import time
 import json
 import re
@@ -14,8 +15,25 @@ import os
 from datetime import datetime, timedelta
 
 from app.config import settings
-from app.database.database import get_db
-from app.tools.garmin_oauth import GarminOAuthService
+from app.core.activity_rollup import ActivityBucket, as_activity_bucket, load_activity_buckets
+from app.core.detail_segments import activity_detail_for, detail_segments_for, index_activity_details
+from app.core.effort_sketch import (
+    EffortSketch,
+    activity_metric,
+    name_effort,
+    normalize_training_sport,
+    segment_fallback_effort,
+    segment_metric,
+    sketch_activities,
+)
+from app.core.load_metrics import LOAD_HIGH_THRESHOLD, LOAD_LOW_THRESHOLD, compute_load_metrics, load_advice_nl
+from app.core.payload_memo import memoized
+from app.core.response_cache import cached_response
+from app.core.webhook_archive import archive_webhook_payload, load_webhook_payload, summarize_webhook_payload
+from app.core.training_context import build_training_context, get_training_context, refresh_training_contexts
+from app.core.webhook_queue import webhook_queue
+from app.database.database import get_db, get_read_db
+from app.tools.garmin_oauth import GarminOAuthService, invalidate_access_token
 from app.tools.garmin_client import GarminAPIClient
 from app.database.models import (
     GarminActivityAuxiliaryData,
@@ -61,6 +79,11 @@ REQUIRED_EXPORT_PERMISSIONS = {"ACTIVITY_EXPORT", "HISTORICAL_DATA_EXPORT"}
 POST_OAUTH_EXPORT_PERMISSIONS = {"ACTIVITY_EXPORT", "HISTORICAL_DATA_EXPORT", "HEALTH_EXPORT"}
 INITIAL_ACTIVITY_BACKFILL_DAYS = 30
 INITIAL_HEALTH_BACKFILL_DAYS = 30
+# ETag windows of the cached read endpoints: answers older than this are rebuilt even
+# without new data, because they depend on the clock (rolling windows, time since sleep).
+RECOVERY_FRESHNESS_SECONDS = 300
+TRAINING_PROFILE_FRESHNESS_SECONDS = 3600
+IMPORT_STATUS_FRESHNESS_SECONDS = 60
 
 
 class RecommendationAdjustRequest(BaseModel):
@@ -360,6 +383,7 @@ def build_import_status_payload(db: Session, user_id: int, period_days: int) ->
             "summary_types": json.loads(event.summary_types or "[]"),
             "item_count": event.item_count,
             "callback_count": event.callback_count,
+            "skipped_count": event.skipped_count or 0,
             "status": event.status,
             "error": event.error,
             "created_at": event.created_at.isoformat() if event.created_at else None,
@@ -426,8 +450,11 @@ def _create_webhook_event(db: Session, source: str, payload: Dict) -> GarminWebh
     ]
     garmin_user_id = next((item.get("userId") for item in items if item.get("userId")), None)
     from app.core.garmin_import import resolve_internal_user_for_garmin
+    from app.core.webhook_dedupe import payload_already_processed
 
     resolved_user_id = resolve_internal_user_for_garmin(db, garmin_user_id)
+    # A pure re-delivery is logged without its payload and never queued.
+    duplicate = source in webhook_queue.sources and payload_already_processed(db, payload)
 
     event = GarminWebhookEvent(
         user_id=resolved_user_id,
@@ -436,8 +463,9 @@ def _create_webhook_event(db: Session, source: str, payload: Dict) -> GarminWebh
         summary_types=json.dumps(summary_types),
         item_count=len(items),
         callback_count=sum(1 for item in items if item.get("callbackURL")),
-        status="received",
-        payload=json.dumps(payload),
+        status="duplicate" if duplicate else "received",
+        skipped_count=len(items) if duplicate else 0,
+        payload_hash=None if duplicate else archive_webhook_payload(db, payload),
     )
     db.add(event)
     db.commit()
@@ -453,161 +481,92 @@ def _finish_webhook_event(db: Session, event: GarminWebhookEvent, errors: list[s
     db.commit()
 
 
-def summarize_activities(activities: list[GarminActivityData]) -> Dict:
-    """Create aggregate metrics from Garmin activity rows."""
-    total_distance_m = sum((activity.distance or 0.0) for activity in activities)
-    total_duration_s = sum((activity.duration or 0) for activity in activities)
-    hr_values = [activity.average_heart_rate for activity in activities if activity.average_heart_rate]
-    max_hr_values = [activity.max_heart_rate for activity in activities if activity.max_heart_rate]
-    longest_session_seconds = max((activity.duration or 0) for activity in activities) if activities else 0
+def summarize_activities(activities: list) -> Dict:
+    """Create aggregate metrics from Garmin activity rows or daily rollup buckets."""
+    buckets = [as_activity_bucket(activity) for activity in activities]
+    total_distance_m = sum(bucket.distance for bucket in buckets)
+    total_duration_s = sum(bucket.duration for bucket in buckets)
+    hr_sum = sum(bucket.hr_sum for bucket in buckets)
+    hr_count = sum(bucket.hr_count for bucket in buckets)
+    max_hr_values = [bucket.max_heart_rate for bucket in buckets if bucket.max_heart_rate]
+    longest_session_seconds = max(bucket.longest_duration for bucket in buckets) if buckets else 0
 
     running_count = 0
     cycling_count = 0
-    running_hr_values = []
-    cycling_hr_values = []
-    for activity in activities:
-        activity_type = (activity.activity_type or "").upper()
+    running_hr = [0, 0]
+    cycling_hr = [0, 0]
+    for bucket in buckets:
+        activity_type = (bucket.activity_type or "").upper()
         if "RUN" in activity_type:
-            running_count += 1
-            if activity.average_heart_rate:
-                running_hr_values.append(activity.average_heart_rate)
+            running_count += bucket.sessions
+            running_hr[0] += bucket.hr_sum
+            running_hr[1] += bucket.hr_count
         if "CYCLE" in activity_type or "BIKE" in activity_type:
-            cycling_count += 1
-            if activity.average_heart_rate:
-                cycling_hr_values.append(activity.average_heart_rate)
+            cycling_count += bucket.sessions
+            cycling_hr[0] += bucket.hr_sum
+            cycling_hr[1] += bucket.hr_count
 
     return {
-        "sessions": len(activities),
+        "sessions": sum(bucket.sessions for bucket in buckets),
         "distance_meters": round(total_distance_m, 2),
         "distance_km": round(total_distance_m / 1000, 2),
         "duration_seconds": int(total_duration_s),
         "duration_hours": round(total_duration_s / 3600, 2),
         "longest_session_minutes": round(longest_session_seconds / 60, 1) if longest_session_seconds else 0.0,
-        "average_heart_rate": round(sum(hr_values) / len(hr_values), 1) if hr_values else None,
+        "average_heart_rate": round(hr_sum / hr_count, 1) if hr_count else None,
         "max_heart_rate": max(max_hr_values) if max_hr_values else None,
         "running_sessions": running_count,
         "cycling_sessions": cycling_count,
-        "running_average_heart_rate": round(sum(running_hr_values) / len(running_hr_values), 1) if running_hr_values else None,
-        "cycling_average_heart_rate": round(sum(cycling_hr_values) / len(cycling_hr_values), 1) if cycling_hr_values else None,
+        "running_average_heart_rate": round(running_hr[0] / running_hr[1], 1) if running_hr[1] else None,
+        "cycling_average_heart_rate": round(cycling_hr[0] / cycling_hr[1], 1) if cycling_hr[1] else None,
     }
 
 
-def _activity_raw(activity: GarminActivityData) -> Dict:
-    """Parse the stored Garmin raw payload defensively."""
-    try:
-        return json.loads(activity.data) if isinstance(activity.data, str) else (activity.data or {})
-    except Exception:
-        return {}
-
-
-def _auxiliary_raw(record: GarminActivityAuxiliaryData) -> Dict:
-    """Parse an auxiliary Garmin payload such as activityDetails."""
-    try:
-        return json.loads(record.data) if isinstance(record.data, str) else (record.data or {})
-    except Exception:
-        return {}
-
-
-def normalize_training_sport(activity: GarminActivityData) -> str:
-    """Map Garmin activity types to the sport buckets used by the coach UI."""
-    activity_type = (activity.activity_type or "").upper()
-    name = (activity.activity_name or "").lower()
-    raw = _activity_raw(activity)
-    raw_type = str(raw.get("activityType") or "").upper()
-    device_name = str(raw.get("deviceName") or "").lower()
-    combined = " ".join([activity_type, raw_type, name, device_name])
-
-    if "SWIM" in combined:
-        return "SWIMMING"
-    if "INDOOR" in combined or "ZWIFT" in combined or "VIRTUAL" in combined:
-        if "CYCLE" in combined or "BIKE" in combined or "CYCLING" in combined:
-            return "INDOOR_CYCLING"
-    if "CYCLE" in combined or "BIKE" in combined or "CYCLING" in combined:
-        return "CYCLING"
-    if "WALK" in combined or "WANDEL" in combined:
-        return "WALKING"
-    if "RUN" in combined:
-        return "RUNNING"
-    if any(token in combined for token in ("STRENGTH", "KRAFT", "GYM", "HIIT", "WEIGHT", "CROSSFIT")):
-        return "STRENGTH_TRAINING"
-    if activity_type == "CARDIO_TRAINING":
-        return "WALKING"
-    return activity_type or "UNKNOWN"
-
-
-def _normalize_detail_sport(detail: Dict, fallback: str) -> str:
-    summary = detail.get("summary") if isinstance(detail.get("summary"), dict) else detail
-    activity_type = str(summary.get("activityType") or detail.get("activityType") or fallback).upper()
-    name = str(summary.get("activityName") or detail.get("activityName") or "").lower()
-    combined = f"{activity_type} {name}"
-    if "SWIM" in combined:
-        return "SWIMMING"
-    if ("INDOOR" in combined or "ZWIFT" in combined or "VIRTUAL" in combined) and (
-        "CYCLE" in combined or "BIKE" in combined or "CYCLING" in combined
-    ):
-        return "INDOOR_CYCLING"
-    if "CYCLE" in combined or "BIKE" in combined or "CYCLING" in combined:
-        return "CYCLING"
-    if "WALK" in combined or "WANDEL" in combined:
-        return "WALKING"
-    if "RUN" in combined:
-        return "RUNNING"
-    return fallback
-
-
-def _activity_metric(activity: GarminActivityData, sport: str) -> Optional[float]:
-    """Return the primary sport metric: pace seconds/unit or speed km/h."""
-    distance = activity.distance or 0
-    duration = activity.duration or 0
-    if distance <= 0 or duration <= 0:
-        return None
-
-    if sport in {"CYCLING", "INDOOR_CYCLING"}:
-        return (distance / duration) * 3.6
-    if sport == "SWIMMING":
-        return duration / (distance / 100)
-    return duration / (distance / 1000)
-
-
-def _segment_metric(segment: Dict, sport: str) -> Optional[float]:
-    duration = segment.get("duration_seconds") or 0
-    distance = segment.get("distance_meters") or 0
-    speed = segment.get("speed_mps")
-    if sport in {"CYCLING", "INDOOR_CYCLING"}:
-        if speed:
-            return speed * 3.6
-        return (distance / duration) * 3.6 if distance > 0 and duration > 0 else None
-    if sport == "SWIMMING":
-        return duration / (distance / 100) if distance > 0 and duration > 0 else None
-    return duration / (distance / 1000) if distance > 0 and duration > 0 else None
+def _percentile(values: list[float], percentile: float) -> Optional[float]:
+    return _counted_percentile(Counter(values), percentile)
 
 
-def _percentile(values: list[float], percentile: float) -> Optional[float]:
-    if not values:
+def _counted_percentile(counts: Mapping[float, int], percentile: float) -> Optional[float]:
+    """Interpolated percentile of values given as value -> number of occurrences."""
+    ordered = sorted((value, count) for value, count in counts.items() if count > 0)
+    total = sum(count for _, count in ordered)
+    if not total:
         return None
-    ordered = sorted(values)
-    if len(ordered) == 1:
-        return ordered[0]
-    position = (len(ordered) - 1) * percentile
+    position = (total - 1) * percentile
     lower = int(position)
-    upper = min(lower + 1, len(ordered) - 1)
+    upper = min(lower + 1, total - 1)
     weight = position - lower
-    return ordered[lower] * (1 - weight) + ordered[upper] * weight
+    lower_value = upper_value = None
+    seen = 0
+    for value, count in ordered:
+        seen += count
+        if lower_value is None and lower < seen:
+            lower_value = value
+        if upper < seen:
+            upper_value = value
+            break
+    return lower_value * (1 - weight) + upper_value * weight
 
 
 def _median(values: list[float]) -> Optional[float]:
     return _percentile(values, 0.5)
 
 
-def _range_around(values: list[float], fallback_values: list[float], higher_is_harder: bool) -> Optional[tuple[float, float]]:
-    source = values or fallback_values
-    if not source:
+def _range_around(
+    values: Mapping[float, int],
+    fallback_values: Mapping[float, int],
+    higher_is_harder: bool,
+) -> Optional[tuple[float, float]]:
+    """Interquartile range (or median +-6% below 4 values) of counted values, else of the fallback."""
+    source = values if sum(values.values()) else fallback_values
+    size = sum(source.values())
+    if not size:
         return None
-    if len(source) >= 4:
-        low = _percentile(source, 0.25)
-        high = _percentile(source, 0.75)
+    if size >= 4:
+        low = _counted_percentile(source, 0.25)
+        high = _counted_percentile(source, 0.75)
     else:
-        center = _median(source)
+        center = _counted_percentile(source, 0.5)
         spread = max(center * 0.06, 2.0) if center else 0
         low = center - spread
         high = center + spread
@@ -672,174 +631,46 @@ def _metric_plausible_for_training_target(metric: Optional[float], sport: str, e
 
 
 def _build_activity_detail_index(details: list[GarminActivityAuxiliaryData]) -> Dict[str, Dict]:
-    """Index activityDetails by all known Garmin identifiers."""
-    index: Dict[str, Dict] = {}
-    for record in details:
-        payload = _auxiliary_raw(record)
-        summary = payload.get("summary") if isinstance(payload.get("summary"), dict) else payload
-        keys = [
-            record.activity_id,
-            record.summary_id,
-            payload.get("activityId"),
-            payload.get("summaryId"),
-            summary.get("activityId") if isinstance(summary, dict) else None,
-            summary.get("summaryId") if isinstance(summary, dict) else None,
-        ]
-        for key in keys:
-            if key is not None:
-                index[str(key)] = payload
-                if str(key).endswith("-detail"):
-                    index[str(key).replace("-detail", "")] = payload
-    return index
-
-
-def _activity_detail_for(activity: GarminActivityData, detail_index: Dict[str, Dict]) -> Optional[Dict]:
-    keys = [
-        activity.activity_id,
-        activity.summary_id,
-        str(activity.summary_id).replace("-detail", "") if activity.summary_id else None,
-    ]
-    for key in keys:
-        if key is not None and str(key) in detail_index:
-            return detail_index[str(key)]
-    return None
-
-
-def _sample_elapsed(sample: Dict, first_start: Optional[int]) -> Optional[float]:
-    for key in ["timerDurationInSeconds", "movingDurationInSeconds", "clockDurationInSeconds"]:
-        value = sample.get(key)
-        if value is not None:
-            return float(value)
-    start = sample.get("startTimeInSeconds")
-    if start is not None and first_start is not None:
-        return float(start - first_start)
-    return None
-
-
-def _samples_to_segment(samples: list[Dict], sport: str) -> Optional[Dict]:
-    clean = [s for s in samples if isinstance(s, dict)]
-    if len(clean) < 2:
-        return None
-    first = clean[0]
-    last = clean[-1]
-    first_start = first.get("startTimeInSeconds")
-    start_elapsed = _sample_elapsed(first, first_start)
-    end_elapsed = _sample_elapsed(last, first_start)
-    if start_elapsed is None or end_elapsed is None:
-        return None
-    duration = max(0, end_elapsed - start_elapsed)
-    start_distance = first.get("totalDistanceInMeters")
-    end_distance = last.get("totalDistanceInMeters")
-    distance = max(0, (end_distance or 0) - (start_distance or 0)) if end_distance is not None and start_distance is not None else 0
-    hr_values = [s.get("heartRate") for s in clean if s.get("heartRate")]
-    speed_values = [s.get("speedMetersPerSecond") for s in clean if s.get("speedMetersPerSecond")]
-    avg_speed = sum(speed_values) / len(speed_values) if speed_values else ((distance / duration) if distance and duration else None)
-
-    if duration < 45:
-        return None
-    if sport != "SWIMMING" and distance <= 20 and not avg_speed:
-        return None
-
-    return {
-        "duration_seconds": duration,
-        "distance_meters": distance,
-        "heart_rate": sum(hr_values) / len(hr_values) if hr_values else None,
-        "speed_mps": avg_speed,
-        "sample_count": len(clean),
-    }
-
-
-def _segments_from_detail(detail: Dict, sport: str) -> list[Dict]:
-    """Extract useful effort segments from activityDetails samples and laps."""
-    detail_sport = _normalize_detail_sport(detail, sport)
-    samples = sorted(
-        [s for s in detail.get("samples", []) if isinstance(s, dict) and s.get("startTimeInSeconds")],
-        key=lambda s: s.get("startTimeInSeconds"),
-    )
-    if len(samples) < 2:
-        return []
-
-    laps = sorted(
-        [lap.get("startTimeInSeconds") for lap in detail.get("laps", []) if isinstance(lap, dict) and lap.get("startTimeInSeconds")],
-    )
-    segments: list[Dict] = []
-    if len(laps) >= 2:
-        boundaries = laps + [samples[-1]["startTimeInSeconds"] + 1]
-        for start, end in zip(boundaries, boundaries[1:]):
-            lap_samples = [sample for sample in samples if start <= sample.get("startTimeInSeconds", 0) < end]
-            segment = _samples_to_segment(lap_samples, detail_sport)
-            if segment:
-                segment["source"] = "lap"
-                segments.append(segment)
-    else:
-        first_start = samples[0].get("startTimeInSeconds")
-        bucket_seconds = 300
-        buckets: Dict[int, list[Dict]] = {}
-        for sample in samples:
-            elapsed = sample.get("startTimeInSeconds", first_start) - first_start
-            bucket = int(elapsed // bucket_seconds)
-            buckets.setdefault(bucket, []).append(sample)
-        for bucket_samples in buckets.values():
-            segment = _samples_to_segment(bucket_samples, detail_sport)
-            if segment:
-                segment["source"] = "sample_window"
-                segments.append(segment)
-
-    return segments
+    """Index activityDetails by all known Garmin identifiers (once per list inside a payload memo)."""
+    return memoized("detail_index", details, lambda: index_activity_details(details))
 
 
 def _classify_effort(activity: GarminActivityData, sport_max_hr: Optional[int]) -> str:
-    name = (activity.activity_name or "").lower()
-    if any(word in name for word in ["easy", "herstel", "recovery", "rustig", "walk", "wandel"]):
-        return "easy"
-    if any(word in name for word in ["duur", "endurance", "zone 2", "z2", "lsd", "long slow"]):
-        return "endurance"
-    if any(word in name for word in ["tempo", "threshold", "drempel"]):
-        return "threshold"
-    if any(word in name for word in ["interval", "vo2", "sprint"]):
-        return "vo2"
-
     from app.core.hr_profile import classify_effort_from_hr
 
-    effort = classify_effort_from_hr(activity.average_heart_rate, sport_max_hr, sport_max_hr)
-    if effort:
-        return effort
-
-    return "endurance"
+    return (
+        name_effort(activity)
+        or classify_effort_from_hr(activity.average_heart_rate, sport_max_hr, sport_max_hr)
+        or "endurance"
+    )
 
 
 def _classify_segment_effort(segment: Dict, sport_max_hr: Optional[int], metric: Optional[float], sport: str) -> str:
     from app.core.hr_profile import classify_effort_from_hr
 
-    effort = classify_effort_from_hr(segment.get("heart_rate"), sport_max_hr, sport_max_hr)
-    if effort:
-        return effort
-
-    duration = segment.get("duration_seconds") or 0
-    if duration >= 1200:
-        return "endurance"
-    if duration <= 240:
-        return "vo2"
-    return "threshold" if sport in {"RUNNING", "CYCLING", "INDOOR_CYCLING"} else "endurance"
+    return (
+        classify_effort_from_hr(segment.get("heart_rate"), sport_max_hr, sport_max_hr)
+        or segment_fallback_effort(segment, sport)
+    )
 
 
 def _target_range_for_effort(
-    metric_values: dict[str, list[float]],
-    all_metrics: list[float],
+    metric_values: dict[str, Counter],
+    all_metrics: Counter,
     sport: str,
     effort: str,
 ) -> Optional[tuple[float, float]]:
     higher_is_harder = sport in {"CYCLING", "INDOOR_CYCLING"}
-    source = metric_values.get(effort, [])
+    source = metric_values.get(effort, Counter())
     fallback_order = {
         "easy": ["easy", "endurance"],
         "endurance": ["endurance", "easy", "threshold"],
         "threshold": ["threshold", "vo2", "endurance"],
         "vo2": ["vo2", "threshold"],
     }[effort]
-    fallback = []
+    fallback = Counter()
     for key in fallback_order:
-        fallback.extend(metric_values.get(key, []))
+        fallback.update(metric_values.get(key, Counter()))
 
     metric_range = _range_around(source, fallback or all_metrics, higher_is_harder)
     if not metric_range:
@@ -865,81 +696,53 @@ def build_personal_training_profile(
     details: Optional[list[GarminActivityAuxiliaryData]] = None,
 ) -> Dict:
     """Build personalized training targets from details/laps with summary fallback."""
-    detail_index = _build_activity_detail_index(details or [])
-    sports: dict[str, list[GarminActivityData]] = {}
-    for activity in activities:
-        sport = normalize_training_sport(activity)
-        if sport in {"UNKNOWN", ""}:
-            continue
-        sports.setdefault(sport, []).append(activity)
+    return _training_profile_from_sketches(sketch_activities(activities, _build_activity_detail_index(details or [])))
 
-    profile: Dict[str, Dict] = {}
-    for sport, sport_activities in sports.items():
-        from app.core.hr_profile import resolve_hr_profile
-
-        sport_max_hr = resolve_hr_profile(sport_activities).effective_max
-        metric_values: dict[str, list[float]] = {"easy": [], "endurance": [], "threshold": [], "vo2": []}
-        hr_values: dict[str, list[float]] = {"easy": [], "endurance": [], "threshold": [], "vo2": []}
-        detail_metric_values: dict[str, list[float]] = {"easy": [], "endurance": [], "threshold": [], "vo2": []}
-        detail_hr_values: dict[str, list[float]] = {"easy": [], "endurance": [], "threshold": [], "vo2": []}
-        all_metrics = []
-        detail_segment_count = 0
-        detail_activity_count = 0
-
-        for activity in sport_activities:
-            detail = _activity_detail_for(activity, detail_index)
-            segments = _segments_from_detail(detail, sport) if detail else []
-            if segments:
-                detail_activity_count += 1
-                detail_segment_count += len(segments)
-                for segment in segments:
-                    metric = _segment_metric(segment, sport)
-                    effort = _classify_segment_effort(segment, sport_max_hr, metric, sport)
-                    if _metric_plausible_for_training_target(metric, sport, effort):
-                        detail_metric_values[effort].append(metric)
-                        all_metrics.append(metric)
-                    if segment.get("heart_rate"):
-                        detail_hr_values[effort].append(segment["heart_rate"])
-                continue
 
-            effort = _classify_effort(activity, sport_max_hr)
-            metric = _activity_metric(activity, sport)
+def _training_profile_from_sketches(sketches: Dict[str, EffortSketch]) -> Dict:
+    """Personalized training targets per sport from (stored or freshly built) effort sketches."""
+    from app.core.hr_profile import classify_effort_from_hr, resolve_hr_profile_from_counts
+
+    efforts = ["easy", "endurance", "threshold", "vo2"]
+    profile: Dict[str, Dict] = {}
+    for sport, sketch in sketches.items():
+        sport_max_hr = resolve_hr_profile_from_counts(sketch.max_heart_rates).effective_max
+        metric_values: dict[str, Counter] = {effort: Counter() for effort in efforts}
+        hr_values: dict[str, Counter] = {effort: Counter() for effort in efforts}
+        detail_metric_values: dict[str, Counter] = {effort: Counter() for effort in efforts}
+        detail_hr_values: dict[str, Counter] = {effort: Counter() for effort in efforts}
+        all_metrics = Counter()
+
+        for (source, heart_rate, hint, fallback, metric), count in sketch.observations.items():
+            effort = hint or classify_effort_from_hr(heart_rate, sport_max_hr, sport_max_hr) or fallback
+            detail = source == "detail"
             if _metric_plausible_for_training_target(metric, sport, effort):
-                metric_values[effort].append(metric)
-                all_metrics.append(metric)
-            if activity.average_heart_rate:
-                hr_values[effort].append(activity.average_heart_rate)
+                (detail_metric_values if detail else metric_values)[effort][metric] += count
+                all_metrics[metric] += count
+            if heart_rate:
+                (detail_hr_values if detail else hr_values)[effort][heart_rate] += count
 
         zones = {}
-        for effort in ["easy", "endurance", "threshold", "vo2"]:
-            merged_metric_values = {
-                key: detail_metric_values[key] or metric_values[key]
-                for key in ["easy", "endurance", "threshold", "vo2"]
-            }
-            merged_hr_values = {
-                key: detail_hr_values[key] or hr_values[key]
-                for key in ["easy", "endurance", "threshold", "vo2"]
-            }
+        for effort in efforts:
+            merged_metric_values = {key: detail_metric_values[key] or metric_values[key] for key in efforts}
+            merged_hr_values = {key: detail_hr_values[key] or hr_values[key] for key in efforts}
             metric_range = _target_range_for_effort(merged_metric_values, all_metrics, sport, effort)
-            hr_range = _range_around(
-                merged_hr_values.get(effort, []),
-                [a.average_heart_rate for a in sport_activities if a.average_heart_rate],
-                True,
-            )
+            hr_range = _range_around(merged_hr_values.get(effort, Counter()), sketch.activity_heart_rates, True)
             zone_sample_size = (
-                len(detail_metric_values.get(effort, []))
-                or len(metric_values.get(effort, []))
-                or len(detail_hr_values.get(effort, []))
-                or len(hr_values.get(effort, []))
+                sum(detail_metric_values[effort].values())
+                or sum(metric_values[effort].values())
+                or sum(detail_hr_values[effort].values())
+                or sum(hr_values[effort].values())
             )
             zones[effort] = {
                 "metric": _format_metric_range(metric_range, sport),
                 "hr": _format_hr_range(hr_range),
                 "sample_size": zone_sample_size,
-                "source": "activityDetails" if detail_metric_values.get(effort) or detail_hr_values.get(effort) else "activitySummaries",
+                "source": "activityDetails" if detail_metric_values[effort] or detail_hr_values[effort] else "activitySummaries",
             }
 
-        session_count = len(sport_activities)
+        session_count = sketch.sessions
+        detail_segment_count = sketch.detail_segments
         confidence = "low"
         if detail_segment_count >= 8 or session_count >= 10:
             confidence = "high"
@@ -953,7 +756,7 @@ def build_personal_training_profile(
             "metric_type": "speed" if sport in {"CYCLING", "INDOOR_CYCLING"} else "pace",
             "metric_unit": "km/u" if sport in {"CYCLING", "INDOOR_CYCLING"} else ("/100m" if sport == "SWIMMING" else "/km"),
             "max_heart_rate_observed": sport_max_hr,
-            "detail_activities": detail_activity_count,
+            "detail_activities": sketch.detail_activities,
             "detail_segments": detail_segment_count,
             "zones": zones,
             "notes": [
@@ -990,8 +793,7 @@ def build_sport_baselines(activities: list[GarminActivityData], days: int, now:
             "duration_hours": round(baseline_totals["duration_hours"] / 4, 2),
             "average_heart_rate": baseline_totals["average_heart_rate"],
         }
-        baseline_duration = baseline_weekly["duration_hours"]
-        load_ratio = round(current_metrics["duration_hours"] / baseline_duration, 2) if baseline_duration else None
+        load_ratio = compute_load_metrics(current + baseline, now=now, acute_days=days).load_ratio
         result[sport] = {
             "sport": sport,
             "days": days,
@@ -1069,7 +871,7 @@ def _activity_interval_structure(segments: list[Dict], sport_max_hr: Optional[in
         return None
     hard_segments = []
     for segment in segments:
-        metric = _segment_metric(segment, sport)
+        metric = segment_metric(segment, sport)
         effort = _classify_segment_effort(segment, sport_max_hr, metric, sport)
         duration = segment.get("duration_seconds") or 0
         if effort in {"threshold", "vo2"}:
@@ -1194,8 +996,8 @@ def build_workout_patterns(
         sport = normalize_training_sport(activity)
         if sport in {"", "UNKNOWN"}:
             continue
-        detail = _activity_detail_for(activity, detail_index)
-        segments = _segments_from_detail(detail, sport) if detail else []
+        detail = activity_detail_for(activity, detail_index)
+        segments = detail_segments_for(detail, sport, detail_index) if detail else []
         workout = classify_workout_type(activity, segments, sport_max_hr.get(sport), sport)
         classified.append({
             **workout,
@@ -1451,9 +1253,9 @@ def request_health_backfill_range(
     return results
 
 
-def build_weekly_activity_trend(activities: list[GarminActivityData]) -> list[Dict]:
-    """Build weekly aggregated trend data for a list of activities."""
-    weekly: Dict[str, Dict] = {}
+def build_weekly_activity_trend(activities: list) -> list[Dict]:
+    """Build weekly aggregated trend data for activity rows or daily rollup buckets."""
+    weekly: Dict[str, ActivityBucket] = {}
 
     for activity in activities:
         if not activity.start_time:
@@ -1461,32 +1263,21 @@ def build_weekly_activity_trend(activities: list[GarminActivityData]) -> list[Di
 
         week_start_date = (activity.start_time - timedelta(days=activity.start_time.weekday())).date()
         week_key = week_start_date.isoformat()
+        bucket = as_activity_bucket(activity)
         if week_key not in weekly:
-            weekly[week_key] = {
-                "week_start": week_key,
-                "sessions": 0,
-                "distance_meters": 0.0,
-                "duration_seconds": 0,
-                "heart_rates": [],
-            }
-
-        weekly[week_key]["sessions"] += 1
-        weekly[week_key]["distance_meters"] += activity.distance or 0.0
-        weekly[week_key]["duration_seconds"] += activity.duration or 0
-        if activity.average_heart_rate:
-            weekly[week_key]["heart_rates"].append(activity.average_heart_rate)
+            weekly[week_key] = ActivityBucket(start_time=bucket.start_time, activity_type="")
+        weekly[week_key].add(bucket)
 
     trend = []
     for week_key in sorted(weekly.keys()):
         item = weekly[week_key]
-        heart_rates = item["heart_rates"]
         trend.append(
             {
                 "week_start": week_key,
-                "sessions": item["sessions"],
-                "distance_km": round(item["distance_meters"] / 1000, 2),
-                "duration_hours": round(item["duration_seconds"] / 3600, 2),
-                "average_heart_rate": round(sum(heart_rates) / len(heart_rates), 1) if heart_rates else None,
+                "sessions": item.sessions,
+                "distance_km": round(item.distance / 1000, 2),
+                "duration_hours": round(item.duration / 3600, 2),
+                "average_heart_rate": round(item.hr_sum / item.hr_count, 1) if item.hr_count else None,
             }
         )
 
@@ -1682,21 +1473,13 @@ def build_weekly_summary(
     if hr_delta is not None:
         summary_parts.append(f"Gemiddelde hartslag trend: {hr_delta:+.1f} bpm.")
 
-    if load_ratio is None:
-        advice = "Nog beperkte historiek: focus op consistente rustige sessies."
-    elif load_ratio > 1.25:
-        advice = "Belasting stijgt sterk; plan extra herstel en beperk intensiteit."
-    elif load_ratio < 0.75:
-        advice = "Belasting ligt laag; voeg eventueel 1 rustige sessie toe."
-    else:
-        advice = "Belasting is goed in balans; huidige structuur aanhouden."
-    summary_parts.append(f"Advies: {advice}")
+    summary_parts.append(f"Advies: {load_advice_nl(load_ratio)}")
 
     return " ".join(summary_parts)
 
 
 @router.get("/auth/start")
-async def start_oauth(
+def start_oauth(
     user_id: Optional[int] = Query(None, description="Internal user ID"),
     telegram_user_id: Optional[int] = Query(None, description="Legacy Telegram user ID"),
     db: Session = Depends(get_db)
@@ -1750,7 +1533,7 @@ async def start_oauth(
 
 
 @router.get("/auth/callback")
-async def oauth_callback(
+def oauth_callback(
     code: str = Query(..., description="Authorization code"),
     state: str = Query(..., description="State parameter"),
     db: Session = Depends(get_db)
@@ -1852,7 +1635,7 @@ async def oauth_callback(
 
 
 @router.get("/auth/status")
-async def check_auth_status(
+def check_auth_status(
     user_id: Optional[int] = Query(None, description="Internal user ID"),
     telegram_user_id: Optional[int] = Query(None, description="Legacy Telegram user ID"),
     db: Session = Depends(get_db)
@@ -1935,7 +1718,7 @@ async def check_auth_status(
 
 
 @router.delete("/auth/disconnect")
-async def disconnect_garmin(
+def disconnect_garmin(
     user_id: Optional[int] = Query(None, description="Internal user ID"),
     telegram_user_id: Optional[int] = Query(None, description="Legacy Telegram user ID"),
     db: Session = Depends(get_db)
@@ -1972,7 +1755,7 @@ async def disconnect_garmin(
 # ============================================================================
 
 @router.get("/data/recent")
-async def get_recent_data(
+def get_recent_data(
     user_id: Optional[int] = Query(None, description="Internal user ID"),
     telegram_user_id: Optional[int] = Query(None, description="Legacy Telegram user ID"),
     days: int = Query(7, description="Number of days to fetch", ge=1, le=90),
@@ -1999,65 +1782,136 @@ async def get_recent_data(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+ACTIVITY_LIST_COLUMNS = {
+    "id": GarminActivityData.id,
+    "summary_id": GarminActivityData.summary_id,
+    "summary_type": GarminActivityData.summary_type,
+    "activity_id": GarminActivityData.activity_id,
+    "activity_type": GarminActivityData.activity_type,
+    "activity_name": GarminActivityData.activity_name,
+    "start_time": GarminActivityData.start_time,
+    "duration_seconds": GarminActivityData.duration,
+    "distance_meters": GarminActivityData.distance,
+    "average_heart_rate": GarminActivityData.average_heart_rate,
+    "max_heart_rate": GarminActivityData.max_heart_rate,
+    "calories": GarminActivityData.calories,
+    "manual": GarminActivityData.manual,
+    "raw_data": GarminActivityData.data,
+}
+# raw_data carries the full Garmin payload and is only sent when asked for by name.
+DEFAULT_ACTIVITY_LIST_FIELDS = [name for name in ACTIVITY_LIST_COLUMNS if name != "raw_data"]
+
+
+def _activity_list_fields(fields: Optional[str]) -> list[str]:
+    if not fields:
+        return DEFAULT_ACTIVITY_LIST_FIELDS
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in ACTIVITY_LIST_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown activity fields: {', '.join(unknown)}")
+    return requested
+
+
+def encode_activity_cursor(start_time: datetime, activity_id: int) -> str:
+    return f"{start_time.isoformat()}_{activity_id}"
+
+
+def decode_activity_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        start_text, id_text = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(start_text), int(id_text)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid activities cursor")
+
+
+def _activity_list_aggregates(db: Session, user_id: int, start_date: datetime) -> Dict[str, Any]:
+    """Summary, type distribution and weekly trend of the whole window from the daily rollup."""
+    buckets = load_activity_buckets(db, user_id, start_date)
+    type_distribution: Dict[str, int] = {}
+    for bucket in buckets:
+        activity_type = (bucket.activity_type or "UNKNOWN").upper()
+        type_distribution[activity_type] = type_distribution.get(activity_type, 0) + bucket.sessions
+    return {
+        "summary": summarize_activities(buckets),
+        "type_distribution": type_distribution,
+        "weekly_trend": build_weekly_activity_trend(buckets),
+    }
+
+
 @router.get("/activities")
-async def list_activities(
+def list_activities(
     user_id: Optional[int] = Query(None, description="Internal user ID"),
     telegram_user_id: Optional[int] = Query(None, description="Legacy Telegram user ID"),
     limit: int = Query(200, ge=1, le=1000, description="Maximum activities to return"),
     period_days: int = Query(30, ge=7, le=365, description="Number of days to look back"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated activity fields; raw_data only on request"),
+    db: Session = Depends(get_read_db)
 ):
-    """List recent Garmin activities stored for a user."""
+    """
+    List recent Garmin activities stored for a user, newest first.
+
+    Pages are keyed on (start_time, id): pass next_cursor back as `cursor` for the next
+    page. Only the requested columns are selected. The first page also carries the
+    summary, type distribution and weekly trend of the whole window, read from the
+    daily rollup.
+    """
     try:
         resolved_user_id = resolve_user_id(user_id, telegram_user_id)
+        db.for_user(resolved_user_id)
+        selected = _activity_list_fields(fields)
         start_date = datetime.utcnow() - timedelta(days=period_days)
-        activities = db.query(GarminActivityData).filter(
+
+        query = db.query(
+            GarminActivityData.start_time.label("_cursor_start"),
+            GarminActivityData.id.label("_cursor_id"),
+            *(ACTIVITY_LIST_COLUMNS[name] for name in selected),
+        ).filter(
             GarminActivityData.user_id == resolved_user_id,
             GarminActivityData.summary_type.in_(["activities", "manuallyUpdatedActivities"]),
             GarminActivityData.start_time >= start_date
-        ).order_by(GarminActivityData.start_time.desc()).limit(limit).all()
-
-        summary = summarize_activities(activities)
-        type_distribution: Dict[str, int] = {}
-        for activity in activities:
-            activity_type = (activity.activity_type or "UNKNOWN").upper()
-            type_distribution[activity_type] = type_distribution.get(activity_type, 0) + 1
-
-        weekly_trend = build_weekly_activity_trend(activities)
-
-        return {
-            "activities": [
-                {
-                    "id": activity.id,
-                    "summary_id": activity.summary_id,
-                    "summary_type": activity.summary_type,
-                    "activity_id": activity.activity_id,
-                    "activity_type": activity.activity_type,
-                    "activity_name": activity.activity_name,
-                    "start_time": activity.start_time.isoformat() if activity.start_time else None,
-                    "duration_seconds": activity.duration,
-                    "distance_meters": activity.distance,
-                    "average_heart_rate": activity.average_heart_rate,
-                    "max_heart_rate": activity.max_heart_rate,
-                    "calories": activity.calories,
-                    "manual": activity.manual,
-                    "raw_data": json.loads(activity.data) if isinstance(activity.data, str) else activity.data,
-                }
-                for activity in activities
-            ],
+        )
+        if cursor:
+            after_start, after_id = decode_activity_cursor(cursor)
+            query = query.filter(
+                or_(
+                    GarminActivityData.start_time < after_start,
+                    and_(GarminActivityData.start_time == after_start, GarminActivityData.id < after_id),
+                )
+            )
+        rows = query.order_by(
+            GarminActivityData.start_time.desc(),
+            GarminActivityData.id.desc(),
+        ).limit(limit + 1).all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        activities = []
+        for row in rows:
+            item = {name: value for name, value in zip(selected, row[2:])}
+            if item.get("start_time"):
+                item["start_time"] = item["start_time"].isoformat()
+            activities.append(item)
+
+        payload: Dict[str, Any] = {
+            "activities": activities,
             "count": len(activities),
             "period_days": period_days,
-            "summary": summary,
-            "type_distribution": type_distribution,
-            "weekly_trend": weekly_trend,
+            "next_cursor": encode_activity_cursor(rows[-1][0], rows[-1][1]) if has_more else None,
         }
+        if not cursor:
+            payload.update(_activity_list_aggregates(db, resolved_user_id, start_date))
+        return payload
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"List activities failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/data/import-status")
-async def garmin_import_status(
+def garmin_import_status(
+    request: Request,
     user_id: Optional[int] = Query(None, description="Internal user ID"),
     telegram_user_id: Optional[int] = Query(None, description="Legacy Telegram user ID"),
     period_days: int = Query(30, ge=1, le=365, description="Number of days to inspect"),
@@ -2066,34 +1920,40 @@ async def garmin_import_status(
     """Return stored Garmin record counts by summary type for import diagnostics."""
     try:
         resolved_user_id = resolve_user_id(user_id, telegram_user_id)
-        return build_import_status_payload(db, resolved_user_id, period_days)
+        return cached_response(
+            request,
+            db,
+            resolved_user_id,
+            "import_status",
+            {"period_days": period_days},
+            lambda: build_import_status_payload(db, resolved_user_id, period_days),
+            freshness_seconds=IMPORT_STATUS_FRESHNESS_SECONDS,
+        )
     except Exception as e:
         logger.error(f"Import status failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/analysis/weekly")
-async def weekly_analysis(
+def weekly_analysis(
     user_id: Optional[int] = Query(None, description="Internal user ID"),
     telegram_user_id: Optional[int] = Query(None, description="Legacy Telegram user ID"),
     days: int = Query(7, ge=1, le=90, description="Window size in days"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Return training summary for a given window and baseline comparison."""
     try:
         resolved_user_id = resolve_user_id(user_id, telegram_user_id)
+        db.for_user(resolved_user_id)
         now = datetime.utcnow()
         current_start = now - timedelta(days=days)
         baseline_start = current_start - timedelta(days=28)
 
-        activities = db.query(GarminActivityData).filter(
-            GarminActivityData.user_id == resolved_user_id,
-            GarminActivityData.summary_type.in_(["activities", "manuallyUpdatedActivities"]),
-            GarminActivityData.start_time >= baseline_start
-        ).order_by(GarminActivityData.start_time.desc()).all()
+        # Whole days come from the daily rollup; only the days cut by a window edge read raw rows.
+        buckets = load_activity_buckets(db, resolved_user_id, baseline_start, boundaries=[current_start])
 
-        current_week = [activity for activity in activities if activity.start_time >= current_start]
-        baseline_window = [activity for activity in activities if baseline_start <= activity.start_time < current_start]
+        current_week = [bucket for bucket in buckets if bucket.start_time >= current_start]
+        baseline_window = [bucket for bucket in buckets if baseline_start <= bucket.start_time < current_start]
 
         current_metrics = summarize_activities(current_week)
         baseline_totals = summarize_activities(baseline_window)
@@ -2106,10 +1966,7 @@ async def weekly_analysis(
             "cycling_sessions": round(baseline_totals["cycling_sessions"] / 4, 2),
         }
 
-        baseline_duration = baseline_weekly["duration_hours"]
-        load_ratio = round(
-            (current_metrics["duration_hours"] / baseline_duration), 2
-        ) if baseline_duration and baseline_duration > 0 else None
+        load_ratio = compute_load_metrics(buckets, now=now, acute_days=days).load_ratio
 
         hr_delta = None
         if current_metrics["average_heart_rate"] is not None and baseline_weekly["average_heart_rate"] is not None:
@@ -2124,9 +1981,9 @@ async def weekly_analysis(
 
         if load_ratio is None:
             recommendation = "Not enough historical data yet. Keep building consistent easy sessions."
-        elif load_ratio > 1.25:
+        elif load_ratio > LOAD_HIGH_THRESHOLD:
             recommendation = "High load increase this week. Keep next sessions easy and prioritize recovery."
-        elif load_ratio < 0.75:
+        elif load_ratio < LOAD_LOW_THRESHOLD:
             recommendation = "Training load is below baseline. Add one extra easy session if recovery is good."
         else:
             recommendation = "Load looks balanced versus your baseline. Keep the current structure."
@@ -2140,9 +1997,9 @@ async def weekly_analysis(
 
         highlights = []
         if load_ratio is not None:
-            if load_ratio > 1.25:
+            if load_ratio > LOAD_HIGH_THRESHOLD:
                 highlights.append({"type": "warning", "label": "Hoge belasting", "text": f"Load ratio {load_ratio}x — plan extra herstel"})
-            elif load_ratio < 0.75:
+            elif load_ratio < LOAD_LOW_THRESHOLD:
                 highlights.append({"type": "info", "label": "Lage belasting", "text": f"Load ratio {load_ratio}x — ruimte om op te bouwen"})
             else:
                 highlights.append({"type": "success", "label": "Gebalanceerd", "text": f"Load ratio {load_ratio}x — goed bezig"})
@@ -2182,88 +2039,40 @@ async def weekly_analysis(
 
 
 @router.get("/training/profile")
-async def training_profile(
+def training_profile(
+    request: Request,
     user_id: Optional[int] = Query(None, description="Internal user ID"),
     telegram_user_id: Optional[int] = Query(None, description="Legacy Telegram user ID"),
     days: int = Query(120, ge=30, le=365, description="Days used to learn personal targets"),
     current_days: int = Query(7, ge=1, le=30, description="Current load window for sport baselines"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Return personalized targets, sport-specific load baselines, and workout patterns."""
     try:
         resolved_user_id = resolve_user_id(user_id, telegram_user_id)
-        now = datetime.utcnow()
-        start_date = now - timedelta(days=max(days, current_days + 28))
-        activities = db.query(GarminActivityData).filter(
-            GarminActivityData.user_id == resolved_user_id,
-            GarminActivityData.summary_type.in_(["activities", "manuallyUpdatedActivities"]),
-            GarminActivityData.start_time >= start_date,
-        ).order_by(GarminActivityData.start_time.desc()).all()
-        activity_details = db.query(GarminActivityAuxiliaryData).filter(
-            GarminActivityAuxiliaryData.user_id == resolved_user_id,
-            GarminActivityAuxiliaryData.summary_type == "activityDetails",
-            or_(
-                GarminActivityAuxiliaryData.start_time >= start_date,
-                GarminActivityAuxiliaryData.start_time.is_(None),
-            ),
-        ).order_by(GarminActivityAuxiliaryData.start_time.desc()).all()
-
-        sport_baselines = build_sport_baselines(activities, current_days, now)
-        return {
-            "period_days": days,
-            "current_days": current_days,
-            "generated_at": now.isoformat(),
-            "personal_targets": build_personal_training_profile(activities, activity_details),
-            "sport_baselines": sport_baselines,
-            "workout_patterns": build_workout_patterns(activities, activity_details),
-            "dominant_sport": _dominant_sport(sport_baselines),
-            "method": {
-                "phase": 2,
-                "source": "Garmin activityDetails samples/laps with activity summary fallback",
-                "activity_details": len(activity_details),
-                "notes": [
-                    "Targets are learned per sport from detail segments where available.",
-                    "Workout patterns are inferred on demand from details, activity names, and summaries.",
-                    "Four-week load comparison is calculated inside the same sport type.",
-                    "Activity summaries remain the fallback when details are missing.",
-                ],
-            },
-        }
+        db.for_user(resolved_user_id)
+        return cached_response(
+            request,
+            db,
+            resolved_user_id,
+            "training_profile",
+            {"days": days, "current_days": current_days},
+            lambda: build_training_context(db, resolved_user_id, days, current_days),
+            freshness_seconds=TRAINING_PROFILE_FRESHNESS_SECONDS,
+        )
     except Exception as e:
         logger.error(f"Training profile failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 def _training_context(db: Session, user_id: int, days: int = 120, current_days: int = 7) -> Dict[str, Any]:
-    now = datetime.utcnow()
-    start_date = now - timedelta(days=max(days, current_days + 28))
-    activities = db.query(GarminActivityData).filter(
-        GarminActivityData.user_id == user_id,
-        GarminActivityData.summary_type.in_(["activities", "manuallyUpdatedActivities"]),
-        GarminActivityData.start_time >= start_date,
-    ).order_by(GarminActivityData.start_time.desc()).all()
-    activity_details = db.query(GarminActivityAuxiliaryData).filter(
-        GarminActivityAuxiliaryData.user_id == user_id,
-        GarminActivityAuxiliaryData.summary_type == "activityDetails",
-        or_(
-            GarminActivityAuxiliaryData.start_time >= start_date,
-            GarminActivityAuxiliaryData.start_time.is_(None),
-        ),
-    ).order_by(GarminActivityAuxiliaryData.start_time.desc()).all()
-    sport_baselines = build_sport_baselines(activities, current_days, now)
-    return {
-        "period_days": days,
-        "current_days": current_days,
-        "generated_at": now.isoformat(),
-        "personal_targets": build_personal_training_profile(activities, activity_details),
-        "sport_baselines": sport_baselines,
-        "workout_patterns": build_workout_patterns(activities, activity_details),
-        "dominant_sport": _dominant_sport(sport_baselines),
-    }
+    """Materialized training context; rebuilt only when the user's activity data or the day changed."""
+    return get_training_context(db, user_id, days, current_days)
 
 
 @router.get("/training/recommendation")
-async def training_recommendation(
+def training_recommendation(
+    request: Request,
     user_id: Optional[int] = Query(None, description="Internal user ID"),
     telegram_user_id: Optional[int] = Query(None, description="Legacy Telegram user ID"),
     days: int = Query(120, ge=30, le=365),
@@ -2276,27 +2085,39 @@ async def training_recommendation(
 ):
     """Return the canonical backend-owned workout recommendation for the app."""
     try:
-        from app.core.recovery_snapshot import build_live_recovery_snapshot
+        from app.core.recovery_snapshot import load_recovery_snapshot
 
         resolved_user_id = resolve_user_id(user_id, telegram_user_id)
-        training = _training_context(db, resolved_user_id, days, current_days)
-        recovery = build_live_recovery_snapshot(
-            db,
-            resolved_user_id,
-            lookback_days=14,
-            readiness_version=settings.readiness_version,
-        )
         weather = {
             "temperature_c": temperature_c,
             "wind_speed_kmh": wind_speed_kmh,
             "condition": condition,
             "training_note": training_note,
         } if any(value is not None for value in [temperature_c, wind_speed_kmh, condition, training_note]) else None
-        return build_recommendation(
-            user_id=resolved_user_id,
-            recovery=recovery,
-            training_profile=training,
-            weather=weather,
+
+        def build():
+            training = _training_context(db, resolved_user_id, days, current_days)
+            recovery = load_recovery_snapshot(
+                db,
+                resolved_user_id,
+                lookback_days=14,
+                readiness_version=settings.readiness_version,
+            )
+            return build_recommendation(
+                user_id=resolved_user_id,
+                recovery=recovery,
+                training_profile=training,
+                weather=weather,
+            )
+
+        return cached_response(
+            request,
+            db,
+            resolved_user_id,
+            "training_recommendation",
+            {"days": days, "current_days": current_days, **(weather or {})},
+            build,
+            freshness_seconds=RECOVERY_FRESHNESS_SECONDS,
         )
     except HTTPException:
         raise
@@ -2306,7 +2127,7 @@ async def training_recommendation(
 
 
 @router.post("/training/recommendation/adjust")
-async def adjust_training_recommendation(
+def adjust_training_recommendation(
     payload: RecommendationAdjustRequest,
     db: Session = Depends(get_db),
 ):
@@ -2324,7 +2145,7 @@ async def adjust_training_recommendation(
 
 
 @router.post("/training/workouts")
-async def create_training_workout(
+def create_training_workout(
     payload: WorkoutCreateRequest,
     db: Session = Depends(get_db),
 ):
@@ -2389,7 +2210,7 @@ def _set_history_payload(db: Session, entry: WorkoutHistory, payload: Dict[str,
 
 
 @router.get("/training/workouts/{workout_id}/fit")
-async def download_training_workout_fit(
+def download_training_workout_fit(
     workout_id: int,
     db: Session = Depends(get_db),
 ):
@@ -2428,7 +2249,7 @@ async def download_training_workout_fit(
 
 
 @router.post("/training/workouts/{workout_id}/garmin")
-async def upload_training_workout_to_garmin(
+def upload_training_workout_to_garmin(
     workout_id: int,
     db: Session = Depends(get_db),
 ):
@@ -2483,7 +2304,8 @@ async def upload_training_workout_to_garmin(
 
 
 @router.get("/recovery")
-async def get_recovery_snapshot(
+def get_recovery_snapshot(
+    request: Request,
     user_id: Optional[int] = Query(None, description="Internal user ID"),
     telegram_user_id: Optional[int] = Query(None, description="Legacy Telegram user ID"),
     lookback_days: int = Query(14, ge=1, le=90, description="How far back to search for latest health data"),
@@ -2491,16 +2313,24 @@ async def get_recovery_snapshot(
 ):
     """Return the latest Garmin health metrics needed by the app recovery UI."""
     try:
-        from app.core.recovery_snapshot import build_live_recovery_snapshot
+        from app.core.recovery_snapshot import load_recovery_snapshot
 
         resolved_user_id = resolve_user_id(user_id, telegram_user_id)
         # lookback_days is resolved by FastAPI only on HTTP requests — never call this
-        # handler from other endpoints; use build_live_recovery_snapshot() instead.
-        return build_live_recovery_snapshot(
+        # handler from other endpoints; use load_recovery_snapshot() instead.
+        return cached_response(
+            request,
             db,
             resolved_user_id,
-            lookback_days=int(lookback_days),
-            readiness_version=settings.readiness_version,
+            "recovery",
+            {"lookback_days": int(lookback_days)},
+            lambda: load_recovery_snapshot(
+                db,
+                resolved_user_id,
+                lookback_days=int(lookback_days),
+                readiness_version=settings.readiness_version,
+            ),
+            freshness_seconds=RECOVERY_FRESHNESS_SECONDS,
         )
     except Exception as e:
         logger.error(f"Recovery snapshot failed: {e}")
@@ -2508,7 +2338,7 @@ async def get_recovery_snapshot(
 
 
 @router.post("/data/backfill")
-async def request_backfill(
+def request_backfill(
     user_id: Optional[int] = Query(None, description="Internal user ID"),
     telegram_user_id: Optional[int] = Query(None, description="Legacy Telegram user ID"),
     start_date: str = Query(..., description="Start date (YYYY-MM-DD)"),
@@ -2588,7 +2418,7 @@ async def request_backfill(
 
 
 @router.post("/data/replay-webhooks")
-async def replay_webhooks(
+def replay_webhooks(
     user_id: Optional[int] = Query(None, description="Internal user ID"),
     telegram_user_id: Optional[int] = Query(None, description="Legacy Telegram user ID"),
     hours: int = Query(168, ge=1, le=720, description="How far back to scan failed webhook events"),
@@ -2639,7 +2469,7 @@ async def replay_webhooks(
 
 
 @router.post("/data/sync-initial")
-async def sync_initial_garmin_data(
+def sync_initial_garmin_data(
     user_id: Optional[int] = Query(None, description="Internal user ID"),
     telegram_user_id: Optional[int] = Query(None, description="Legacy Telegram user ID"),
     db: Session = Depends(get_db),
@@ -2656,7 +2486,7 @@ async def sync_initial_garmin_data(
 
 
 @router.post("/data/backfill/smart")
-async def request_smart_activity_backfill(
+def request_smart_activity_backfill(
     user_id: Optional[int] = Query(None, description="Internal user ID"),
     telegram_user_id: Optional[int] = Query(None, description="Legacy Telegram user ID"),
     days: int = Query(120, ge=7, le=180, description="How many days of activity history to request"),
@@ -2688,6 +2518,233 @@ async def request_smart_activity_backfill(
 # WEBHOOK ENDPOINTS - Garmin pushes/pings data to these endpoints
 # ============================================================================
 
+def process_health_webhook_event(db: Session, event: GarminWebhookEvent) -> None:
+    """Store the summaries of a queued health webhook event (PUSH data or PING callbacks)."""
+    from app.core.garmin_import import garmin_user_resolver
+    from app.core.webhook_dedupe import WebhookItemDedupe
+    from app.tools.garmin_callbacks import PingCallback, fetch_ping_callbacks
+    from app.tools.garmin_client import write_health_data
+
+    data = load_webhook_payload(db, event)
+    resolve_user = garmin_user_resolver(db)
+    dedupe = WebhookItemDedupe(db)
+    errors = []
+    pings: list[PingCallback] = []
+    recovery_updates: Dict[int, set[str]] = {}
+
+    # Process each summary type
+    for summary_type, items in data.items():
+        if summary_type == "deregistrations":
+            continue  # Handle in separate endpoint
+
+        push_items_by_user: Dict[int, list] = {}
+        for item in dedupe.fresh(summary_type, items):
+            garmin_user_id = item.get('userId')
+            callback_url = item.get('callbackURL')
+
+            user_id = resolve_user(garmin_user_id)
+            if not user_id:
+                message = f"No token found for Garmin user {garmin_user_id}"
+                errors.append(message)
+                logger.warning(message)
+                continue
+
+            if not callback_url:
+                # This is a PUSH notification with data included; stored in bulk below
+                logger.info(f"PUSH notification for {summary_type}, user {garmin_user_id}")
+                push_items_by_user.setdefault(user_id, []).append(item)
+                continue
+
+            # This is a PING notification; callback URLs are fetched together below
+            logger.info(f"PING notification for {summary_type}, user {garmin_user_id}")
+            pings.append(PingCallback(user_id=user_id, summary_type=summary_type, item=item))
+
+        for user_id, push_items in push_items_by_user.items():
+            try:
+                written = write_health_data(db, user_id, summary_type, push_items)
+                dedupe.processed(summary_type, push_items, user_id)
+                recovery_updates.setdefault(user_id, set()).add(summary_type)
+                logger.info(f"Stored PUSH {summary_type} for user {user_id}: {written}")
+            except Exception as e:
+                db.rollback()
+                message = f"Failed to store PUSH {summary_type}: {e}"
+                errors.append(message)
+                logger.error(message)
+
+    for ping, response in fetch_ping_callbacks(db, pings):
+        summary_type, user_id = ping.summary_type, ping.user_id
+        try:
+            if response.error:
+                raise Exception(response.error)
+            if response.status_code == 200:
+                summaries = response.json()
+                logger.info(f"Fetched {len(summaries)} {summary_type} summaries from PING")
+
+                # Store in database
+                write_health_data(db, user_id, summary_type, summaries)
+                dedupe.processed(summary_type, [ping.item], user_id)
+                recovery_updates.setdefault(user_id, set()).add(summary_type)
+                logger.info(f"Stored {len(summaries)} {summary_type} summaries for user {user_id}")
+            else:
+                message = f"{summary_type} callback returned {response.status_code}: {response.text}"
+                errors.append(message)
+                logger.error(message)
+        except Exception as e:
+            db.rollback()
+            message = f"Failed to fetch/store {summary_type} from callback URL: {e}"
+            errors.append(message)
+            logger.error(message)
+
+    _refresh_recovery_snapshots(db, recovery_updates)
+    dedupe.save(event)
+    _finish_webhook_event(db, event, errors)
+
+
+def process_activity_webhook_event(db: Session, event: GarminWebhookEvent) -> None:
+    """Store the summaries and files of a queued activity webhook event."""
+    from app.core.garmin_import import garmin_user_resolver
+    from app.core.webhook_dedupe import WebhookItemDedupe
+    from app.tools.garmin_callbacks import PingCallback, fetch_ping_callbacks
+    from app.tools.garmin_client import (
+        write_activity_auxiliary_data,
+        write_activity_data,
+        write_activity_file_content,
+    )
+
+    data = load_webhook_payload(db, event)
+    resolve_user = garmin_user_resolver(db)
+    dedupe = WebhookItemDedupe(db)
+    errors = []
+    pings: list[PingCallback] = []
+    touched_users: set[int] = set()
+    recovery_updates: Dict[int, set[str]] = {}
+
+    # Process each summary type
+    for summary_type, items in data.items():
+        push_items_by_user: Dict[int, list] = {}
+        for item in dedupe.fresh(summary_type, items):
+            garmin_user_id = item.get('userId')
+            callback_url = item.get('callbackURL')
+
+            user_id = resolve_user(garmin_user_id)
+            if not user_id:
+                message = f"No token found for Garmin user {garmin_user_id}"
+                errors.append(message)
+                logger.warning(message)
+                continue
+
+            if not callback_url:
+                # This is a PUSH notification with data included; stored in bulk below
+                logger.info(f"PUSH notification for {summary_type}, user {garmin_user_id}")
+                push_items_by_user.setdefault(user_id, []).append(item)
+                continue
+
+            # This is a PING notification; callback URLs are fetched together below
+            logger.info(f"PING notification for {summary_type}, user {garmin_user_id}")
+            if summary_type == "activityFiles":
+                # File pings contain useful metadata in the ping itself, then binary content at callbackURL.
+                try:
+                    write_activity_auxiliary_data(db, user_id, summary_type, [item])
+                except Exception as e:
+                    db.rollback()
+                    message = f"Failed to store activity file metadata: {e}"
+                    errors.append(message)
+                    logger.error(message)
+            pings.append(PingCallback(user_id=user_id, summary_type=summary_type, item=item))
+
+        for user_id, push_items in push_items_by_user.items():
+            try:
+                written = write_activity_data(db, user_id, push_items, summary_type)
+                dedupe.processed(summary_type, push_items, user_id)
+                touched_users.add(user_id)
+                recovery_updates.setdefault(user_id, set()).add(summary_type)
+                logger.info(f"Stored PUSH {summary_type} for user {user_id}: {written}")
+            except Exception as e:
+                db.rollback()
+                message = f"Failed to store PUSH {summary_type}: {e}"
+                errors.append(message)
+                logger.error(message)
+
+    for ping, response in fetch_ping_callbacks(db, pings):
+        summary_type, user_id, item = ping.summary_type, ping.user_id, ping.item
+        try:
+            if response.error:
+                raise Exception(response.error)
+            if summary_type == "activityFiles":
+                if response.status_code == 200:
+                    write_activity_file_content(
+                        db,
+                        user_id,
+                        metadata=item,
+                        content=response.body,
+                        content_type=response.headers.get("content-type"),
+                        content_hash=response.content_hash,
+                    )
+                    dedupe.processed(summary_type, [item], user_id)
+                    logger.info(f"Stored activity file {item.get('summaryId')} for user {user_id}")
+                else:
+                    message = f"Activity file callback returned {response.status_code}: {response.text}"
+                    errors.append(message)
+                    logger.error(message)
+                continue
+
+            if response.status_code == 200:
+                summaries = response.json()
+                logger.info(f"Fetched {len(summaries)} {summary_type} summaries from PING")
+
+                # Store in database
+                write_activity_data(db, user_id, summaries, summary_type)
+                dedupe.processed(summary_type, [item], user_id)
+                touched_users.add(user_id)
+                recovery_updates.setdefault(user_id, set()).add(summary_type)
+                logger.info(f"Stored {len(summaries)} {summary_type} summaries for user {user_id}")
+            else:
+                message = f"{summary_type} callback returned {response.status_code}: {response.text}"
+                errors.append(message)
+                logger.error(message)
+        except Exception as e:
+            db.rollback()
+            message = f"Failed to fetch/store {summary_type} from callback URL: {e}"
+            errors.append(message)
+            logger.error(message)
+        finally:
+            response.close()
+
+    for user_id in touched_users:
+        try:
+            refresh_training_contexts(db, user_id)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Training context refresh failed for user {user_id}: {e}")
+    _refresh_recovery_snapshots(db, recovery_updates)
+
+    dedupe.save(event)
+    _finish_webhook_event(db, event, errors)
+
+
+def _refresh_recovery_snapshots(db: Session, updates: Dict[int, set[str]]) -> None:
+    """Fold newly stored summary types into each user's stored recovery inputs."""
+    from app.core.recovery_snapshot import (
+        RECOVERY_ACTIVITY_TYPES,
+        RECOVERY_HEALTH_TYPES,
+        refresh_recovery_snapshot,
+    )
+
+    relevant = set(RECOVERY_HEALTH_TYPES) | set(RECOVERY_ACTIVITY_TYPES)
+    for user_id, summary_types in updates.items():
+        if not summary_types & relevant:
+            continue
+        try:
+            refresh_recovery_snapshot(db, user_id, summary_types)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Recovery snapshot refresh failed for user {user_id}: {e}")
+
+
+webhook_queue.register("health", process_health_webhook_event)
+webhook_queue.register("activity", process_activity_webhook_event)
+
+
 @router.post("/webhook/health")
 async def receive_health_webhook(
     request: Request,
@@ -2699,73 +2756,16 @@ async def receive_health_webhook(
     This endpoint receives PING notifications for:
     - dailies, epochs, sleeps, bodyComps, stressDetails, userMetrics,
     - pulseox, allDayRespiration, healthSnapshot, hrv, bloodPressures, skinTemp
+
+    The payload is stored as a webhook event and processed by the webhook queue,
+    so Garmin gets its 200 without waiting for callback fetches.
     """
     try:
         data = await request.json()
-        logger.info(f"Received health webhook: {data}")
-        event = _create_webhook_event(db, "health", data)
-        errors = []
-
-        # Process each summary type
-        for summary_type, items in data.items():
-            if summary_type == "deregistrations":
-                continue  # Handle in separate endpoint
-
-            for item in items:
-                garmin_user_id = item.get('userId')
-                callback_url = item.get('callbackURL')
-
-                from app.core.garmin_import import resolve_internal_user_for_garmin
-                from app.tools.garmin_client import write_health_data
-
-                user_id = resolve_internal_user_for_garmin(db, garmin_user_id)
-                if not user_id:
-                    message = f"No token found for Garmin user {garmin_user_id}"
-                    errors.append(message)
-                    logger.warning(message)
-                    continue
-
-                if not callback_url:
-                    # This is a PUSH notification with data included
-                    logger.info(f"PUSH notification for {summary_type}, user {garmin_user_id}")
-                    # Store PUSH data directly
-                    try:
-                        write_health_data(db, user_id, summary_type, [item])
-                        logger.info(f"Stored PUSH {summary_type} for user {user_id}")
-                    except Exception as e:
-                        message = f"Failed to store PUSH {summary_type}: {e}"
-                        errors.append(message)
-                        logger.error(message)
-                    continue
-
-                # This is a PING notification, we need to fetch data from callback URL
-                logger.info(f"PING notification for {summary_type}, user {garmin_user_id}")
-
-                try:
-                    # Fetch data from callback URL using user's access token
-                    client = GarminAPIClient(db, user_id)
-                    response = requests.get(
-                        callback_url,
-                        headers=client._get_headers()
-                    )
-
-                    if response.status_code == 200:
-                        summaries = response.json()
-                        logger.info(f"Fetched {len(summaries)} {summary_type} summaries from PING")
-
-                        # Store in database
-                        write_health_data(db, user_id, summary_type, summaries)
-                        logger.info(f"Stored {len(summaries)} {summary_type} summaries for user {user_id}")
-                    else:
-                        message = f"{summary_type} callback returned {response.status_code}: {response.text}"
-                        errors.append(message)
-                        logger.error(message)
-                except Exception as e:
-                    message = f"Failed to fetch/store {summary_type} from callback URL: {e}"
-                    errors.append(message)
-                    logger.error(message)
-
-        _finish_webhook_event(db, event, errors)
+        logger.info(f"Received health webhook: {summarize_webhook_payload(data, len(await request.body()))}")
+        event = await run_in_threadpool(_create_webhook_event, db, "health", data)
+        if event.status == "received":
+            await webhook_queue.enqueue(event.id)
         return {"status": "received"}
 
     except Exception as e:
@@ -2783,93 +2783,15 @@ async def receive_activity_webhook(
 
     This endpoint receives PING notifications for:
     - activities, activityDetails, activityFiles, moveIQActivities, manuallyUpdatedActivities
+
+    Like the health webhook, processing happens in the webhook queue after the response.
     """
     try:
         data = await request.json()
-        logger.info(f"Received activity webhook: {data}")
-        event = _create_webhook_event(db, "activity", data)
-        errors = []
-
-        # Process each summary type
-        for summary_type, items in data.items():
-            for item in items:
-                garmin_user_id = item.get('userId')
-                callback_url = item.get('callbackURL')
-
-                from app.core.garmin_import import resolve_internal_user_for_garmin
-                from app.tools.garmin_client import (
-                    write_activity_auxiliary_data,
-                    write_activity_data,
-                )
-
-                user_id = resolve_internal_user_for_garmin(db, garmin_user_id)
-                if not user_id:
-                    message = f"No token found for Garmin user {garmin_user_id}"
-                    errors.append(message)
-                    logger.warning(message)
-                    continue
-
-                if not callback_url:
-                    # This is a PUSH notification with data included
-                    logger.info(f"PUSH notification for {summary_type}, user {garmin_user_id}")
-                    # Store PUSH activity data directly
-                    try:
-                        write_activity_data(db, user_id, [item], summary_type)
-                        logger.info(f"Stored PUSH {summary_type} for user {user_id}")
-                    except Exception as e:
-                        message = f"Failed to store PUSH {summary_type}: {e}"
-                        errors.append(message)
-                        logger.error(message)
-                    continue
-
-                # This is a PING notification, we need to fetch data from callback URL
-                logger.info(f"PING notification for {summary_type}, user {garmin_user_id}")
-
-                try:
-                    # Fetch data from callback URL using user's access token
-                    client = GarminAPIClient(db, user_id)
-                    if summary_type == "activityFiles":
-                        # File pings contain useful metadata in the ping itself, then binary content at callbackURL.
-                        write_activity_auxiliary_data(db, user_id, summary_type, [item])
-                        file_response = requests.get(
-                            callback_url,
-                            headers=client._get_headers()
-                        )
-                        if file_response.status_code == 200:
-                            client._store_activity_file_content(
-                                metadata=item,
-                                content=file_response.content,
-                                content_type=file_response.headers.get("content-type"),
-                            )
-                            logger.info(f"Stored activity file {item.get('summaryId')} for user {user_id}")
-                        else:
-                            message = f"Activity file callback returned {file_response.status_code}: {file_response.text}"
-                            errors.append(message)
-                            logger.error(message)
-                        continue
-
-                    response = requests.get(
-                        callback_url,
-                        headers=client._get_headers()
-                    )
-
-                    if response.status_code == 200:
-                        summaries = response.json()
-                        logger.info(f"Fetched {len(summaries)} {summary_type} summaries from PING")
-
-                        # Store in database
-                        write_activity_data(db, user_id, summaries, summary_type)
-                        logger.info(f"Stored {len(summaries)} {summary_type} summaries for user {user_id}")
-                    else:
-                        message = f"{summary_type} callback returned {response.status_code}: {response.text}"
-                        errors.append(message)
-                        logger.error(message)
-                except Exception as e:
-                    message = f"Failed to fetch/store {summary_type} from callback URL: {e}"
-                    errors.append(message)
-                    logger.error(message)
-
-        _finish_webhook_event(db, event, errors)
+        logger.info(f"Received activity webhook: {summarize_webhook_payload(data, len(await request.body()))}")
+        event = await run_in_threadpool(_create_webhook_event, db, "activity", data)
+        if event.status == "received":
+            await webhook_queue.enqueue(event.id)
         return {"status": "received"}
 
     except Exception as e:
@@ -2877,6 +2799,30 @@ async def receive_activity_webhook(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _delete_deregistered_tokens(db: Session, event: GarminWebhookEvent, deregistrations: list) -> list[int]:
+    """Delete the tokens of deregistered Garmin users and finish the event; returns their user ids."""
+    deregistered_user_ids = []
+    for dereg in deregistrations:
+        garmin_user_id = dereg.get('userId')
+        if garmin_user_id:
+            # Find and delete tokens
+            garmin_token = db.query(GarminToken).filter(
+                GarminToken.garmin_user_id == garmin_user_id
+            ).first()
+
+            if garmin_token:
+                deregistered_user_ids.append(garmin_token.user_id)
+                db.delete(garmin_token)
+                logger.info(f"Deleted tokens for Garmin user {garmin_user_id}")
+            else:
+                logger.info(
+                    f"Deregistration for Garmin user {garmin_user_id}: token already absent"
+                )
+
+    _finish_webhook_event(db, event, [])
+    return deregistered_user_ids
+
+
 @router.post("/webhook/deregistration")
 async def receive_deregistration_webhook(
     request: Request,
@@ -2887,32 +2833,18 @@ async def receive_deregistration_webhook(
 
     Called when a user disconnects their Garmin account.
     """
+    from app.core.garmin_import import invalidate_garmin_user
+
     try:
         data = await request.json()
-        logger.info(f"Received deregistration webhook: {data}")
-        event = _create_webhook_event(db, "deregistration", data)
-        errors = []
+        logger.info(f"Received deregistration webhook: {summarize_webhook_payload(data, len(await request.body()))}")
+        event = await run_in_threadpool(_create_webhook_event, db, "deregistration", data)
 
         # Extract user ID from webhook
         deregistrations = data.get('deregistrations', [])
-
-        for dereg in deregistrations:
-            garmin_user_id = dereg.get('userId')
-            if garmin_user_id:
-                # Find and delete tokens
-                garmin_token = db.query(GarminToken).filter(
-                    GarminToken.garmin_user_id == garmin_user_id
-                ).first()
-
-                if garmin_token:
-                    db.delete(garmin_token)
-                    logger.info(f"Deleted tokens for Garmin user {garmin_user_id}")
-                else:
-                    logger.info(
-                        f"Deregistration for Garmin user {garmin_user_id}: token already absent"
-                    )
-
-        _finish_webhook_event(db, event, errors)
+        deregistered_user_ids = await run_in_threadpool(_delete_deregistered_tokens, db, event, deregistrations)
+        invalidate_access_token(*deregistered_user_ids)
+        invalidate_garmin_user(*(dereg.get('userId') for dereg in deregistrations))
         return {"status": "received"}
 
     except Exception as e:
@@ -2932,13 +2864,13 @@ async def receive_permissions_webhook(
     """
     try:
         data = await request.json()
-        logger.info(f"Received permissions webhook: {data}")
-        event = _create_webhook_event(db, "permissions", data)
+        logger.info(f"Received permissions webhook: {summarize_webhook_payload(data, len(await request.body()))}")
+        event = await run_in_threadpool(_create_webhook_event, db, "permissions", data)
 
         # TODO: Update user permissions in database
         # For now, just log it
 
-        _finish_webhook_event(db, event, [])
+        await run_in_threadpool(_finish_webhook_event, db, event, [])
         return {"status": "received"}
 
     except Exception as e:
@@ -1,14 +1,29 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import garmin
 from app.api import web
 from app.api import analysis
 from app.config import settings
+from app.core.webhook_queue import webhook_queue
+from app.tools.garmin_callbacks import callback_fetcher
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start webhook workers and pick up events a previous process never finished
+    await webhook_queue.start(recover=True)
+    yield
+    await webhook_queue.stop()
+    callback_fetcher.close()
+
 
 app = FastAPI(
     title="Coach Bot API",
     description="API for web-based coaching app with Garmin integration",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
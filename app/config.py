@@ -83,6 +83,38 @@ class Settings(BaseSettings):
     # Readiness algorithm: readiness_v4 (personalized HR/HRV) or current_readiness_v3 (legacy)
     readiness_version: str = Field(default="readiness_v4")
 
+    # Garmin webhook processing: in-process worker count and max queued events
+    webhook_workers: int = Field(default=4, ge=1)
+    webhook_queue_size: int = Field(default=1000, ge=1)
+    # Days to keep finished webhook events (raw payloads); 0 keeps them forever
+    webhook_event_retention_days: int = Field(default=30, ge=0)
+    # Days to keep the archived payload of successfully processed events (the event row stays); 0 keeps it
+    webhook_payload_retention_days: int = Field(default=7, ge=0)
+    # Hours a processed webhook item (PUSH summary or PING callback) is remembered to skip re-deliveries; 0 disables
+    webhook_dedupe_window_hours: int = Field(default=72, ge=0)
+    # Background retries of partial/failed webhook events: attempts before dead-lettering (0 disables),
+    # backoff base and cap in seconds (doubled per attempt) and how many users are retried at once
+    webhook_retry_max_attempts: int = Field(default=6, ge=0)
+    webhook_retry_base_seconds: int = Field(default=60, ge=1)
+    webhook_retry_max_delay_seconds: int = Field(default=3600, ge=1)
+    webhook_retry_concurrency: int = Field(default=4, ge=1)
+
+    # Garmin PING callback fetching (shared pooled HTTP client)
+    callback_max_connections: int = Field(default=20, ge=1)
+    callback_per_host_limit: int = Field(default=8, ge=1)
+    callback_timeout_seconds: float = Field(default=30.0, gt=0)
+    callback_file_timeout_seconds: float = Field(default=60.0, gt=0)
+    callback_max_retries: int = Field(default=3, ge=0)
+    # Seconds a process keeps a decrypted Garmin access token before re-reading it; 0 disables
+    garmin_token_cache_seconds: float = Field(default=300.0, ge=0)
+    # Seconds a process remembers which internal user a Garmin user id belongs to (unknown ids: shorter)
+    garmin_user_cache_seconds: float = Field(default=60.0, ge=0)
+    garmin_user_negative_cache_seconds: float = Field(default=15.0, ge=0)
+
+    # In-process cache of Garmin read-endpoint responses (entries expire after the TTL)
+    response_cache_ttl_seconds: float = Field(default=300.0, ge=0)
+    response_cache_max_entries: int = Field(default=2048, ge=1)
+
     @property
     def cors_origin_list(self) -> list[str]:
         return [o.strip() for o in self.cors_origins.split(",") if o.strip()]
@@ -0,0 +1,293 @@
+"""Daily per-user, per-activity-type rollup of Garmin activity summaries, kept current by ingest."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.database.models import GarminActivityDailyRollup, GarminActivityData
+
+ROLLUP_SUMMARY_TYPES = ("activities", "manuallyUpdatedActivities")
+
+_IN_CHUNK = 500
+
+_ROLLUP_TOTAL_COLUMNS = (
+    "sessions",
+    "duration_seconds",
+    "distance_meters",
+    "calories",
+    "load",
+    "hr_sum",
+    "hr_count",
+    "max_heart_rate",
+    "longest_duration_seconds",
+)
+
+
+def hr_weighted_load(duration_seconds: int, avg_hr: Optional[int], max_hr: Optional[int]) -> float:
+    """Minutes weighted by squared HR intensity (avg/max HR, or avg/190 without a max)."""
+    minutes = duration_seconds / 60
+    if not minutes:
+        return 0
+    if avg_hr and max_hr:
+        intensity = max(0.45, min(1.15, avg_hr / max(max_hr, 1)))
+    elif avg_hr:
+        intensity = max(0.45, min(1.05, avg_hr / 190))
+    else:
+        intensity = 0.65
+    return round(minutes * (intensity ** 2), 1)
+
+
+@dataclass
+class ActivityBucket:
+    """
+    Additive activity totals for one activity or one rollup day.
+
+    Exposes the same attribute names as GarminActivityData (start_time, activity_type,
+    duration, distance, max_heart_rate) so window helpers work on either.
+    """
+    start_time: datetime
+    activity_type: str
+    sessions: int = 0
+    duration: int = 0
+    distance: float = 0.0
+    calories: int = 0
+    load: float = 0.0
+    hr_sum: int = 0
+    hr_count: int = 0
+    max_heart_rate: Optional[int] = None
+    longest_duration: int = 0
+
+    @classmethod
+    def from_activity(cls, activity: Any) -> "ActivityBucket":
+        duration = int(activity.duration or 0)
+        avg_hr = activity.average_heart_rate
+        return cls(
+            start_time=activity.start_time,
+            activity_type=activity.activity_type or "",
+            sessions=1,
+            duration=duration,
+            distance=float(activity.distance or 0.0),
+            calories=int(activity.calories or 0),
+            load=hr_weighted_load(duration, avg_hr, activity.max_heart_rate),
+            hr_sum=int(avg_hr) if avg_hr else 0,
+            hr_count=1 if avg_hr else 0,
+            max_heart_rate=activity.max_heart_rate,
+            longest_duration=duration,
+        )
+
+    @classmethod
+    def from_rollup(cls, row: GarminActivityDailyRollup) -> "ActivityBucket":
+        return cls(
+            start_time=datetime.combine(row.day, time.min),
+            activity_type=row.activity_type,
+            sessions=row.sessions,
+            duration=row.duration_seconds,
+            distance=row.distance_meters,
+            calories=row.calories,
+            load=row.load,
+            hr_sum=row.hr_sum,
+            hr_count=row.hr_count,
+            max_heart_rate=row.max_heart_rate,
+            longest_duration=row.longest_duration_seconds,
+        )
+
+    def add(self, other: "ActivityBucket") -> None:
+        self.sessions += other.sessions
+        self.duration += other.duration
+        self.distance += other.distance
+        self.calories += other.calories
+        self.load = round(self.load + other.load, 1)
+        self.hr_sum += other.hr_sum
+        self.hr_count += other.hr_count
+        if other.max_heart_rate and (self.max_heart_rate is None or other.max_heart_rate > self.max_heart_rate):
+            self.max_heart_rate = other.max_heart_rate
+        self.longest_duration = max(self.longest_duration, other.longest_duration)
+
+
+def as_activity_bucket(item: Any) -> ActivityBucket:
+    return item if isinstance(item, ActivityBucket) else ActivityBucket.from_activity(item)
+
+
+def _day_bounds(day: date) -> Tuple[datetime, datetime]:
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def _day_ranges(days: Sequence[date]) -> List[Tuple[datetime, datetime]]:
+    """[start, end) bounds of the given sorted UTC days, consecutive days merged."""
+    ranges: List[Tuple[datetime, datetime]] = []
+    for day in days:
+        lo, hi = _day_bounds(day)
+        if ranges and ranges[-1][1] == lo:
+            ranges[-1] = (ranges[-1][0], hi)
+        else:
+            ranges.append((lo, hi))
+    return ranges
+
+
+def load_activities_on_days(db: Session, user_id: int, days: Iterable[date]) -> List[GarminActivityData]:
+    """A user's activity summaries that start on the given UTC days, reading only those days."""
+    ranges = _day_ranges(sorted(set(days)))
+    activities: List[GarminActivityData] = []
+    for offset in range(0, len(ranges), _IN_CHUNK):
+        activities.extend(
+            db.query(GarminActivityData).filter(
+                GarminActivityData.user_id == user_id,
+                GarminActivityData.summary_type.in_(ROLLUP_SUMMARY_TYPES),
+                or_(
+                    *(
+                        and_(GarminActivityData.start_time >= lo, GarminActivityData.start_time < hi)
+                        for lo, hi in ranges[offset:offset + _IN_CHUNK]
+                    )
+                ),
+            )
+        )
+    return activities
+
+
+def activity_days(db: Session, summary_ids: Sequence[str]) -> Set[date]:
+    """UTC days the given stored activities currently fall on (before an upsert moves them)."""
+    days: Set[date] = set()
+    for offset in range(0, len(summary_ids), _IN_CHUNK):
+        chunk = list(summary_ids[offset:offset + _IN_CHUNK])
+        for (start_time,) in db.query(GarminActivityData.start_time).filter(
+            GarminActivityData.summary_id.in_(chunk)
+        ):
+            if start_time:
+                days.add(start_time.date())
+    return days
+
+
+def refresh_activity_rollup(db: Session, user_id: int, days: Iterable[date]) -> int:
+    """
+    Recompute the rollup rows of one user for the given days from the typed activity columns.
+
+    Rows are upserted on (user_id, day, activity_type) and rows of types that no longer
+    occur on a day are deleted, so edits, deletes and day moves stay exact and two ingests
+    for the same user and day do not collide on the unique key. Returns the number of
+    rollup rows written. The caller commits.
+    """
+    from app.core.garmin_ingest import upsert_rows
+
+    days = sorted(set(days))
+    if not days:
+        return 0
+
+    totals: Dict[Tuple[date, str], ActivityBucket] = {}
+    for activity in load_activities_on_days(db, user_id, days):
+        bucket = ActivityBucket.from_activity(activity)
+        key = (activity.start_time.date(), bucket.activity_type)
+        if key in totals:
+            totals[key].add(bucket)
+        else:
+            totals[key] = bucket
+
+    stale_ids = [
+        row_id
+        for row_id, day, activity_type in db.query(
+            GarminActivityDailyRollup.id, GarminActivityDailyRollup.day, GarminActivityDailyRollup.activity_type
+        ).filter(
+            GarminActivityDailyRollup.user_id == user_id,
+            GarminActivityDailyRollup.day.in_(days),
+        )
+        if (day, activity_type) not in totals
+    ]
+    for offset in range(0, len(stale_ids), _IN_CHUNK):
+        db.query(GarminActivityDailyRollup).filter(
+            GarminActivityDailyRollup.id.in_(stale_ids[offset:offset + _IN_CHUNK])
+        ).delete(synchronize_session=False)
+
+    if not totals:
+        return 0
+    now = datetime.utcnow()
+    upsert_rows(
+        db,
+        GarminActivityDailyRollup,
+        [
+            {
+                "user_id": user_id,
+                "day": day,
+                "activity_type": activity_type,
+                "sessions": bucket.sessions,
+                "duration_seconds": bucket.duration,
+                "distance_meters": bucket.distance,
+                "calories": bucket.calories,
+                "load": bucket.load,
+                "hr_sum": bucket.hr_sum,
+                "hr_count": bucket.hr_count,
+                "max_heart_rate": bucket.max_heart_rate,
+                "longest_duration_seconds": bucket.longest_duration,
+                "updated_at": now,
+            }
+            for (day, activity_type), bucket in totals.items()
+        ],
+        conflict_columns=["user_id", "day", "activity_type"],
+        update_columns=[*_ROLLUP_TOTAL_COLUMNS, "updated_at"],
+    )
+    return len(totals)
+
+
+def rebuild_activity_rollup(db: Session, user_id: int) -> int:
+    """Recompute every rollup day of one user (e.g. after rows were moved between users); commits."""
+    days = {
+        start_time.date()
+        for (start_time,) in db.query(GarminActivityData.start_time).filter(GarminActivityData.user_id == user_id)
+        if start_time
+    }
+    days |= {day for (day,) in db.query(GarminActivityDailyRollup.day).filter(GarminActivityDailyRollup.user_id == user_id)}
+    written = refresh_activity_rollup(db, user_id, days)
+    db.commit()
+    return written
+
+
+def load_activity_buckets(
+    db: Session,
+    user_id: int,
+    start: datetime,
+    end: Optional[datetime] = None,
+    *,
+    boundaries: Sequence[datetime] = (),
+) -> List[ActivityBucket]:
+    """
+    Activity totals for start <= start_time < end (open-ended without `end`).
+
+    Whole days come from the rollup, one bucket per day and activity type stamped at
+    midnight. Days cut by `start`, `end` or one of the `boundaries` are read as raw
+    activities instead, so filtering the result on any of those instants is exact.
+    """
+    cuts = [start, *boundaries, *([end] if end is not None else [])]
+    cut_days = sorted({cut.date() for cut in cuts if cut.time() != time.min})
+
+    first_day = start.date() if start.time() == time.min else start.date() + timedelta(days=1)
+    rollup_query = db.query(GarminActivityDailyRollup).filter(
+        GarminActivityDailyRollup.user_id == user_id,
+        GarminActivityDailyRollup.day >= first_day,
+    )
+    if end is not None:
+        rollup_query = rollup_query.filter(GarminActivityDailyRollup.day < end.date())
+    if cut_days:
+        rollup_query = rollup_query.filter(GarminActivityDailyRollup.day.notin_(cut_days))
+    buckets = [ActivityBucket.from_rollup(row) for row in rollup_query.order_by(GarminActivityDailyRollup.day.asc())]
+
+    ranges = []
+    for day in cut_days:
+        lo, hi = _day_bounds(day)
+        lo = max(lo, start)
+        if end is not None:
+            hi = min(hi, end)
+        if lo < hi:
+            ranges.append(and_(GarminActivityData.start_time >= lo, GarminActivityData.start_time < hi))
+    if ranges:
+        activities = db.query(GarminActivityData).filter(
+            GarminActivityData.user_id == user_id,
+            GarminActivityData.summary_type.in_(ROLLUP_SUMMARY_TYPES),
+            or_(*ranges),
+        ).all()
+        buckets.extend(ActivityBucket.from_activity(activity) for activity in activities)
+
+    buckets.sort(key=lambda bucket: bucket.start_time)
+    return buckets
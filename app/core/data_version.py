@@ -0,0 +1,29 @@
+"""Per-user Garmin data version, bumped by ingest and used to validate cached read responses."""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from app.database.models import UserDataVersion
+
+
+def bump_data_version(db: Session, user_id: int) -> None:
+    """Increment the user's data version in the caller's transaction; the caller commits."""
+    from app.core.garmin_ingest import _dialect_insert
+
+    insert = _dialect_insert(db)
+    now = datetime.utcnow()
+    stmt = insert(UserDataVersion).values(user_id=user_id, version=1, updated_at=now)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[UserDataVersion.user_id],
+            set_={"version": UserDataVersion.version + 1, "updated_at": now},
+        )
+    )
+
+
+def get_data_version(db: Session, user_id: int) -> int:
+    """Current data version of the user; 0 before the first ingest."""
+    version = db.query(UserDataVersion.version).filter(UserDataVersion.user_id == user_id).scalar()
+    return int(version or 0)
@@ -0,0 +1,196 @@
+"""Effort segments (laps or 5-minute sample windows) extracted from Garmin activityDetails payloads."""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.payload_memo import memoized
+from app.core.sample_columns import decode_detail_samples
+
+# Bump when the extraction below changes; stored segments of another version are ignored.
+DETAIL_SEGMENTS_VERSION = 1
+
+
+def normalize_detail_sport(detail: Dict, fallback: str) -> str:
+    summary = detail.get("summary") if isinstance(detail.get("summary"), dict) else detail
+    activity_type = str(summary.get("activityType") or detail.get("activityType") or fallback).upper()
+    name = str(summary.get("activityName") or detail.get("activityName") or "").lower()
+    combined = f"{activity_type} {name}"
+    if "SWIM" in combined:
+        return "SWIMMING"
+    if ("INDOOR" in combined or "ZWIFT" in combined or "VIRTUAL" in combined) and (
+        "CYCLE" in combined or "BIKE" in combined or "CYCLING" in combined
+    ):
+        return "INDOOR_CYCLING"
+    if "CYCLE" in combined or "BIKE" in combined or "CYCLING" in combined:
+        return "CYCLING"
+    if "WALK" in combined or "WANDEL" in combined:
+        return "WALKING"
+    if "RUN" in combined:
+        return "RUNNING"
+    return fallback
+
+
+def _sample_elapsed(sample: Dict, first_start: Optional[int]) -> Optional[float]:
+    for key in ["timerDurationInSeconds", "movingDurationInSeconds", "clockDurationInSeconds"]:
+        value = sample.get(key)
+        if value is not None:
+            return float(value)
+    start = sample.get("startTimeInSeconds")
+    if start is not None and first_start is not None:
+        return float(start - first_start)
+    return None
+
+
+def _keep_segment(segment: Dict, sport: str) -> bool:
+    """Outside the pool, a segment without distance or speed is a pause, not an effort."""
+    return sport == "SWIMMING" or segment["distance_meters"] > 20 or bool(segment["speed_mps"])
+
+
+def _samples_to_segment(samples: List[Dict], sport: str) -> Optional[Dict]:
+    clean = [s for s in samples if isinstance(s, dict)]
+    if len(clean) < 2:
+        return None
+    first = clean[0]
+    last = clean[-1]
+    first_start = first.get("startTimeInSeconds")
+    start_elapsed = _sample_elapsed(first, first_start)
+    end_elapsed = _sample_elapsed(last, first_start)
+    if start_elapsed is None or end_elapsed is None:
+        return None
+    duration = max(0, end_elapsed - start_elapsed)
+    start_distance = first.get("totalDistanceInMeters")
+    end_distance = last.get("totalDistanceInMeters")
+    distance = max(0, (end_distance or 0) - (start_distance or 0)) if end_distance is not None and start_distance is not None else 0
+    hr_values = [s.get("heartRate") for s in clean if s.get("heartRate")]
+    speed_values = [s.get("speedMetersPerSecond") for s in clean if s.get("speedMetersPerSecond")]
+    avg_speed = sum(speed_values) / len(speed_values) if speed_values else ((distance / duration) if distance and duration else None)
+
+    if duration < 45:
+        return None
+
+    segment = {
+        "duration_seconds": duration,
+        "distance_meters": distance,
+        "heart_rate": sum(hr_values) / len(hr_values) if hr_values else None,
+        "speed_mps": avg_speed,
+        "sample_count": len(clean),
+    }
+    return segment if _keep_segment(segment, sport) else None
+
+
+def extract_detail_segments(detail: Dict, sport: str) -> List[Dict]:
+    """Extract useful effort segments from activityDetails samples and laps."""
+    return _extract(detail, normalize_detail_sport(detail, sport))
+
+
+def _extract(detail: Dict, detail_sport: str) -> List[Dict]:
+    columns = decode_detail_samples(detail)
+    samples = columns.samples
+    if len(samples) < 2:
+        return []
+
+    laps = sorted(
+        [lap.get("startTimeInSeconds") for lap in detail.get("laps", []) if isinstance(lap, dict) and lap.get("startTimeInSeconds")],
+    )
+    segments: List[Dict] = []
+    if len(laps) >= 2:
+        boundaries = laps + [samples[-1]["startTimeInSeconds"] + 1]
+        for lo, hi in columns.split_at(boundaries):
+            segment = _samples_to_segment(samples[lo:hi], detail_sport)
+            if segment:
+                segment["source"] = "lap"
+                segments.append(segment)
+    else:
+        for lo, hi in columns.buckets(300):
+            segment = _samples_to_segment(samples[lo:hi], detail_sport)
+            if segment:
+                segment["source"] = "sample_window"
+                segments.append(segment)
+
+    return segments
+
+
+def stored_detail_segments(detail: Dict) -> Dict[str, Any]:
+    """
+    Segments to store with an activityDetails row at ingest.
+
+    They are extracted as for a swim (no pause filter), because the sport of the matching
+    activity is only known when the segments are read; segments_for_sport() applies it.
+    """
+    return {"version": DETAIL_SEGMENTS_VERSION, "segments": _extract(detail, "SWIMMING")}
+
+
+def segments_for_sport(stored: Any, detail: Dict, sport: str) -> Optional[List[Dict]]:
+    """Stored segments as extract_detail_segments(detail, sport) would return them; None when stale."""
+    if not isinstance(stored, dict) or stored.get("version") != DETAIL_SEGMENTS_VERSION:
+        return None
+    detail_sport = normalize_detail_sport(detail, sport)
+    return [dict(segment) for segment in stored.get("segments") or [] if _keep_segment(segment, detail_sport)]
+
+
+def auxiliary_payload(record: Any) -> Dict:
+    """Parse an auxiliary Garmin payload such as activityDetails."""
+    try:
+        return json.loads(record.data) if isinstance(record.data, str) else (record.data or {})
+    except Exception:
+        return {}
+
+
+class DetailIndex(Dict[str, Dict]):
+    """activityDetails payloads by identifier, plus the segments stored with each row at ingest."""
+
+    def __init__(self):
+        super().__init__()
+        self.stored_segments: Dict[int, tuple[Dict, Any]] = {}
+
+
+def index_activity_details(details: Iterable[Any]) -> DetailIndex:
+    """Index activityDetails rows by all known Garmin identifiers."""
+    index = DetailIndex()
+    for record in details:
+        payload = auxiliary_payload(record)
+        if record.segments is not None:
+            index.stored_segments[id(payload)] = (payload, record.segments)
+        summary = payload.get("summary") if isinstance(payload.get("summary"), dict) else payload
+        keys = [
+            record.activity_id,
+            record.summary_id,
+            payload.get("activityId"),
+            payload.get("summaryId"),
+            summary.get("activityId") if isinstance(summary, dict) else None,
+            summary.get("summaryId") if isinstance(summary, dict) else None,
+        ]
+        for key in keys:
+            if key is not None:
+                index[str(key)] = payload
+                if str(key).endswith("-detail"):
+                    index[str(key).replace("-detail", "")] = payload
+    return index
+
+
+def activity_detail_for(activity: Any, detail_index: Dict[str, Dict]) -> Optional[Dict]:
+    """The activityDetails payload of an activity summary, if the index has one."""
+    keys = [
+        activity.activity_id,
+        activity.summary_id,
+        str(activity.summary_id).replace("-detail", "") if activity.summary_id else None,
+    ]
+    for key in keys:
+        if key is not None and str(key) in detail_index:
+            return detail_index[str(key)]
+    return None
+
+
+def detail_segments_for(detail: Dict, sport: str, detail_index: Optional[Dict[str, Dict]] = None) -> List[Dict]:
+    """
+    Effort segments of an activityDetails payload: the ones stored at ingest when the
+    index has them, else extracted from the samples and laps.
+    """
+    stored = getattr(detail_index, "stored_segments", {}).get(id(detail))
+    if stored is not None and stored[0] is detail:
+        segments = segments_for_sport(stored[1], detail, sport)
+        if segments is not None:
+            return segments
+    segments = memoized("detail_segments", detail, lambda: extract_detail_segments(detail, sport), sport)
+    return [dict(segment) for segment in segments]
@@ -0,0 +1,368 @@
+"""
+Daily per-user, per-sport effort sketches: the quantized inputs of the personal training
+targets, kept current by ingest so the targets are read from counts instead of payloads.
+"""
+from __future__ import annotations
+
+import json
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.activity_rollup import load_activities_on_days
+from app.core.detail_segments import activity_detail_for, detail_segments_for, index_activity_details
+from app.database.models import (
+    GarminActivityAuxiliaryData,
+    GarminActivityData,
+    TrainingEffortSketch,
+    TrainingEffortSketchState,
+)
+
+# Bump when the observations below change; users are rebuilt on their next profile read.
+EFFORT_SKETCH_VERSION = 1
+
+# Longest window a profile reads (the training profile accepts up to 365 days); older days age out.
+EFFORT_SKETCH_RETENTION_DAYS = 400
+
+CYCLING_SPORTS = {"CYCLING", "INDOOR_CYCLING"}
+
+_IN_CHUNK = 500
+
+# (source, heart rate, name effort, fallback effort, metric): one quantized observation.
+# The HR-based effort depends on the sport's max HR, so it is resolved when reading.
+Observation = Tuple[str, Optional[int], Optional[str], str, Optional[float]]
+
+
+def normalize_training_sport(activity: Any) -> str:
+    """Map Garmin activity types to the sport buckets used by the coach UI."""
+    activity_type = (activity.activity_type or "").upper()
+    name = (activity.activity_name or "").lower()
+    device_name = (getattr(activity, "device_name", None) or "").lower()
+    combined = " ".join([activity_type, name, device_name])
+
+    if "SWIM" in combined:
+        return "SWIMMING"
+    if "INDOOR" in combined or "ZWIFT" in combined or "VIRTUAL" in combined:
+        if "CYCLE" in combined or "BIKE" in combined or "CYCLING" in combined:
+            return "INDOOR_CYCLING"
+    if "CYCLE" in combined or "BIKE" in combined or "CYCLING" in combined:
+        return "CYCLING"
+    if "WALK" in combined or "WANDEL" in combined:
+        return "WALKING"
+    if "RUN" in combined:
+        return "RUNNING"
+    if any(token in combined for token in ("STRENGTH", "KRAFT", "GYM", "HIIT", "WEIGHT", "CROSSFIT")):
+        return "STRENGTH_TRAINING"
+    if activity_type == "CARDIO_TRAINING":
+        return "WALKING"
+    return activity_type or "UNKNOWN"
+
+
+def activity_metric(activity: Any, sport: str) -> Optional[float]:
+    """Return the primary sport metric: pace seconds/unit or speed km/h."""
+    distance = activity.distance or 0
+    duration = activity.duration or 0
+    if distance <= 0 or duration <= 0:
+        return None
+
+    if sport in CYCLING_SPORTS:
+        return (distance / duration) * 3.6
+    if sport == "SWIMMING":
+        return duration / (distance / 100)
+    return duration / (distance / 1000)
+
+
+def segment_metric(segment: Dict, sport: str) -> Optional[float]:
+    duration = segment.get("duration_seconds") or 0
+    distance = segment.get("distance_meters") or 0
+    speed = segment.get("speed_mps")
+    if sport in CYCLING_SPORTS:
+        if speed:
+            return speed * 3.6
+        return (distance / duration) * 3.6 if distance > 0 and duration > 0 else None
+    if sport == "SWIMMING":
+        return duration / (distance / 100) if distance > 0 and duration > 0 else None
+    return duration / (distance / 1000) if distance > 0 and duration > 0 else None
+
+
+def name_effort(activity: Any) -> Optional[str]:
+    """Effort named in the activity title (e.g. 'tempo', 'herstel'), which overrides heart rate."""
+    name = (activity.activity_name or "").lower()
+    if any(word in name for word in ["easy", "herstel", "recovery", "rustig", "walk", "wandel"]):
+        return "easy"
+    if any(word in name for word in ["duur", "endurance", "zone 2", "z2", "lsd", "long slow"]):
+        return "endurance"
+    if any(word in name for word in ["tempo", "threshold", "drempel"]):
+        return "threshold"
+    if any(word in name for word in ["interval", "vo2", "sprint"]):
+        return "vo2"
+    return None
+
+
+def segment_fallback_effort(segment: Dict, sport: str) -> str:
+    """Effort of a segment without heart rate, from its duration."""
+    duration = segment.get("duration_seconds") or 0
+    if duration >= 1200:
+        return "endurance"
+    if duration <= 240:
+        return "vo2"
+    return "threshold" if sport in {"RUNNING", "CYCLING", "INDOOR_CYCLING"} else "endurance"
+
+
+def _quantize_metric(metric: Optional[float], sport: str) -> Optional[float]:
+    # Whole seconds of pace or 0.1 km/h of speed: below what the targets display.
+    if metric is None:
+        return None
+    return round(metric, 1) if sport in CYCLING_SPORTS else float(round(metric))
+
+
+def _quantize_hr(heart_rate: Any) -> Optional[int]:
+    return int(round(heart_rate)) if heart_rate else None
+
+
+class EffortSketch:
+    """
+    Counts of one sport's quantized effort observations; sketches of days merge by addition.
+
+    Its size is bounded by the quantization (pace seconds, speed tenths, HR beats), not by
+    the number of activities.
+    """
+
+    def __init__(self):
+        self.sessions = 0
+        self.detail_activities = 0
+        self.detail_segments = 0
+        self.observations: Counter = Counter()
+        self.max_heart_rates: Counter = Counter()
+        self.activity_heart_rates: Counter = Counter()
+
+    def add_activity(self, activity: Any, sport: str, segments: List[Dict]) -> None:
+        """Observe one activity: its detail segments when it has them, else its summary."""
+        self.sessions += 1
+        if activity.max_heart_rate:
+            self.max_heart_rates[int(activity.max_heart_rate)] += 1
+        if activity.average_heart_rate:
+            self.activity_heart_rates[_quantize_hr(activity.average_heart_rate)] += 1
+        if segments:
+            self.detail_activities += 1
+            self.detail_segments += len(segments)
+            for segment in segments:
+                observation: Observation = (
+                    "detail",
+                    _quantize_hr(segment.get("heart_rate")),
+                    None,
+                    segment_fallback_effort(segment, sport),
+                    _quantize_metric(segment_metric(segment, sport), sport),
+                )
+                self.observations[observation] += 1
+            return
+        observation = (
+            "summary",
+            _quantize_hr(activity.average_heart_rate),
+            name_effort(activity),
+            "endurance",
+            _quantize_metric(activity_metric(activity, sport), sport),
+        )
+        self.observations[observation] += 1
+
+    def merge(self, other: "EffortSketch") -> None:
+        self.sessions += other.sessions
+        self.detail_activities += other.detail_activities
+        self.detail_segments += other.detail_segments
+        self.observations.update(other.observations)
+        self.max_heart_rates.update(other.max_heart_rates)
+        self.activity_heart_rates.update(other.activity_heart_rates)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "sessions": self.sessions,
+            "detail_activities": self.detail_activities,
+            "detail_segments": self.detail_segments,
+            "observations": [[*key, count] for key, count in self.observations.items()],
+            "max_heart_rates": [[value, count] for value, count in self.max_heart_rates.items()],
+            "activity_heart_rates": [[value, count] for value, count in self.activity_heart_rates.items()],
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "EffortSketch":
+        sketch = cls()
+        sketch.sessions = int(data.get("sessions") or 0)
+        sketch.detail_activities = int(data.get("detail_activities") or 0)
+        sketch.detail_segments = int(data.get("detail_segments") or 0)
+        for *key, count in data.get("observations") or []:
+            sketch.observations[tuple(key)] += count
+        for value, count in data.get("max_heart_rates") or []:
+            sketch.max_heart_rates[value] += count
+        for value, count in data.get("activity_heart_rates") or []:
+            sketch.activity_heart_rates[value] += count
+        return sketch
+
+
+def sketch_activities(activities: Iterable[Any], detail_index: Dict[str, Dict]) -> Dict[str, EffortSketch]:
+    """Effort sketches per sport of the given activities and their indexed activityDetails."""
+    sketches: Dict[str, EffortSketch] = {}
+    for activity in activities:
+        sport = normalize_training_sport(activity)
+        if sport in {"UNKNOWN", ""}:
+            continue
+        detail = activity_detail_for(activity, detail_index)
+        segments = detail_segments_for(detail, sport, detail_index) if detail else []
+        sketches.setdefault(sport, EffortSketch()).add_activity(activity, sport, segments)
+    return sketches
+
+
+def _activity_details(db: Session, user_id: int, activities: List[GarminActivityData]) -> List[GarminActivityAuxiliaryData]:
+    """activityDetails rows that can belong to the given activities."""
+    activity_ids = sorted({str(a.activity_id) for a in activities if a.activity_id})
+    summary_ids = sorted(
+        {str(a.summary_id) for a in activities if a.summary_id}
+        | {f"{a.summary_id}-detail" for a in activities if a.summary_id}
+        | set(activity_ids)
+    )
+    details: Dict[int, GarminActivityAuxiliaryData] = {}
+    for offset in range(0, max(len(activity_ids), len(summary_ids)), _IN_CHUNK):
+        for record in db.query(GarminActivityAuxiliaryData).filter(
+            GarminActivityAuxiliaryData.user_id == user_id,
+            GarminActivityAuxiliaryData.summary_type == "activityDetails",
+            or_(
+                GarminActivityAuxiliaryData.activity_id.in_(activity_ids[offset:offset + _IN_CHUNK]),
+                GarminActivityAuxiliaryData.summary_id.in_(summary_ids[offset:offset + _IN_CHUNK]),
+            ),
+        ):
+            details[record.id] = record
+    return list(details.values())
+
+
+def sketches_current(db: Session, user_id: int) -> bool:
+    """True when the user's sketches were fully built with the current version."""
+    state = db.get(TrainingEffortSketchState, user_id)
+    return state is not None and state.version == EFFORT_SKETCH_VERSION
+
+
+def refresh_effort_sketches(db: Session, user_id: int, days: Iterable[date]) -> int:
+    """
+    Recompute one user's effort sketch rows for the given UTC days; the caller commits.
+
+    Rows are upserted on (user_id, day, sport), sports that no longer occur on a day are
+    deleted and days past the retention age out. Users whose sketches were never built
+    are skipped: their first profile read builds everything. Returns rows written.
+    """
+    from app.core.garmin_ingest import upsert_rows
+
+    days = sorted(set(days))
+    if not days or not sketches_current(db, user_id):
+        return 0
+
+    activities = load_activities_on_days(db, user_id, days)
+    detail_index = index_activity_details(_activity_details(db, user_id, activities))
+
+    activities_by_day: Dict[date, List[GarminActivityData]] = {}
+    for activity in activities:
+        activities_by_day.setdefault(activity.start_time.date(), []).append(activity)
+    by_day: Dict[Tuple[date, str], EffortSketch] = {}
+    for day, day_activities in activities_by_day.items():
+        for sport, sketch in sketch_activities(day_activities, detail_index).items():
+            by_day[(day, sport)] = sketch
+
+    retention_start = datetime.utcnow().date() - timedelta(days=EFFORT_SKETCH_RETENTION_DAYS)
+    stale_ids = [
+        row_id
+        for row_id, day, sport in db.query(
+            TrainingEffortSketch.id, TrainingEffortSketch.day, TrainingEffortSketch.sport
+        ).filter(
+            TrainingEffortSketch.user_id == user_id,
+            or_(TrainingEffortSketch.day.in_(days), TrainingEffortSketch.day < retention_start),
+        )
+        if (day, sport) not in by_day or day < retention_start
+    ]
+    for offset in range(0, len(stale_ids), _IN_CHUNK):
+        db.query(TrainingEffortSketch).filter(
+            TrainingEffortSketch.id.in_(stale_ids[offset:offset + _IN_CHUNK])
+        ).delete(synchronize_session=False)
+
+    rows = [
+        {
+            "user_id": user_id,
+            "day": day,
+            "sport": sport,
+            "sketch": json.dumps(sketch.to_json()),
+            "updated_at": datetime.utcnow(),
+        }
+        for (day, sport), sketch in by_day.items()
+        if day >= retention_start
+    ]
+    if rows:
+        upsert_rows(
+            db,
+            TrainingEffortSketch,
+            rows,
+            conflict_columns=["user_id", "day", "sport"],
+            update_columns=["sketch", "updated_at"],
+        )
+    return len(rows)
+
+
+def rebuild_effort_sketches(db: Session, user_id: int) -> int:
+    """Build every effort sketch day of one user inside the retention; commits."""
+    from app.core.garmin_ingest import _dialect_insert
+
+    insert = _dialect_insert(db)
+    now = datetime.utcnow()
+    stmt = insert(TrainingEffortSketchState).values(user_id=user_id, version=EFFORT_SKETCH_VERSION, built_at=now)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[TrainingEffortSketchState.user_id],
+            set_={"version": EFFORT_SKETCH_VERSION, "built_at": now},
+        )
+    )
+    since = datetime.combine(now.date() - timedelta(days=EFFORT_SKETCH_RETENTION_DAYS), time.min)
+    days = {
+        start_time.date()
+        for (start_time,) in db.query(GarminActivityData.start_time).filter(
+            GarminActivityData.user_id == user_id,
+            GarminActivityData.start_time >= since,
+        )
+        if start_time
+    }
+    days |= {day for (day,) in db.query(TrainingEffortSketch.day).filter(TrainingEffortSketch.user_id == user_id)}
+    written = refresh_effort_sketches(db, user_id, days)
+    db.commit()
+    return written
+
+
+def detail_activity_days(db: Session, user_id: int, detail_rows: List[Dict[str, Any]]) -> set[date]:
+    """UTC days of the stored activities that the given activityDetails rows belong to."""
+    keys = {str(row["activity_id"]) for row in detail_rows if row.get("activity_id")}
+    keys |= {str(row["summary_id"]).replace("-detail", "") for row in detail_rows if row.get("summary_id")}
+    keys_list = sorted(keys)
+    days: set[date] = {row["start_time"].date() for row in detail_rows if row.get("start_time")}
+    for offset in range(0, len(keys_list), _IN_CHUNK):
+        chunk = keys_list[offset:offset + _IN_CHUNK]
+        for (start_time,) in db.query(GarminActivityData.start_time).filter(
+            GarminActivityData.user_id == user_id,
+            or_(GarminActivityData.activity_id.in_(chunk), GarminActivityData.summary_id.in_(chunk)),
+        ):
+            if start_time:
+                days.add(start_time.date())
+    return days
+
+
+def load_effort_sketches(db: Session, user_id: int, since: date) -> Dict[str, EffortSketch]:
+    """
+    The user's effort sketches per sport for the days from `since`, merged.
+
+    Reads whole UTC days, so the first day of the window is included completely. Builds
+    the user's sketches first when they are missing or from an older version (commits).
+    """
+    if not sketches_current(db, user_id):
+        rebuild_effort_sketches(db, user_id)
+    merged: Dict[str, EffortSketch] = {}
+    for sport, data in db.query(TrainingEffortSketch.sport, TrainingEffortSketch.sketch).filter(
+        TrainingEffortSketch.user_id == user_id,
+        TrainingEffortSketch.day >= since,
+    ):
+        merged.setdefault(sport, EffortSketch()).merge(EffortSketch.from_json(json.loads(data or "{}")))
+    return merged
@@ -1,16 +1,17 @@
 """Garmin import helpers: migrate orphaned rows and direct activity pull fallback."""
 from __future__ import annotations
 
-import base64
 import json
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Any, Dict, Iterable, List, Optional, TYPE_CHECKING
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
 
-import requests
 from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.database.models import (
     GarminActivityAuxiliaryData,
     GarminActivityData,
@@ -19,9 +20,16 @@ from app.database.models import (
     GarminWebhookEvent,
     UserProfile,
 )
+from app.core.activity_rollup import rebuild_activity_rollup
+from app.core.data_version import bump_data_version
+from app.core.effort_sketch import rebuild_effort_sketches
+from app.core.recovery_snapshot import refresh_recovery_snapshot
+from app.core.webhook_archive import load_webhook_payload
+from app.tools.garmin_callbacks import PingCallback, fetch_ping_callbacks
 from app.tools.garmin_client import (
     write_activity_auxiliary_data,
     write_activity_data,
+    write_activity_file_content,
     write_health_data,
 )
 
@@ -33,10 +41,11 @@ logger = logging.getLogger(__name__)
 REQUESTED_BACKFILL_STATUSES = {"requested", "requested_with_adjusted_start"}
 
 
-def resolve_internal_user_for_garmin(db: Session, garmin_user_id: Optional[str]) -> Optional[int]:
-    """Map a Garmin user id to our internal user id via token or profile."""
-    if not garmin_user_id:
-        return None
+_garmin_users: Dict[str, Tuple[Optional[int], float]] = {}
+_garmin_users_lock = threading.Lock()
+
+
+def _lookup_internal_user_for_garmin(db: Session, garmin_user_id: str) -> Optional[int]:
     token = db.query(GarminToken).filter(GarminToken.garmin_user_id == garmin_user_id).first()
     if token:
         return int(token.user_id)
@@ -46,6 +55,50 @@ def resolve_internal_user_for_garmin(db: Session, garmin_user_id: Optional[str])
     return None
 
 
+def resolve_internal_user_for_garmin(db: Session, garmin_user_id: Optional[str]) -> Optional[int]:
+    """
+    Map a Garmin user id to our internal user id via token or profile.
+
+    Results are cached per process, unknown Garmin users for a shorter time, and
+    dropped by invalidate_garmin_user() when an account is (re)linked or removed.
+    """
+    if not garmin_user_id:
+        return None
+    garmin_user_id = str(garmin_user_id)
+    now = time.monotonic()
+    with _garmin_users_lock:
+        cached = _garmin_users.get(garmin_user_id)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
+    user_id = _lookup_internal_user_for_garmin(db, garmin_user_id)
+    ttl = settings.garmin_user_cache_seconds if user_id is not None else settings.garmin_user_negative_cache_seconds
+    if ttl > 0:
+        with _garmin_users_lock:
+            _garmin_users[garmin_user_id] = (user_id, now + ttl)
+    return user_id
+
+
+def invalidate_garmin_user(*garmin_user_ids: Optional[str]) -> None:
+    """Forget cached resolutions, e.g. after OAuth connect, disconnect or deregistration."""
+    with _garmin_users_lock:
+        for garmin_user_id in garmin_user_ids:
+            if garmin_user_id:
+                _garmin_users.pop(str(garmin_user_id), None)
+
+
+def garmin_user_resolver(db: Session) -> Callable[[Optional[str]], Optional[int]]:
+    """resolve_internal_user_for_garmin memoized for one webhook batch, so a batch maps consistently."""
+    resolved: Dict[Optional[str], Optional[int]] = {}
+
+    def resolve(garmin_user_id: Optional[str]) -> Optional[int]:
+        if garmin_user_id not in resolved:
+            resolved[garmin_user_id] = resolve_internal_user_for_garmin(db, garmin_user_id)
+        return resolved[garmin_user_id]
+
+    return resolve
+
+
 def garmin_user_id_for_internal_user(db: Session, user_id: int) -> Optional[str]:
     token = db.query(GarminToken).filter(GarminToken.user_id == user_id).first()
     if token and token.garmin_user_id:
@@ -67,11 +120,16 @@ def replay_failed_webhooks(
     hours: int = 72,
     limit: int = 40,
 ) -> Dict[str, Any]:
-    """Re-process stored partial/failed webhook payloads once a token is available again."""
+    """
+    Re-process stored partial/failed webhook payloads once a token is available again.
+
+    Dead-lettered events are included, since a reconnect is what they were waiting for;
+    events that still fail get a fresh cycle of background retries.
+    """
     resolved_garmin_user_id = garmin_user_id or garmin_user_id_for_internal_user(db, user_id)
     cutoff = datetime.utcnow() - timedelta(hours=hours)
     query = db.query(GarminWebhookEvent).filter(
-        GarminWebhookEvent.status.in_(["partial", "failed"]),
+        GarminWebhookEvent.status.in_(["partial", "failed", "dead_letter"]),
         GarminWebhookEvent.source.in_(REPLAYABLE_WEBHOOK_SOURCES),
         GarminWebhookEvent.created_at >= cutoff,
     )
@@ -94,17 +152,19 @@ def replay_failed_webhooks(
         "errors": [],
         "event_ids": [],
     }
+    replayed_users: set[int] = set()
+    resolve_user = garmin_user_resolver(db)
 
     for event in events:
         result["event_ids"].append(event.id)
         target_user_id = user_id
         if event.garmin_user_id:
-            resolved = resolve_internal_user_for_garmin(db, str(event.garmin_user_id))
+            resolved = resolve_user(str(event.garmin_user_id))
             if resolved:
                 target_user_id = resolved
 
         try:
-            payload = _parse_webhook_payload(event.payload)
+            payload = _parse_webhook_payload(load_webhook_payload(db, event))
         except json.JSONDecodeError:
             result["still_failed"] += 1
             result["errors"].append(f"event {event.id}: invalid payload JSON")
@@ -120,20 +180,31 @@ def replay_failed_webhooks(
             continue
 
         result["stored_items"] += stats.get("stored_items", 0)
+        if stats.get("stored_items"):
+            replayed_users.add(target_user_id)
         if stats.get("errors"):
             result["still_failed"] += 1
             result["errors"].extend(stats["errors"][:3])
             event.status = "partial"
             event.error = "\n".join(stats["errors"][:10])
+            event.attempts = 0
+            event.next_attempt_at = datetime.utcnow() + timedelta(seconds=settings.webhook_retry_base_seconds)
         else:
             result["replayed"] += 1
             event.status = "processed"
             event.error = None
+            event.next_attempt_at = None
         event.user_id = target_user_id
         event.updated_at = datetime.utcnow()
 
     if events:
         db.commit()
+    for replayed_user_id in replayed_users:
+        try:
+            refresh_recovery_snapshot(db, replayed_user_id)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Recovery snapshot refresh failed for user {replayed_user_id}: {e}")
     return result
 
 
@@ -150,88 +221,108 @@ def _parse_webhook_payload(raw_payload: Any) -> Dict[str, Any]:
 
 def _replay_health_payload(db: Session, user_id: int, payload: Dict[str, Any]) -> Dict[str, Any]:
     stats = {"stored_items": 0, "errors": []}
-    client = None
+    pings: List[PingCallback] = []
     for summary_type, items in payload.items():
         if summary_type == "deregistrations" or not isinstance(items, list):
             continue
+        push_items = []
         for item in items:
             if not isinstance(item, dict):
                 continue
-            callback_url = item.get("callbackURL")
-            if not callback_url:
-                try:
-                    write_health_data(db, user_id, summary_type, [item])
-                    stats["stored_items"] += 1
-                except Exception as exc:
-                    stats["errors"].append(f"PUSH {summary_type}: {exc}")
-                continue
+            if item.get("callbackURL"):
+                pings.append(PingCallback(user_id=user_id, summary_type=summary_type, item=item))
+            else:
+                push_items.append(item)
+        if push_items:
+            # PUSH items of one summary type go through a single bulk upsert.
             try:
-                if client is None:
-                    from app.tools.garmin_client import GarminAPIClient
-
-                    client = GarminAPIClient(db, user_id)
-                response = requests.get(callback_url, headers=client._get_headers(), timeout=30)
-                if response.status_code == 200:
-                    summaries = response.json()
-                    write_health_data(db, user_id, summary_type, summaries)
-                    stats["stored_items"] += len(summaries) if isinstance(summaries, list) else 1
-                else:
-                    stats["errors"].append(
-                        f"PING {summary_type}: callback {response.status_code}"
-                    )
+                written = write_health_data(db, user_id, summary_type, push_items)
+                stats["stored_items"] += written["inserted"] + written["updated"]
             except Exception as exc:
-                stats["errors"].append(f"PING {summary_type}: {exc}")
+                db.rollback()
+                stats["errors"].append(f"PUSH {summary_type}: {exc}")
+
+    for ping, response in fetch_ping_callbacks(db, pings):
+        summary_type = ping.summary_type
+        try:
+            if response.error:
+                raise Exception(response.error)
+            if response.status_code == 200:
+                summaries = response.json()
+                write_health_data(db, user_id, summary_type, summaries)
+                stats["stored_items"] += len(summaries) if isinstance(summaries, list) else 1
+            else:
+                stats["errors"].append(
+                    f"PING {summary_type}: callback {response.status_code}"
+                )
+        except Exception as exc:
+            db.rollback()
+            stats["errors"].append(f"PING {summary_type}: {exc}")
     return stats
 
 
 def _replay_activity_payload(db: Session, user_id: int, payload: Dict[str, Any]) -> Dict[str, Any]:
     stats = {"stored_items": 0, "errors": []}
-    client = None
+    pings: List[PingCallback] = []
     for summary_type, items in payload.items():
         if not isinstance(items, list):
             continue
+        push_items = []
         for item in items:
             if not isinstance(item, dict):
                 continue
-            callback_url = item.get("callbackURL")
-            if not callback_url:
+            if not item.get("callbackURL"):
+                push_items.append(item)
+                continue
+            if summary_type == "activityFiles":
                 try:
-                    write_activity_data(db, user_id, [item], summary_type)
-                    stats["stored_items"] += 1
+                    write_activity_auxiliary_data(db, user_id, summary_type, [item])
                 except Exception as exc:
-                    stats["errors"].append(f"PUSH {summary_type}: {exc}")
-                continue
+                    db.rollback()
+                    stats["errors"].append(f"activityFiles metadata: {exc}")
+            pings.append(PingCallback(user_id=user_id, summary_type=summary_type, item=item))
+        if push_items:
             try:
-                if client is None:
-                    from app.tools.garmin_client import GarminAPIClient
+                written = write_activity_data(db, user_id, push_items, summary_type)
+                stats["stored_items"] += written["inserted"] + written["updated"]
+            except Exception as exc:
+                db.rollback()
+                stats["errors"].append(f"PUSH {summary_type}: {exc}")
 
-                    client = GarminAPIClient(db, user_id)
-                if summary_type == "activityFiles":
-                    write_activity_auxiliary_data(db, user_id, summary_type, [item])
-                    file_response = requests.get(callback_url, headers=client._get_headers(), timeout=60)
-                    if file_response.status_code == 200:
-                        payload_item = dict(item)
-                        payload_item["contentType"] = file_response.headers.get("content-type")
-                        payload_item["contentLength"] = len(file_response.content)
-                        payload_item["contentBase64"] = base64.b64encode(file_response.content).decode("ascii")
-                        write_activity_auxiliary_data(db, user_id, "activityFiles", [payload_item])
-                        stats["stored_items"] += 1
-                    else:
-                        stats["errors"].append(
-                            f"activityFiles callback {file_response.status_code}"
-                        )
-                    continue
-                response = requests.get(callback_url, headers=client._get_headers(), timeout=30)
+    for ping, response in fetch_ping_callbacks(db, pings):
+        summary_type = ping.summary_type
+        try:
+            if response.error:
+                raise Exception(response.error)
+            if summary_type == "activityFiles":
                 if response.status_code == 200:
-                    summaries = response.json()
-                    write_activity_data(db, user_id, summaries, summary_type)
-                    stats["stored_items"] += len(summaries) if isinstance(summaries, list) else 1
+                    write_activity_file_content(
+                        db,
+                        user_id,
+                        ping.item,
+                        response.body,
+                        response.headers.get("content-type"),
+                        response.content_hash,
+                    )
+                    stats["stored_items"] += 1
                 else:
                     stats["errors"].append(
-                        f"PING {summary_type}: callback {response.status_code}"
+                        f"activityFiles callback {response.status_code}"
                     )
-            except Exception as exc:
-                stats["errors"].append(f"PING {summary_type}: {exc}")
+                continue
+            if response.status_code == 200:
+                summaries = response.json()
+                write_activity_data(db, user_id, summaries, summary_type)
+                stats["stored_items"] += len(summaries) if isinstance(summaries, list) else 1
+            else:
+                stats["errors"].append(
+                    f"PING {summary_type}: callback {response.status_code}"
+                )
+        except Exception as exc:
+            db.rollback()
+            stats["errors"].append(f"PING {summary_type}: {exc}")
+        finally:
+            response.close()
     return stats
 
 
@@ -303,6 +394,15 @@ def migrate_garmin_account_data(
             merged["source_user_ids"].append(source_user_id)
         for key in ("activities", "activity_auxiliary", "health"):
             merged[key] += moved[key]
+    if merged["activities"] or merged["health"]:
+        for user_id in [target_user_id, *merged["source_user_ids"]]:
+            if merged["activities"]:
+                rebuild_activity_rollup(db, user_id)
+            if merged["activities"] or merged["activity_auxiliary"]:
+                rebuild_effort_sketches(db, user_id)
+            refresh_recovery_snapshot(db, user_id)
+            bump_data_version(db, user_id)
+        db.commit()
     return merged
 
 
@@ -0,0 +1,471 @@
+"""Set-based writers for Garmin webhook summaries (chunked native upserts)."""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.activity_rollup import activity_days, refresh_activity_rollup
+from app.core.data_version import bump_data_version
+from app.core.detail_segments import stored_detail_segments
+from app.core.effort_sketch import detail_activity_days, refresh_effort_sketches
+from app.core.recovery_snapshot import summary_nightly_hrv, summary_sleep_score
+from app.database.models import GarminActivityAuxiliaryData, GarminActivityData, GarminHealthData
+
+logger = logging.getLogger(__name__)
+
+INGEST_CHUNK_SIZE = 500
+
+ACTIVITY_SUMMARY_TYPES = {"activities", "manuallyUpdatedActivities"}
+
+# Typed garmin_activity_data columns and the Garmin summary field that feeds them.
+ACTIVITY_COLUMN_FIELDS = {
+    "activity_id": "activityId",
+    "activity_type": "activityType",
+    "activity_name": "activityName",
+    "start_time_offset": "startTimeOffsetInSeconds",
+    "duration": "durationInSeconds",
+    "distance": "distanceInMeters",
+    "calories": "activeKilocalories",
+    "average_heart_rate": "averageHeartRateInBeatsPerMinute",
+    "max_heart_rate": "maxHeartRateInBeatsPerMinute",
+    "device_name": "deviceName",
+    "elevation_gain": "totalElevationGainInMeters",
+    "average_speed": "averageSpeedInMetersPerSecond",
+    "average_pace": "averagePaceInMinutesPerKilometer",
+    "average_run_cadence": "averageRunCadenceInStepsPerMinute",
+}
+
+# Typed garmin_health_data columns, filled per summary type; the others stay NULL.
+HEALTH_TYPED_COLUMNS = ("resting_heart_rate", "sleep_score", "hrv_last_night_avg")
+
+
+def _health_typed_values(summary_type: str, summary: Dict[str, Any]) -> Dict[str, Any]:
+    values: Dict[str, Any] = dict.fromkeys(HEALTH_TYPED_COLUMNS)
+    if summary_type == "dailies":
+        resting_hr = summary.get("restingHeartRateInBeatsPerMinute")
+        values["resting_heart_rate"] = int(resting_hr) if isinstance(resting_hr, (int, float)) else None
+    elif summary_type == "sleeps":
+        values["sleep_score"] = summary_sleep_score(summary)
+    elif summary_type == "hrv":
+        values["hrv_last_night_avg"] = summary_nightly_hrv(summary)
+    return values
+
+
+def _empty_stats() -> Dict[str, int]:
+    return {"inserted": 0, "updated": 0, "skipped": 0}
+
+
+def _chunks(rows: List[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    for start in range(0, len(rows), max(1, size)):
+        yield rows[start:start + size]
+
+
+def _dialect_insert(db: Session):
+    """Return the dialect-specific insert() that supports ON CONFLICT, if any."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+
+        return insert
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+
+        return insert
+    return None
+
+
+def _upsert_chunk(
+    db: Session,
+    model,
+    rows: List[Dict[str, Any]],
+    *,
+    conflict_columns: List[str],
+    update_columns: List[str],
+) -> Dict[str, int]:
+    """Write one chunk with a single multi-row INSERT ... ON CONFLICT DO UPDATE."""
+    table = model.__table__
+    key_columns = [getattr(model, column) for column in conflict_columns]
+
+    def row_key(row: Dict[str, Any]) -> tuple:
+        return tuple(row[column] for column in conflict_columns)
+
+    # One IN query per chunk tells us which rows are updates (for the stats only).
+    if len(conflict_columns) == 1:
+        keys = [row[conflict_columns[0]] for row in rows]
+        existing = {(value,) for (value,) in db.query(key_columns[0]).filter(key_columns[0].in_(keys))}
+    else:
+        from sqlalchemy import tuple_
+
+        keys = [row_key(row) for row in rows]
+        existing = {tuple(found) for found in db.query(*key_columns).filter(tuple_(*key_columns).in_(keys))}
+
+    insert = _dialect_insert(db)
+    if insert is not None:
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=conflict_columns,
+            set_={column: stmt.excluded[column] for column in update_columns},
+        )
+        db.execute(stmt)
+    else:
+        # Generic fallback: same prefetch, then ORM updates/inserts for the chunk.
+        by_key = {}
+        if existing:
+            query = db.query(model)
+            for column, key_column in zip(conflict_columns, key_columns):
+                query = query.filter(key_column.in_({key[conflict_columns.index(column)] for key in existing}))
+            by_key = {tuple(getattr(obj, column) for column in conflict_columns): obj for obj in query}
+        for row in rows:
+            obj = by_key.get(row_key(row))
+            if obj is None:
+                db.add(model(**row))
+                continue
+            for column in update_columns:
+                setattr(obj, column, row[column])
+
+    updated = sum(1 for row in rows if row_key(row) in existing)
+    return {"inserted": len(rows) - updated, "updated": updated, "skipped": 0}
+
+
+def upsert_rows(
+    db: Session,
+    model,
+    rows: Iterable[Dict[str, Any]],
+    *,
+    conflict_columns: List[str],
+    update_columns: List[str],
+    chunk_size: int = INGEST_CHUNK_SIZE,
+) -> Dict[str, int]:
+    """Upsert prepared rows chunk by chunk; duplicates inside the batch keep the last row."""
+    stats = _empty_stats()
+    deduped: Dict[tuple, Dict[str, Any]] = {}
+    for row in rows:
+        key = tuple(row[column] for column in conflict_columns)
+        if key in deduped:
+            stats["skipped"] += 1
+        deduped[key] = row
+
+    for chunk in _chunks(list(deduped.values()), chunk_size):
+        chunk_stats = _upsert_chunk(
+            db,
+            model,
+            chunk,
+            conflict_columns=conflict_columns,
+            update_columns=update_columns,
+        )
+        stats["inserted"] += chunk_stats["inserted"]
+        stats["updated"] += chunk_stats["updated"]
+    return stats
+
+
+def health_summary_start_time(summary: Dict[str, Any]) -> Optional[datetime]:
+    """Resolve the UTC start timestamp Garmin uses for a health summary."""
+    if "startTimeInSeconds" in summary:
+        return datetime.utcfromtimestamp(summary["startTimeInSeconds"])
+    nested = summary.get("summary")
+    if isinstance(nested, dict) and nested.get("startTimeInSeconds"):
+        return datetime.utcfromtimestamp(nested["startTimeInSeconds"])
+    if "measurementTimeInSeconds" in summary:
+        return datetime.utcfromtimestamp(summary["measurementTimeInSeconds"])
+    return None
+
+
+def health_summary_row(
+    user_id: int,
+    summary_type: str,
+    summary: Dict[str, Any],
+    now: datetime,
+) -> Optional[Dict[str, Any]]:
+    """Map one Garmin health summary to a garmin_health_data row, or None when unusable."""
+    summary_id = summary.get("summaryId")
+    start_time = health_summary_start_time(summary)
+
+    if not summary_id and start_time is not None:
+        summary_id = f"{summary_type}-{user_id}-{int(start_time.timestamp())}"
+    if not summary_id:
+        return None
+    if not start_time:
+        logger.warning(f"No timestamp found in summary {summary_id}")
+        return None
+
+    return {
+        "user_id": user_id,
+        "summary_id": str(summary_id),
+        "summary_type": summary_type,
+        "calendar_date": summary.get("calendarDate"),
+        "start_time": start_time,
+        "start_time_offset": summary.get("startTimeOffsetInSeconds") or summary.get("offsetInSeconds"),
+        "duration": summary.get("durationInSeconds"),
+        **_health_typed_values(summary_type, summary),
+        "data": summary,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _delete_shifted_health_rows(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """
+    Delete stored rows whose summary_id is re-sent with a corrected start time.
+
+    The upsert key is (summary_id, start_time) for the hypertable, so such a re-send
+    would otherwise become a second row. Returns the number of summaries affected.
+    """
+    start_times = {row["summary_id"]: row["start_time"] for row in rows}
+    shifted: set[str] = set()
+    for chunk in _chunks(list(start_times), INGEST_CHUNK_SIZE):
+        shifted.update(
+            summary_id
+            for summary_id, start_time in db.query(GarminHealthData.summary_id, GarminHealthData.start_time).filter(
+                GarminHealthData.summary_id.in_(chunk)
+            )
+            if start_time != start_times[summary_id]
+        )
+    for summary_id in shifted:
+        db.query(GarminHealthData).filter(
+            GarminHealthData.summary_id == summary_id,
+            GarminHealthData.start_time != start_times[summary_id],
+        ).delete(synchronize_session=False)
+    return len(shifted)
+
+
+def upsert_health_summaries(
+    db: Session,
+    user_id: int,
+    summary_type: str,
+    summaries: Iterable[Dict[str, Any]],
+    *,
+    chunk_size: int = INGEST_CHUNK_SIZE,
+) -> Dict[str, int]:
+    """
+    Store Garmin health summaries with one INSERT ... ON CONFLICT (summary_id, start_time) per chunk.
+
+    Existing rows keep their identity columns; only the typed metric columns, the raw
+    payload and updated_at are refreshed. Returns inserted/updated/skipped counts.
+    """
+    rows, skipped = _build_rows(health_summary_row, user_id, summary_type, summaries)
+    # summary_id stays unique even though the key includes start_time: keep the last copy
+    # in the batch and drop stored rows of the same summary under another start time.
+    by_summary_id = {row["summary_id"]: row for row in rows}
+    skipped += len(rows) - len(by_summary_id)
+    rows = list(by_summary_id.values())
+    moved = _delete_shifted_health_rows(db, rows)
+    stats = upsert_rows(
+        db,
+        GarminHealthData,
+        rows,
+        conflict_columns=["summary_id", "start_time"],
+        update_columns=[*HEALTH_TYPED_COLUMNS, "data", "updated_at"],
+        chunk_size=chunk_size,
+    )
+    stats["inserted"] -= moved
+    stats["updated"] += moved
+    stats["skipped"] += skipped
+    bump_data_version(db, user_id)
+    db.commit()
+    return stats
+
+
+def _summary_field(summary: Dict[str, Any], key: str) -> Any:
+    """Read a field from the summary, falling back to the nested `summary` block of activityDetails."""
+    if summary.get(key) is not None:
+        return summary[key]
+    nested = summary.get("summary")
+    if isinstance(nested, dict):
+        return nested.get(key)
+    return None
+
+
+def activity_summary_row(
+    user_id: int,
+    summary_type: str,
+    summary: Dict[str, Any],
+    now: datetime,
+) -> Optional[Dict[str, Any]]:
+    """Map one Garmin activity summary to a garmin_activity_data row, or None when unusable."""
+    summary_id = summary.get("summaryId")
+    if not summary_id:
+        return None
+    if summary.get("startTimeInSeconds") is None or not summary.get("activityType"):
+        logger.warning(f"Activity summary {summary_id} is missing startTimeInSeconds or activityType")
+        return None
+
+    row = {column: summary.get(field) for column, field in ACTIVITY_COLUMN_FIELDS.items()}
+    if row["activity_id"] is not None:
+        row["activity_id"] = str(row["activity_id"])
+    row.update(
+        user_id=user_id,
+        summary_id=str(summary_id),
+        summary_type=summary_type,
+        start_time=datetime.utcfromtimestamp(summary["startTimeInSeconds"]),
+        manual=bool(summary.get("manual", False)),
+        data=summary,
+        created_at=now,
+        updated_at=now,
+    )
+    return row
+
+
+def _stored_segments(summary: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Effort segments kept with an activityDetails row; None (extracted on read) if the samples are malformed."""
+    try:
+        return stored_detail_segments(summary)
+    except Exception as e:
+        logger.warning(f"Could not extract segments from activityDetails {summary.get('summaryId')}: {e}")
+        return None
+
+
+def auxiliary_summary_row(
+    user_id: int,
+    summary_type: str,
+    summary: Dict[str, Any],
+    now: datetime,
+) -> Optional[Dict[str, Any]]:
+    """Map an activityDetails/activityFiles/moveIQ payload to a garmin_activity_auxiliary_data row."""
+    summary_id = (
+        summary.get("summaryId")
+        or summary.get("activityId")
+        or summary.get("fileId")
+        or summary.get("callbackURL")
+    )
+    if not summary_id:
+        logger.warning(f"No stable identifier found in {summary_type} summary")
+        return None
+
+    start_seconds = _summary_field(summary, "startTimeInSeconds")
+    activity_id = _summary_field(summary, "activityId")
+    return {
+        "user_id": user_id,
+        "summary_id": str(summary_id),
+        "summary_type": summary_type,
+        "activity_id": str(activity_id) if activity_id is not None else None,
+        "start_time": datetime.utcfromtimestamp(start_seconds) if start_seconds is not None else None,
+        "start_time_offset": _summary_field(summary, "startTimeOffsetInSeconds"),
+        "duration": _summary_field(summary, "durationInSeconds"),
+        "data": summary,
+        "segments": _stored_segments(summary) if summary_type == "activityDetails" else None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _build_rows(row_builder, user_id: int, summary_type: str, summaries) -> tuple[List[Dict[str, Any]], int]:
+    now = datetime.utcnow()
+    rows: List[Dict[str, Any]] = []
+    skipped = 0
+    for summary in summaries or []:
+        row = row_builder(user_id, summary_type, summary, now) if isinstance(summary, dict) else None
+        if row is None:
+            skipped += 1
+            continue
+        rows.append(row)
+    return rows, skipped
+
+
+def upsert_activity_summaries(
+    db: Session,
+    user_id: int,
+    summaries: Iterable[Dict[str, Any]],
+    summary_type: str = "activities",
+    *,
+    chunk_size: int = INGEST_CHUNK_SIZE,
+) -> Dict[str, int]:
+    """
+    Store activity list summaries with one INSERT ... ON CONFLICT (summary_id) per chunk.
+
+    Non-list summary types (activityDetails, activityFiles, moveIQActivities) are routed
+    to the auxiliary table. A conflicting row gets its typed columns and payload
+    refreshed, so manual edits in Garmin Connect overwrite the stored values. The daily
+    rollup of every day the batch touches (old and new start days) is rebuilt in the
+    same transaction.
+    """
+    if summary_type not in ACTIVITY_SUMMARY_TYPES:
+        return upsert_auxiliary_summaries(db, user_id, summary_type, summaries, chunk_size=chunk_size)
+
+    rows, skipped = _build_rows(activity_summary_row, user_id, summary_type, summaries)
+    touched_days = activity_days(db, [row["summary_id"] for row in rows])
+    touched_days.update(row["start_time"].date() for row in rows)
+    stats = upsert_rows(
+        db,
+        GarminActivityData,
+        rows,
+        conflict_columns=["summary_id"],
+        update_columns=[
+            "summary_type",
+            *ACTIVITY_COLUMN_FIELDS,
+            "start_time",
+            "manual",
+            "data",
+            "updated_at",
+        ],
+        chunk_size=chunk_size,
+    )
+    stats["skipped"] += skipped
+    refresh_activity_rollup(db, user_id, touched_days)
+    refresh_effort_sketches(db, user_id, touched_days)
+    bump_data_version(db, user_id)
+    db.commit()
+    return stats
+
+
+# Keys a successful activityFiles fetch adds to the ping metadata (see store_activity_file).
+FILE_CONTENT_KEYS = ("contentHash", "contentLength", "contentChunks", "contentType", "contentBase64")
+
+
+def _keep_file_content(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    Carry the stored file reference over to re-sent activityFiles metadata without one.
+
+    A ping's metadata is stored before its file is fetched; without this a failed or
+    expired re-fetch would leave the activity without its already stored chunks.
+    """
+    pending = [row for row in rows if not row["data"].get("contentHash")]
+    stored: Dict[str, Dict[str, Any]] = {}
+    for chunk in _chunks(sorted({row["summary_id"] for row in pending}), INGEST_CHUNK_SIZE):
+        for summary_id, data in db.query(
+            GarminActivityAuxiliaryData.summary_id, GarminActivityAuxiliaryData.data
+        ).filter(
+            GarminActivityAuxiliaryData.summary_type == "activityFiles",
+            GarminActivityAuxiliaryData.summary_id.in_(chunk),
+        ):
+            content = {key: data[key] for key in FILE_CONTENT_KEYS if isinstance(data, dict) and key in data}
+            if content.get("contentHash") or content.get("contentBase64"):
+                stored[summary_id] = content
+    for row in pending:
+        if row["summary_id"] in stored:
+            row["data"] = {**row["data"], **stored[row["summary_id"]]}
+
+
+def upsert_auxiliary_summaries(
+    db: Session,
+    user_id: int,
+    summary_type: str,
+    summaries: Iterable[Dict[str, Any]],
+    *,
+    chunk_size: int = INGEST_CHUNK_SIZE,
+) -> Dict[str, int]:
+    """
+    Store auxiliary activity payloads keyed by (summary_type, summary_id).
+
+    New activityDetails refresh the effort sketches of their activities' days in the same
+    transaction. Re-sent activityFiles metadata keeps the reference to the stored file.
+    """
+    rows, skipped = _build_rows(auxiliary_summary_row, user_id, summary_type, summaries)
+    if summary_type == "activityFiles":
+        _keep_file_content(db, rows)
+    stats = upsert_rows(
+        db,
+        GarminActivityAuxiliaryData,
+        rows,
+        conflict_columns=["summary_type", "summary_id"],
+        update_columns=["activity_id", "start_time", "start_time_offset", "duration", "data", "segments", "updated_at"],
+        chunk_size=chunk_size,
+    )
+    stats["skipped"] += skipped
+    if summary_type == "activityDetails" and rows:
+        refresh_effort_sketches(db, user_id, detail_activity_days(db, user_id, rows))
+    bump_data_version(db, user_id)
+    db.commit()
+    return stats
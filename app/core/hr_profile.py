@@ -2,8 +2,9 @@
 from __future__ import annotations
 
 import statistics
+from collections import Counter
 from dataclasses import dataclass
-from typing import Any, Iterable, Optional
+from typing import Any, Iterable, Mapping, Optional
 
 
 @dataclass
@@ -14,13 +15,24 @@ class HRProfile:
 
 
 def _winsorize_max(values: list[int], cap: int = 210) -> Optional[int]:
-    clean = sorted(v for v in values if v and 80 <= v <= cap)
-    if not clean:
+    return _winsorize_max_counts(Counter(values), cap)
+
+
+def _winsorize_max_counts(counts: Mapping[int, int], cap: int = 210) -> Optional[int]:
+    """p95 of the max HR values (max below 5 samples), given as value -> number of sessions."""
+    clean = sorted((int(v), n) for v, n in counts.items() if v and 80 <= v <= cap and n > 0)
+    total = sum(n for _, n in clean)
+    if not total:
         return None
-    if len(clean) >= 5:
-        idx = int(round((len(clean) - 1) * 0.95))
-        return int(clean[idx])
-    return int(max(clean))
+    if total < 5:
+        return clean[-1][0]
+    idx = int(round((total - 1) * 0.95))
+    seen = 0
+    for value, n in clean:
+        seen += n
+        if idx < seen:
+            return value
+    return clean[-1][0]
 
 
 def resolve_hr_profile(
@@ -30,10 +42,21 @@ def resolve_hr_profile(
     age_years: Optional[int] = None,
 ) -> HRProfile:
     """Resolve effective max HR from recent activities and optional metadata."""
-    max_hrs = [int(a.max_heart_rate) for a in activities if getattr(a, "max_heart_rate", None)]
-    observed = _winsorize_max(max_hrs)
+    max_hrs = Counter(int(a.max_heart_rate) for a in activities if getattr(a, "max_heart_rate", None))
+    return resolve_hr_profile_from_counts(max_hrs, resting_hr=resting_hr, age_years=age_years)
+
+
+def resolve_hr_profile_from_counts(
+    max_hr_counts: Mapping[int, int],
+    *,
+    resting_hr: Optional[int] = None,
+    age_years: Optional[int] = None,
+) -> HRProfile:
+    """Like resolve_hr_profile, from session max HRs counted as value -> number of sessions."""
+    observed = _winsorize_max_counts(max_hr_counts)
     if observed:
-        return HRProfile(effective_max=observed, source="observed_p95", confidence="high" if len(max_hrs) >= 8 else "medium")
+        sessions = sum(max_hr_counts.values())
+        return HRProfile(effective_max=observed, source="observed_p95", confidence="high" if sessions >= 8 else "medium")
 
     if resting_hr and resting_hr > 0:
         estimate = min(210, resting_hr + 95)
@@ -34,7 +34,11 @@ def compute_load_metrics(
     acute_days: int = ACUTE_DAYS,
     chronic_days: int = CHRONIC_DAYS,
 ) -> LoadMetrics:
-    """Acute = last `acute_days`; chronic = prior `chronic_days` averaged per week."""
+    """
+    Acute = last `acute_days`; chronic = prior `chronic_days` averaged per week.
+
+    Takes activity rows or daily rollup buckets (see load_activity_buckets).
+    """
     now = now or datetime.utcnow()
     current_start = now - timedelta(days=acute_days)
     baseline_start = current_start - timedelta(days=chronic_days)
@@ -64,19 +68,6 @@ def compute_load_metrics(
     )
 
 
-def compute_load_metrics_for_sport(
-    activities: Iterable[Any],
-    sport: str,
-    *,
-    now: Optional[datetime] = None,
-    sport_normalizer=None,
-) -> LoadMetrics:
-    """Filter activities to one sport then compute load metrics."""
-    normalizer = sport_normalizer or (lambda a: getattr(a, "activity_type", "") or "")
-    filtered = [a for a in activities if normalizer(a) == sport]
-    return compute_load_metrics(filtered, now=now)
-
-
 def _load_label(ratio: Optional[float]) -> str:
     if ratio is None:
         return "insufficient_data"
@@ -0,0 +1,87 @@
+"""Unit-of-work memo for values derived from Garmin payload objects."""
+from __future__ import annotations
+
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional["PayloadMemo"]] = ContextVar("garmin_payload_memo", default=None)
+
+_totals = {"scopes": 0, "hits": 0, "misses": 0}
+_totals_lock = threading.Lock()
+
+
+@dataclass
+class PayloadMemo:
+    """
+    Derived values keyed by (kind, payload identity, extra key).
+
+    Each entry keeps a reference to its payload, so an id() cannot be reused by another
+    object while the memo is alive and an `is` check is enough to validate a hit.
+    """
+    entries: Dict[Tuple[str, int, Tuple[Any, ...]], Tuple[Any, Any]] = field(default_factory=dict)
+    hits: int = 0
+    misses: int = 0
+
+    def get_or_compute(self, kind: str, payload: Any, compute: Callable[[], Any], *key: Any) -> Any:
+        entry_key = (kind, id(payload), key)
+        entry = self.entries.get(entry_key)
+        if entry is not None and entry[0] is payload:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        value = compute()
+        self.entries[entry_key] = (payload, value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+
+@contextmanager
+def payload_memo(label: str = "") -> Iterator[PayloadMemo]:
+    """
+    Open a memo for one unit of work (a request, a context build, an analysis run).
+
+    Nested scopes share the outermost memo. Counters are logged at debug level when the
+    outermost scope closes and added to the process totals.
+    """
+    outer = _current.get()
+    if outer is not None:
+        yield outer
+        return
+
+    memo = PayloadMemo()
+    token = _current.set(memo)
+    try:
+        yield memo
+    finally:
+        _current.reset(token)
+        with _totals_lock:
+            _totals["scopes"] += 1
+            _totals["hits"] += memo.hits
+            _totals["misses"] += memo.misses
+        logger.debug(f"Payload memo {label or 'scope'}: {memo.hits} reused, {memo.misses} computed")
+
+
+def memoized(kind: str, payload: Any, compute: Callable[[], Any], *key: Any) -> Any:
+    """compute() once per payload object inside a payload_memo scope; uncached outside one."""
+    memo = _current.get()
+    if memo is None:
+        return compute()
+    return memo.get_or_compute(kind, payload, compute, *key)
+
+
+def active_payload_memo() -> Optional[PayloadMemo]:
+    return _current.get()
+
+
+def payload_memo_totals() -> Dict[str, int]:
+    """Process-wide hits/misses over all closed scopes since start-up."""
+    with _totals_lock:
+        return dict(_totals)
@@ -2,8 +2,10 @@
 from __future__ import annotations
 
 import json
+import logging
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional
 
 from sqlalchemy.orm import Session
 
@@ -13,7 +15,25 @@ from app.core.readiness import (
     compute_readiness_score,
     compute_recent_fatigue,
 )
-from app.database.models import GarminActivityData, GarminHealthData
+from app.database.models import GarminActivityData, GarminHealthData, RecoverySnapshot
+
+logger = logging.getLogger(__name__)
+
+# Bump when the stored inputs layout changes so rows are rebuilt on next read.
+RECOVERY_SNAPSHOT_VERSION = 1
+
+RECOVERY_HEALTH_TYPES = ("dailies", "sleeps", "stressDetails", "hrv")
+RECOVERY_ACTIVITY_TYPES = ("activities", "manuallyUpdatedActivities")
+RECENT_ACTIVITY_HOURS = 72
+HRV_HISTORY_LIMIT = 14
+BODY_BATTERY_STALE_HOURS = 6
+
+# A stored snapshot with a stale Body Battery is re-read from the tables at most this often,
+# in case a delivery bypassed the webhook ingest.
+SNAPSHOT_RECHECK_MINUTES = 15
+
+_EPOCH = datetime(1970, 1, 1)
+_RECORD_KEYS = {"dailies": "daily", "sleeps": "sleep", "stressDetails": "stress", "hrv": "hrv"}
 
 
 def _load_health_payload(record: Optional[GarminHealthData]) -> Dict:
@@ -40,8 +60,8 @@ def _latest_health_record(db: Session, user_id: int, summary_type: str, since: d
     )
 
 
-def _hrv_history(db: Session, user_id: int, since: datetime, limit: int = 14) -> List[int]:
-    records = (
+def _hrv_records(db: Session, user_id: int, since: datetime, limit: int) -> List[GarminHealthData]:
+    return (
         db.query(GarminHealthData)
         .filter(
             GarminHealthData.user_id == user_id,
@@ -52,27 +72,51 @@ def _hrv_history(db: Session, user_id: int, since: datetime, limit: int = 14) ->
         .limit(limit)
         .all()
     )
+
+
+def summary_nightly_hrv(payload: Dict) -> Optional[int]:
+    """Last-night average of a Garmin hrv summary, else the mean of its hrvValues."""
+    last_night = payload.get("lastNightAvg")
+    if isinstance(last_night, (int, float)) and last_night > 0:
+        return int(last_night)
+    hrv_values = payload.get("hrvValues")
+    hrv_vals = [
+        int(v)
+        for v in (hrv_values.values() if isinstance(hrv_values, dict) else [])
+        if isinstance(v, (int, float)) and v > 0
+    ]
+    if hrv_vals:
+        return int(sum(hrv_vals) / len(hrv_vals))
+    return None
+
+
+def _hrv_history(db: Session, user_id: int, since: datetime, limit: int = HRV_HISTORY_LIMIT) -> List[int]:
     values: List[int] = []
-    for record in records:
-        payload = _load_health_payload(record)
-        last_night = payload.get("lastNightAvg")
-        if isinstance(last_night, (int, float)) and last_night > 0:
-            values.append(int(last_night))
-        else:
-            hrv_vals = [
-                int(v)
-                for v in (payload.get("hrvValues") or {}).values()
-                if isinstance(v, (int, float)) and v > 0
-            ]
-            if hrv_vals:
-                values.append(int(sum(hrv_vals) / len(hrv_vals)))
+    for record in _hrv_records(db, user_id, since, limit):
+        value = summary_nightly_hrv(_load_health_payload(record))
+        if value is not None:
+            values.append(value)
     return values
 
 
-def _sleep_score(sleep: Dict) -> Optional[int]:
+def _recent_activities(db: Session, user_id: int, since: datetime) -> List[GarminActivityData]:
+    return (
+        db.query(GarminActivityData)
+        .filter(
+            GarminActivityData.user_id == user_id,
+            GarminActivityData.summary_type.in_(list(RECOVERY_ACTIVITY_TYPES)),
+            GarminActivityData.start_time >= since,
+        )
+        .order_by(GarminActivityData.start_time.desc())
+        .all()
+    )
+
+
+def summary_sleep_score(sleep: Dict) -> Optional[int]:
+    """Overall score of a Garmin sleeps summary; Garmin may send the score blocks as null."""
     score = (
-        sleep.get("overallSleepScore", {}).get("value")
-        or sleep.get("sleepScores", {}).get("overall", {}).get("value")
+        (sleep.get("overallSleepScore") or {}).get("value")
+        or ((sleep.get("sleepScores") or {}).get("overall") or {}).get("value")
     )
     return int(score) if isinstance(score, (int, float)) else None
 
@@ -140,22 +184,36 @@ def build_live_recovery_snapshot(
     sleep_record = _latest_health_record(db, user_id, "sleeps", since)
     stress_record = _latest_health_record(db, user_id, "stressDetails", since)
     hrv_record = _latest_health_record(db, user_id, "hrv", since)
-    recent_activities = (
-        db.query(GarminActivityData)
-        .filter(
-            GarminActivityData.user_id == user_id,
-            GarminActivityData.summary_type.in_(["activities", "manuallyUpdatedActivities"]),
-            GarminActivityData.start_time >= datetime.utcnow() - timedelta(hours=72),
-        )
-        .order_by(GarminActivityData.start_time.desc())
-        .all()
+    recent_activities = _recent_activities(db, user_id, datetime.utcnow() - timedelta(hours=RECENT_ACTIVITY_HOURS))
+
+    return _assemble_snapshot(
+        daily=_load_health_payload(daily_record),
+        sleep=_load_health_payload(sleep_record),
+        stress=_load_health_payload(stress_record),
+        hrv=_load_health_payload(hrv_record),
+        record_ids={
+            "daily": daily_record.summary_id if daily_record else None,
+            "sleep": sleep_record.summary_id if sleep_record else None,
+            "stress": stress_record.summary_id if stress_record else None,
+            "hrv": hrv_record.summary_id if hrv_record else None,
+        },
+        hrv_history_loader=lambda: _hrv_history(db, user_id, since),
+        recent_activities=recent_activities,
+        readiness_version=readiness_version,
     )
 
-    daily = _load_health_payload(daily_record)
-    sleep = _load_health_payload(sleep_record)
-    stress = _load_health_payload(stress_record)
-    hrv = _load_health_payload(hrv_record)
 
+def _assemble_snapshot(
+    *,
+    daily: Dict,
+    sleep: Dict,
+    stress: Dict,
+    hrv: Dict,
+    record_ids: Dict[str, Optional[str]],
+    hrv_history_loader: Callable[[], List[int]],
+    recent_activities: List[Any],
+    readiness_version: str,
+) -> Dict[str, Any]:
     if not any([daily, sleep, stress, hrv]):
         return {
             "source": "empty",
@@ -174,7 +232,7 @@ def build_live_recovery_snapshot(
 
     sleep_duration_seconds = sleep.get("durationInSeconds")
     sleep_hours = round(sleep_duration_seconds / 3600, 1) if sleep_duration_seconds else None
-    sleep_score = _sleep_score(sleep)
+    sleep_score = summary_sleep_score(sleep)
     avg_stress = round(sum(stress_values) / len(stress_values)) if stress_values else None
     body_battery_at_wake = _body_battery_at_wake(stress, sleep)
     body_battery_current = round(body_battery_values[-1]) if body_battery_values else None
@@ -192,7 +250,7 @@ def build_live_recovery_snapshot(
     stale_signals = []
     if body_battery_current is None:
         stale_signals.append("bodyBatteryCurrent_missing")
-    elif body_battery_current_age_hours is not None and body_battery_current_age_hours > 6:
+    elif body_battery_current_age_hours is not None and body_battery_current_age_hours > BODY_BATTERY_STALE_HOURS:
         stale_signals.append("bodyBatteryCurrent_stale")
     body_battery_for_score = (
         body_battery_current
@@ -205,7 +263,7 @@ def build_live_recovery_snapshot(
         if isinstance(hrv.get("lastNightAvg"), (int, float))
         else (round(sum(hrv_values) / len(hrv_values)) if hrv_values else None)
     )
-    hrv_history = _hrv_history(db, user_id, since) if readiness_version == READINESS_VERSION_V4 else []
+    hrv_history = hrv_history_loader() if readiness_version == READINESS_VERSION_V4 else []
     hrv_trend = list(reversed(hrv_history)) if hrv_history else []
 
     if not stress_values:
@@ -257,12 +315,7 @@ def build_live_recovery_snapshot(
         "score": score,
         "score_status": readiness.score_status,
         "recent_training": training_fatigue,
-        "records": {
-            "daily": daily_record.summary_id if daily_record else None,
-            "sleep": sleep_record.summary_id if sleep_record else None,
-            "stress": stress_record.summary_id if stress_record else None,
-            "hrv": hrv_record.summary_id if hrv_record else None,
-        },
+        "records": dict(record_ids),
         "score_model": {
             "version": readiness.version,
             "scale": "0-6",
@@ -313,3 +366,193 @@ def build_live_recovery_snapshot(
             "hardestRecentActivity": training_fatigue["hardest_activity"],
         },
     }
+
+
+def _record_entry(record: Optional[GarminHealthData]) -> Optional[Dict[str, Any]]:
+    if record is None:
+        return None
+    return {
+        "summary_id": record.summary_id,
+        "start_time": record.start_time.isoformat() if record.start_time else None,
+        "data": _load_health_payload(record),
+    }
+
+
+def _hrv_history_entries(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "start_time": record.start_time.isoformat() if record.start_time else None,
+            "value": summary_nightly_hrv(_load_health_payload(record)),
+        }
+        for record in _hrv_records(db, user_id, _EPOCH, HRV_HISTORY_LIMIT)
+    ]
+
+
+def _activity_entry(activity: GarminActivityData) -> Dict[str, Any]:
+    return {
+        "activity_id": activity.activity_id,
+        "activity_name": activity.activity_name,
+        "activity_type": activity.activity_type,
+        "start_time": activity.start_time.isoformat() if activity.start_time else None,
+        "duration": activity.duration,
+        "average_heart_rate": activity.average_heart_rate,
+        "max_heart_rate": activity.max_heart_rate,
+    }
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def refresh_recovery_snapshot(
+    db: Session,
+    user_id: int,
+    summary_types: Optional[Iterable[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Re-read the recovery inputs touched by newly ingested summary types and store them.
+
+    Only the sections for `summary_types` are reloaded (e.g. a stressDetails delivery
+    re-reads the latest stressDetails row only); everything is reloaded when no types are
+    given or the stored row is missing or from an older layout. Commits.
+
+    The row is locked while its sections are merged, so webhook workers refreshing
+    different sections for the same user do not overwrite each other's updates.
+    """
+    from app.core.garmin_ingest import _dialect_insert, upsert_rows
+
+    # Make sure there is a row to lock; a placeholder (version 0) triggers a full reload.
+    insert = _dialect_insert(db)
+    db.execute(
+        insert(RecoverySnapshot)
+        .values(user_id=user_id, version=0, inputs="{}", updated_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=[RecoverySnapshot.user_id])
+    )
+    stored = (
+        db.query(RecoverySnapshot)
+        .filter(RecoverySnapshot.user_id == user_id)
+        .with_for_update()
+        .populate_existing()
+        .first()
+    )
+    inputs: Optional[Dict[str, Any]] = None
+    if stored is not None and stored.version == RECOVERY_SNAPSHOT_VERSION:
+        try:
+            inputs = json.loads(stored.inputs)
+        except json.JSONDecodeError:
+            inputs = None
+    if inputs is None or summary_types is None:
+        inputs = {"records": {}, "hrv_history": [], "activities": []}
+        types = set(RECOVERY_HEALTH_TYPES) | set(RECOVERY_ACTIVITY_TYPES)
+    else:
+        types = set(summary_types)
+
+    for summary_type in RECOVERY_HEALTH_TYPES:
+        if summary_type in types:
+            inputs["records"][summary_type] = _record_entry(_latest_health_record(db, user_id, summary_type, _EPOCH))
+    if "hrv" in types:
+        inputs["hrv_history"] = _hrv_history_entries(db, user_id)
+    if types & set(RECOVERY_ACTIVITY_TYPES):
+        since = datetime.utcnow() - timedelta(hours=RECENT_ACTIVITY_HOURS)
+        inputs["activities"] = [_activity_entry(activity) for activity in _recent_activities(db, user_id, since)]
+
+    upsert_rows(
+        db,
+        RecoverySnapshot,
+        [
+            {
+                "user_id": user_id,
+                "version": RECOVERY_SNAPSHOT_VERSION,
+                "inputs": json.dumps(inputs, default=str),
+                "updated_at": datetime.utcnow(),
+            }
+        ],
+        conflict_columns=["user_id"],
+        update_columns=["version", "inputs", "updated_at"],
+    )
+    db.commit()
+    return inputs
+
+
+def _snapshot_from_inputs(
+    inputs: Dict[str, Any],
+    *,
+    lookback_days: int,
+    readiness_version: str,
+) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    since = now - timedelta(days=lookback_days)
+    payloads: Dict[str, Dict] = {}
+    record_ids: Dict[str, Optional[str]] = {}
+    for summary_type, key in _RECORD_KEYS.items():
+        entry = (inputs.get("records") or {}).get(summary_type)
+        start_time = _parse_time(entry.get("start_time")) if entry else None
+        if entry and start_time is not None and start_time >= since:
+            payloads[key] = entry.get("data") or {}
+            record_ids[key] = entry.get("summary_id")
+        else:
+            payloads[key] = {}
+            record_ids[key] = None
+
+    def hrv_history() -> List[int]:
+        values = []
+        for entry in inputs.get("hrv_history") or []:
+            start_time = _parse_time(entry.get("start_time"))
+            if start_time is not None and start_time >= since and entry.get("value") is not None:
+                values.append(int(entry["value"]))
+        return values
+
+    activity_since = now - timedelta(hours=RECENT_ACTIVITY_HOURS)
+    activities = []
+    for entry in inputs.get("activities") or []:
+        start_time = _parse_time(entry.get("start_time"))
+        if start_time is not None and start_time >= activity_since:
+            activities.append(SimpleNamespace(**{**entry, "start_time": start_time}))
+
+    return _assemble_snapshot(
+        **payloads,
+        record_ids=record_ids,
+        hrv_history_loader=hrv_history,
+        recent_activities=activities,
+        readiness_version=readiness_version,
+    )
+
+
+def load_recovery_snapshot(
+    db: Session,
+    user_id: int,
+    *,
+    lookback_days: int = 14,
+    readiness_version: str = READINESS_VERSION_V4,
+) -> Dict[str, Any]:
+    """
+    Same payload as build_live_recovery_snapshot, served from the stored per-user inputs.
+
+    One indexed fetch in the common case. The row is rebuilt when missing or outdated, and
+    its health sections are re-read when the Body Battery reading has gone stale and the
+    row was last refreshed more than SNAPSHOT_RECHECK_MINUTES ago.
+    """
+    stored = db.query(RecoverySnapshot).filter(RecoverySnapshot.user_id == user_id).first()
+    try:
+        if stored is None or stored.version != RECOVERY_SNAPSHOT_VERSION:
+            inputs = refresh_recovery_snapshot(db, user_id)
+        else:
+            inputs = json.loads(stored.inputs)
+            snapshot = _snapshot_from_inputs(inputs, lookback_days=lookback_days, readiness_version=readiness_version)
+            recheck_due = (
+                stored.updated_at is None
+                or datetime.utcnow() - stored.updated_at > timedelta(minutes=SNAPSHOT_RECHECK_MINUTES)
+            )
+            if "bodyBatteryCurrent_stale" not in snapshot.get("staleSignals", []) or not recheck_due:
+                return snapshot
+            inputs = refresh_recovery_snapshot(db, user_id, RECOVERY_HEALTH_TYPES)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Recovery snapshot unavailable for user {user_id}, building live: {e}")
+        return build_live_recovery_snapshot(
+            db,
+            user_id,
+            lookback_days=lookback_days,
+            readiness_version=readiness_version,
+        )
+    return _snapshot_from_inputs(inputs, lookback_days=lookback_days, readiness_version=readiness_version)
@@ -0,0 +1,116 @@
+"""ETag validation and a small in-process TTL cache for per-user Garmin read endpoints."""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.data_version import get_data_version
+
+
+class ResponseCache:
+    """LRU of encoded payloads; an entry is served only for the ETag it was stored under."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, etag: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == etag and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, etag: str, payload: Any) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, etag, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+response_cache = ResponseCache(settings.response_cache_ttl_seconds, settings.response_cache_max_entries)
+
+
+def response_etag(route: str, user_id: int, params: Dict[str, Any], version: int, freshness_seconds: int) -> str:
+    """
+    Strong ETag for one (route, user, params) at a data version.
+
+    The freshness window is part of the tag because the payloads also depend on the
+    clock (time since last sleep, rolling windows); a tag never outlives its window.
+    """
+    window = int(time.time() // max(1, freshness_seconds))
+    material = json.dumps(
+        [route, user_id, sorted(params.items()), version, window, settings.readiness_version],
+        default=str,
+    )
+    return '"' + hashlib.sha1(material.encode("utf-8")).hexdigest() + '"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+def cached_response(
+    request: Request,
+    db: Session,
+    user_id: int,
+    route: str,
+    params: Dict[str, Any],
+    build: Callable[[], Any],
+    *,
+    freshness_seconds: int,
+) -> Response:
+    """
+    Answer a per-user read with 304 when the client's ETag is current, else from the
+    cache or build(). Ingest bumps the user's data version, which changes the ETag.
+    """
+    etag = response_etag(route, user_id, params, get_data_version(db, user_id), freshness_seconds)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    key = (route, user_id, tuple(sorted(params.items())))
+    payload = response_cache.get(key, etag)
+    if payload is None:
+        payload = jsonable_encoder(build())
+        response_cache.put(key, etag, payload)
+    return JSONResponse(payload, headers=headers)
@@ -0,0 +1,109 @@
+"""Columnar decoding of Garmin activityDetails samples, shared by the API and analysis tools."""
+from __future__ import annotations
+
+import math
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.payload_memo import memoized
+
+
+def _to_float(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _first_float(sample: Dict[str, Any], *keys: str) -> Optional[float]:
+    for key in keys:
+        if key in sample:
+            value = _to_float(sample.get(key))
+            if value is not None:
+                return value
+    return None
+
+
+@dataclass
+class SampleColumns:
+    """activityDetails samples sorted by start time, with one list per channel."""
+    samples: List[Dict[str, Any]]  # the raw sample dicts, in sorted order
+    start: array  # absolute startTimeInSeconds, ascending
+    elapsed: List[Optional[float]]  # timer/moving/clock duration, else start - first start
+    hr: List[Optional[float]]
+    speed: List[Optional[float]]
+    distance: List[Optional[float]]
+    power: List[Optional[float]]
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def split_at(self, boundaries: Sequence[float]) -> List[Tuple[int, int]]:
+        """[lo, hi) index ranges of samples with boundaries[i] <= start < boundaries[i + 1]."""
+        return split_sorted(self.start, boundaries)
+
+    def buckets(self, seconds: float) -> List[Tuple[int, int]]:
+        """Non-empty [lo, hi) ranges of fixed-width windows measured from the first sample."""
+        if not self.samples:
+            return []
+        first = self.start[0]
+        count = int((self.start[-1] - first) // seconds) + 1
+        edges = [first + index * seconds for index in range(count + 1)]
+        return [(lo, hi) for lo, hi in split_sorted(self.start, edges) if hi > lo]
+
+
+def split_sorted(keys: Sequence[float], boundaries: Sequence[float]) -> List[Tuple[int, int]]:
+    """Binary-search each boundary in ascending `keys` and return consecutive [lo, hi) ranges."""
+    positions = [bisect_left(keys, boundary) for boundary in boundaries]
+    return list(zip(positions, positions[1:]))
+
+
+def is_sorted(keys: Sequence[float]) -> bool:
+    return all(left <= right for left, right in zip(keys, keys[1:]))
+
+
+def _decode(detail: Dict[str, Any]) -> SampleColumns:
+    samples = sorted(
+        [sample for sample in detail.get("samples", []) or [] if isinstance(sample, dict) and sample.get("startTimeInSeconds")],
+        key=lambda sample: sample.get("startTimeInSeconds"),
+    )
+    start = array("d", (float(sample["startTimeInSeconds"]) for sample in samples))
+    first_start = start[0] if samples else None
+    elapsed: List[Optional[float]] = []
+    hr: List[Optional[float]] = []
+    speed: List[Optional[float]] = []
+    distance: List[Optional[float]] = []
+    power: List[Optional[float]] = []
+    for index, sample in enumerate(samples):
+        duration = _first_float(sample, "timerDurationInSeconds", "movingDurationInSeconds", "clockDurationInSeconds")
+        elapsed.append(duration if duration is not None else start[index] - first_start)
+        hr.append(_to_float(sample.get("heartRate") or sample.get("heartRateInBeatsPerMinute")))
+        speed.append(
+            _first_float(
+                sample,
+                "speedMetersPerSecond",
+                "enhancedSpeedMetersPerSecond",
+                "averageSpeedInMetersPerSecond",
+            )
+        )
+        distance.append(_first_float(sample, "totalDistanceInMeters", "distanceInMeters"))
+        power.append(_first_float(sample, "powerInWatts"))
+    return SampleColumns(samples, start, elapsed, hr, speed, distance, power)
+
+
+def decode_detail_samples(detail: Optional[Dict[str, Any]]) -> SampleColumns:
+    """
+    Decode an activityDetails payload into sorted sample columns.
+
+    Inside a payload_memo scope the result is memoised for the same payload object, so
+    several consumers of one detail (segments, series, response blocks) filter and sort
+    its samples only once. Outside a scope every call decodes: nothing is kept beyond
+    the unit of work.
+    """
+    detail = detail or {}
+    return memoized("sample_columns", detail, lambda: _decode(detail))
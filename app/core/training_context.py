@@ -0,0 +1,153 @@
+"""Materialized per-user training context (profile, baselines, patterns) with stamp-based invalidation."""
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.data_version import get_data_version
+from app.database.models import GarminActivityAuxiliaryData, GarminActivityData, TrainingContextCache
+
+logger = logging.getLogger(__name__)
+
+# Bump when the context builders change shape or semantics.
+TRAINING_CONTEXT_VERSION = 2
+
+ContextBuilder = Callable[[Session, int, int, int], Dict[str, Any]]
+
+
+def training_source_stamp(db: Session, user_id: int, now: Optional[datetime] = None) -> str:
+    """
+    Fingerprint of everything the training context depends on.
+
+    The user's data version changes on every ingest, including deletes. The UTC day
+    changes the rolling window.
+    """
+    now = now or datetime.utcnow()
+    return f"{now.date().isoformat()}|{get_data_version(db, user_id)}"
+
+
+def build_training_context(db: Session, user_id: int, period_days: int = 120, current_days: int = 7) -> Dict[str, Any]:
+    """Personal targets, per-sport load baselines and workout patterns over the period."""
+    from app.api.garmin import (
+        _dominant_sport,
+        _training_profile_from_sketches,
+        build_sport_baselines,
+        build_workout_patterns,
+    )
+    from app.core.effort_sketch import load_effort_sketches
+    from app.core.payload_memo import payload_memo
+
+    now = datetime.utcnow()
+    start_date = now - timedelta(days=max(period_days, current_days + 28))
+    activities = db.query(GarminActivityData).filter(
+        GarminActivityData.user_id == user_id,
+        GarminActivityData.summary_type.in_(["activities", "manuallyUpdatedActivities"]),
+        GarminActivityData.start_time >= start_date,
+    ).order_by(GarminActivityData.start_time.desc()).all()
+    activity_details = db.query(GarminActivityAuxiliaryData).filter(
+        GarminActivityAuxiliaryData.user_id == user_id,
+        GarminActivityAuxiliaryData.summary_type == "activityDetails",
+        or_(
+            GarminActivityAuxiliaryData.start_time >= start_date,
+            GarminActivityAuxiliaryData.start_time.is_(None),
+        ),
+    ).order_by(GarminActivityAuxiliaryData.start_time.desc()).all()
+
+    with payload_memo("training_context"):
+        sport_baselines = build_sport_baselines(activities, current_days, now)
+        personal_targets = _training_profile_from_sketches(load_effort_sketches(db, user_id, start_date.date()))
+        workout_patterns = build_workout_patterns(activities, activity_details)
+    return {
+        "period_days": period_days,
+        "current_days": current_days,
+        "generated_at": now.isoformat(),
+        "personal_targets": personal_targets,
+        "sport_baselines": sport_baselines,
+        "workout_patterns": workout_patterns,
+        "dominant_sport": _dominant_sport(sport_baselines),
+        "method": {
+            "phase": 2,
+            "source": "Garmin activityDetails samples/laps with activity summary fallback",
+            "activity_details": len(activity_details),
+            "notes": [
+                "Targets are learned per sport from detail segments where available, kept as daily sketches at ingest.",
+                "Workout patterns are inferred on demand from details, activity names, and summaries.",
+                "Four-week load comparison is calculated inside the same sport type.",
+                "Activity summaries remain the fallback when details are missing.",
+            ],
+        },
+    }
+
+
+def _store(
+    db: Session,
+    user_id: int,
+    period_days: int,
+    current_days: int,
+    stamp: str,
+    context: Dict[str, Any],
+) -> None:
+    from app.core.garmin_ingest import upsert_rows
+
+    upsert_rows(
+        db,
+        TrainingContextCache,
+        [
+            {
+                "user_id": user_id,
+                "period_days": period_days,
+                "current_days": current_days,
+                "version": TRAINING_CONTEXT_VERSION,
+                "source_stamp": stamp,
+                "context": json.dumps(context, default=str),
+                "computed_at": datetime.utcnow(),
+            }
+        ],
+        conflict_columns=["user_id", "period_days", "current_days"],
+        update_columns=["version", "source_stamp", "context", "computed_at"],
+    )
+    db.commit()
+
+
+def get_training_context(
+    db: Session,
+    user_id: int,
+    period_days: int,
+    current_days: int,
+    builder: ContextBuilder = build_training_context,
+) -> Dict[str, Any]:
+    """Return the stored context when its version and source stamp still match, else rebuild it."""
+    stamp = training_source_stamp(db, user_id)
+    cached = db.query(TrainingContextCache).filter(
+        TrainingContextCache.user_id == user_id,
+        TrainingContextCache.period_days == period_days,
+        TrainingContextCache.current_days == current_days,
+    ).first()
+    if cached is not None and cached.version == TRAINING_CONTEXT_VERSION and cached.source_stamp == stamp:
+        return json.loads(cached.context)
+
+    context = builder(db, user_id, period_days, current_days)
+    try:
+        _store(db, user_id, period_days, current_days, stamp, context)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Could not store training context for user {user_id}: {e}")
+    return context
+
+
+def refresh_training_contexts(db: Session, user_id: int, builder: ContextBuilder = build_training_context) -> int:
+    """Recompute every stored context window of a user after new activity data; returns rebuild count."""
+    windows = db.query(TrainingContextCache.period_days, TrainingContextCache.current_days).filter(
+        TrainingContextCache.user_id == user_id,
+    ).all()
+    if not windows:
+        return 0
+    stamp = training_source_stamp(db, user_id)
+    for period_days, current_days in windows:
+        _store(db, user_id, period_days, current_days, stamp, builder(db, user_id, period_days, current_days))
+    return len(windows)
@@ -0,0 +1,114 @@
+"""Content-addressed, gzip-compressed archive of raw Garmin webhook payloads."""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.garmin_ingest import _dialect_insert
+from app.database.models import GarminWebhookEvent, GarminWebhookPayload
+
+# Finished events whose payload is no longer needed for replay once past the retention.
+PAYLOAD_PRUNABLE_STATUSES = ("processed", "duplicate")
+
+# Archive rows written or reused this recently are never pruned: the event that references
+# them may not be committed yet.
+ARCHIVE_PRUNE_GRACE = timedelta(minutes=15)
+
+_LOG_SUMMARY_TYPES = 8
+
+
+def _canonical_json(payload: Any) -> bytes:
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def archive_webhook_payload(db: Session, payload: Any) -> str:
+    """
+    Store a payload once per distinct content and return its hash; the caller commits.
+
+    Garmin retries and overlapping backfill pings re-send identical payloads, which then
+    share one compressed row. Reusing a row stamps its created_at again, so a concurrent
+    prune leaves it alone until the new event is committed (see ARCHIVE_PRUNE_GRACE).
+    """
+    raw = _canonical_json(payload)
+    content_hash = hashlib.sha256(raw).hexdigest()
+    now = datetime.utcnow()
+    reused = db.query(GarminWebhookPayload).filter(
+        GarminWebhookPayload.content_hash == content_hash,
+    ).update({"created_at": now}, synchronize_session=False)
+    if not reused:
+        insert = _dialect_insert(db)
+        db.execute(
+            insert(GarminWebhookPayload)
+            .values(
+                content_hash=content_hash,
+                encoding="gzip",
+                body=gzip.compress(raw, compresslevel=6),
+                size_bytes=len(raw),
+                created_at=now,
+            )
+            .on_conflict_do_update(
+                index_elements=[GarminWebhookPayload.content_hash],
+                set_={"created_at": now},
+            )
+        )
+    return content_hash
+
+
+def load_webhook_payload(db: Session, event: GarminWebhookEvent) -> Dict[str, Any]:
+    """The event's payload from the archive, or its legacy JSON text; {} once pruned."""
+    if event.payload_hash:
+        archived = db.get(GarminWebhookPayload, event.payload_hash)
+        if archived is not None:
+            return json.loads(gzip.decompress(archived.body))
+        return {}
+    if event.payload:
+        return json.loads(event.payload)
+    return {}
+
+
+def prune_webhook_payloads(db: Session, retention_days: int, now: Optional[datetime] = None) -> int:
+    """
+    Drop the payloads of processed events older than `retention_days`, keeping the event
+    rows with their counts and status, then delete archive rows no event references; commits.
+
+    Partial and failed events keep their payload for replay, and archive rows written or
+    reused within ARCHIVE_PRUNE_GRACE are kept for events still in flight. Returns the
+    number of events whose payload was dropped; a retention of 0 or less only removes unreferenced rows.
+    """
+    now = now or datetime.utcnow()
+    dropped = 0
+    if retention_days > 0:
+        cutoff = now - timedelta(days=retention_days)
+        dropped = db.query(GarminWebhookEvent).filter(
+            GarminWebhookEvent.status.in_(PAYLOAD_PRUNABLE_STATUSES),
+            GarminWebhookEvent.created_at < cutoff,
+            or_(GarminWebhookEvent.payload_hash.isnot(None), GarminWebhookEvent.payload.isnot(None)),
+        ).update({"payload_hash": None, "payload": None}, synchronize_session=False)
+
+    referenced = db.query(GarminWebhookEvent.payload_hash).filter(GarminWebhookEvent.payload_hash.isnot(None))
+    db.query(GarminWebhookPayload).filter(
+        GarminWebhookPayload.content_hash.notin_(referenced.scalar_subquery()),
+        GarminWebhookPayload.created_at < now - ARCHIVE_PRUNE_GRACE,
+    ).delete(synchronize_session=False)
+    db.commit()
+    return dropped
+
+
+def summarize_webhook_payload(payload: Any, size_bytes: Optional[int] = None) -> str:
+    """Short, size-bounded description of a webhook payload for the logs."""
+    if not isinstance(payload, dict):
+        return f"non-object payload ({type(payload).__name__})"
+    counts = [
+        f"{key}={len(value) if isinstance(value, list) else 1}"
+        for key, value in list(payload.items())[:_LOG_SUMMARY_TYPES]
+    ]
+    if len(payload) > _LOG_SUMMARY_TYPES:
+        counts.append(f"+{len(payload) - _LOG_SUMMARY_TYPES} more types")
+    size = f", {size_bytes} bytes" if size_bytes is not None else ""
+    return f"{', '.join(counts) or 'empty'}{size}"
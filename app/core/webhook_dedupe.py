@@ -0,0 +1,142 @@
+"""Fingerprints of processed Garmin webhook items, so retries and overlapping pings are skipped."""
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.garmin_ingest import _dialect_insert
+from app.database.models import GarminWebhookFingerprint
+
+_IN_CHUNK = 500
+
+# Query parameters of a callbackURL that change between deliveries of the same upload window.
+_VOLATILE_CALLBACK_PARAMS = {"token"}
+
+
+def _callback_identity(url: str) -> str:
+    parts = urlsplit(url)
+    query = sorted((key, value) for key, value in parse_qsl(parts.query) if key not in _VOLATILE_CALLBACK_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def item_fingerprint(summary_type: str, item: Dict[str, Any]) -> str:
+    """
+    Identity of one webhook item.
+
+    PING items are identified by their callback URL. PUSH items by summaryId plus their
+    content, because Garmin re-sends an updated summary (e.g. a daily) under the same
+    summaryId and that update must still be stored.
+    """
+    callback_url = item.get("callbackURL")
+    if callback_url:
+        identity = ["ping", summary_type, _callback_identity(str(callback_url))]
+    else:
+        content = hashlib.sha1(json.dumps(item, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        identity = ["push", summary_type, str(item.get("summaryId") or ""), content]
+    return hashlib.sha1("\0".join(identity).encode("utf-8")).hexdigest()
+
+
+def _window_start(now: Optional[datetime] = None) -> datetime:
+    return (now or datetime.utcnow()) - timedelta(hours=settings.webhook_dedupe_window_hours)
+
+
+def processed_fingerprints(db: Session, fingerprints: Iterable[str]) -> Set[str]:
+    """The given fingerprints that were processed inside the dedupe window."""
+    if settings.webhook_dedupe_window_hours <= 0:
+        return set()
+    wanted = sorted(set(fingerprints))
+    since = _window_start()
+    seen: Set[str] = set()
+    for offset in range(0, len(wanted), _IN_CHUNK):
+        seen.update(
+            fingerprint
+            for (fingerprint,) in db.query(GarminWebhookFingerprint.fingerprint).filter(
+                GarminWebhookFingerprint.fingerprint.in_(wanted[offset:offset + _IN_CHUNK]),
+                GarminWebhookFingerprint.processed_at >= since,
+            )
+        )
+    return seen
+
+
+def payload_already_processed(db: Session, payload: Dict[str, Any]) -> bool:
+    """True when every item of a webhook payload was processed within the window."""
+    fingerprints = [
+        item_fingerprint(summary_type, item)
+        for summary_type, items in payload.items()
+        if isinstance(items, list)
+        for item in items
+        if isinstance(item, dict)
+    ]
+    return bool(fingerprints) and len(processed_fingerprints(db, fingerprints)) == len(set(fingerprints))
+
+
+class WebhookItemDedupe:
+    """
+    Dedupe state for processing one webhook event.
+
+    fresh() drops items processed before (or earlier in the same event) and counts them;
+    processed() marks items that were stored; save() records those fingerprints and the
+    skip count on the event, in the caller's transaction.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.skipped = 0
+        self._seen: Set[str] = set()
+        self._processed: Dict[str, tuple[str, Optional[int]]] = {}
+
+    def fresh(self, summary_type: str, items: List[Any]) -> List[Any]:
+        keyed = [
+            (item_fingerprint(summary_type, item) if isinstance(item, dict) else None, item)
+            for item in items
+        ]
+        already = processed_fingerprints(self.db, [key for key, _ in keyed if key])
+        fresh = []
+        for key, item in keyed:
+            if key is not None and (key in already or key in self._seen):
+                self.skipped += 1
+                continue
+            if key is not None:
+                self._seen.add(key)
+            fresh.append(item)
+        return fresh
+
+    def processed(self, summary_type: str, items: Iterable[Dict[str, Any]], user_id: Optional[int]) -> None:
+        for item in items:
+            self._processed[item_fingerprint(summary_type, item)] = (summary_type, user_id)
+
+    def save(self, event: Any) -> None:
+        event.skipped_count = self.skipped
+        if not self._processed or settings.webhook_dedupe_window_hours <= 0:
+            return
+        insert = _dialect_insert(self.db)
+        now = datetime.utcnow()
+        rows = [
+            {"fingerprint": fingerprint, "summary_type": summary_type, "user_id": user_id, "processed_at": now}
+            for fingerprint, (summary_type, user_id) in self._processed.items()
+        ]
+        for offset in range(0, len(rows), _IN_CHUNK):
+            stmt = insert(GarminWebhookFingerprint).values(rows[offset:offset + _IN_CHUNK])
+            self.db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[GarminWebhookFingerprint.fingerprint],
+                    set_={"processed_at": stmt.excluded.processed_at},
+                )
+            )
+
+
+def prune_webhook_fingerprints(db: Session, now: Optional[datetime] = None) -> int:
+    """Delete fingerprints that fell out of the dedupe window; commits."""
+    if settings.webhook_dedupe_window_hours <= 0:
+        return 0
+    deleted = db.query(GarminWebhookFingerprint).filter(
+        GarminWebhookFingerprint.processed_at < _window_start(now),
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
@@ -0,0 +1,406 @@
+"""In-process queue that processes stored Garmin webhook events off the request path."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.database.models import GarminWebhookEvent
+
+logger = logging.getLogger(__name__)
+
+# Events left in "processing" this long (e.g. the process died mid-run) are picked up again.
+STALE_PROCESSING_AFTER = timedelta(minutes=15)
+
+# How often events the queue dropped (full) or a dead worker left behind are re-enqueued.
+RECOVER_POLL_INTERVAL = timedelta(seconds=30)
+
+# How often finished events past the retention window are deleted.
+PRUNE_INTERVAL = timedelta(hours=6)
+
+# Only events in these states are pruned; pending ones are kept regardless of age.
+PRUNABLE_STATUSES = ("processed", "partial", "failed", "duplicate", "dead_letter")
+
+# Events in these states are retried in the background until they succeed or are dead-lettered.
+RETRYABLE_STATUSES = ("partial", "failed")
+
+# How often the retry scheduler looks for events that are due again.
+RETRY_POLL_INTERVAL = timedelta(seconds=30)
+
+# Garmin callback URLs and replays are only useful this long; older events are dead-lettered.
+RETRY_WINDOW = timedelta(hours=72)
+
+EventProcessor = Callable[[Session, GarminWebhookEvent], None]
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Exponential backoff for partial/failed events: base * 2**attempts, capped."""
+
+    max_attempts: int = 6
+    base_seconds: int = 60
+    max_delay_seconds: int = 3600
+    concurrency: int = 4
+
+    def delay(self, attempts: int) -> timedelta:
+        return timedelta(seconds=min(self.base_seconds * 2 ** min(attempts, 30), self.max_delay_seconds))
+
+
+class WebhookQueue:
+    """
+    Bounded asyncio queue of webhook event ids drained by a fixed number of workers.
+
+    Webhook handlers only persist the raw GarminWebhookEvent and enqueue its id. Each
+    worker claims the event (received -> processing), then runs the processor that
+    was registered for the event source in a thread with its own DB session, so
+    callback fetches and DB writes never block the event loop.
+
+    With a RetryPolicy, events that end partial or failed are scheduled again with
+    exponential backoff and re-run through the same processor (whose item dedupe skips
+    what was already stored) until they succeed or run out of attempts ('dead_letter').
+
+    Events that did not fit in the queue stay 'received'; a background sweep re-enqueues
+    them (and stale 'processing' ones) whenever the queue has drained.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        workers: int = 4,
+        maxsize: int = 1000,
+        retention_days: int = 0,
+        payload_retention_days: int = 0,
+        prune_fingerprints: bool = False,
+        retry: Optional[RetryPolicy] = None,
+    ):
+        self._session_factory = session_factory
+        self._worker_count = max(1, workers)
+        self._maxsize = maxsize
+        self._retention_days = retention_days
+        self._payload_retention_days = payload_retention_days
+        self._prune_fingerprints = prune_fingerprints
+        self._retry = retry if retry is not None and retry.max_attempts > 0 else None
+        self._processors: Dict[str, EventProcessor] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def register(self, source: str, processor: EventProcessor) -> None:
+        """Register the sync processor for webhook events of one source."""
+        self._processors[source] = processor
+
+    @property
+    def sources(self) -> set[str]:
+        """Event sources with a registered processor."""
+        return set(self._processors)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self, recover: bool = False) -> None:
+        """Start the worker tasks; with recover=True, re-enqueue events left unprocessed."""
+        if not self.running:
+            self._queue = asyncio.Queue(maxsize=self._maxsize)
+            self._workers = [
+                asyncio.create_task(self._worker(), name=f"garmin-webhook-worker-{index}")
+                for index in range(self._worker_count)
+            ]
+            self._workers.append(asyncio.create_task(self._recover_loop(), name="garmin-webhook-recover"))
+            if self._retention_days > 0 or self._payload_retention_days > 0 or self._prune_fingerprints:
+                self._workers.append(asyncio.create_task(self._prune_loop(), name="garmin-webhook-prune"))
+            if self._retry is not None:
+                self._workers.append(asyncio.create_task(self._retry_loop(), name="garmin-webhook-retry"))
+        if recover:
+            try:
+                recovered = await self.recover()
+            except Exception as e:
+                logger.error(f"Could not load pending webhook events: {e}")
+                return
+            if recovered:
+                logger.info(f"Re-enqueued {recovered} pending webhook events")
+
+    async def recover(self) -> int:
+        """Re-enqueue received and stale processing events; returns how many were queued."""
+        event_ids = await asyncio.to_thread(self._pending_event_ids)
+        queued = 0
+        for event_id in event_ids:
+            if not self._put(event_id):
+                break
+            queued += 1
+        return queued
+
+    async def stop(self) -> None:
+        """Cancel the workers; events still queued stay 'received' and are recovered on start."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    async def enqueue(self, event_id: int) -> bool:
+        """Queue a stored event for processing, starting the workers lazily if needed."""
+        if not self.running:
+            await self.start()
+        return self._put(event_id)
+
+    def _put(self, event_id: int) -> bool:
+        try:
+            self._queue.put_nowait(event_id)
+            return True
+        except asyncio.QueueFull:
+            logger.warning(f"Webhook queue full; event {event_id} stays pending until the next recovery sweep")
+            return False
+
+    async def _worker(self) -> None:
+        while True:
+            event_id = await self._queue.get()
+            try:
+                await asyncio.to_thread(self.process_event, event_id)
+            except Exception as e:
+                logger.error(f"Webhook event {event_id} crashed its worker: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _recover_loop(self) -> None:
+        while True:
+            await asyncio.sleep(RECOVER_POLL_INTERVAL.total_seconds())
+            # Only sweep a drained queue: every 'received' event is then one nobody will pick up.
+            if not self._queue.empty():
+                continue
+            try:
+                recovered = await self.recover()
+                if recovered:
+                    logger.info(f"Re-enqueued {recovered} pending webhook events")
+            except Exception as e:
+                logger.error(f"Webhook event recovery failed: {e}")
+
+    async def _prune_loop(self) -> None:
+        while True:
+            try:
+                deleted = await asyncio.to_thread(self.prune)
+                if deleted:
+                    logger.info(f"Pruned {deleted} webhook events older than {self._retention_days} days")
+            except Exception as e:
+                logger.error(f"Webhook event pruning failed: {e}")
+            await asyncio.sleep(PRUNE_INTERVAL.total_seconds())
+
+    async def _retry_loop(self) -> None:
+        while True:
+            try:
+                retried = await self.retry_due()
+                if retried:
+                    logger.info(f"Retried {retried} webhook events")
+            except Exception as e:
+                logger.error(f"Webhook event retry failed: {e}")
+            await asyncio.sleep(RETRY_POLL_INTERVAL.total_seconds())
+
+    async def retry_due(self) -> int:
+        """
+        Re-run the partial/failed events that are due. Events of different users run in
+        parallel (at most `concurrency` users at a time), one user's events in order.
+        """
+        if self._retry is None:
+            return 0
+        by_user = await asyncio.to_thread(self._due_retries)
+        semaphore = asyncio.Semaphore(self._retry.concurrency)
+
+        async def retry_user(event_ids: List[int]) -> None:
+            async with semaphore:
+                for event_id in event_ids:
+                    try:
+                        await asyncio.to_thread(self.process_event, event_id, True)
+                    except Exception as e:
+                        logger.error(f"Retry of webhook event {event_id} crashed: {e}")
+
+        await asyncio.gather(*(retry_user(event_ids) for event_ids in by_user.values()))
+        return sum(len(event_ids) for event_ids in by_user.values())
+
+    def _due_retries(self) -> Dict[object, List[int]]:
+        """Ids of due events grouped by user; dead-letters events past the retry window."""
+        db = self._session_factory()
+        try:
+            now = datetime.utcnow()
+            expired = db.query(GarminWebhookEvent).filter(
+                GarminWebhookEvent.status.in_(RETRYABLE_STATUSES),
+                GarminWebhookEvent.created_at < now - RETRY_WINDOW,
+            ).update({"status": "dead_letter", "next_attempt_at": None, "updated_at": now}, synchronize_session=False)
+            db.commit()
+            if expired:
+                logger.warning(f"Dead-lettered {expired} webhook events past the {RETRY_WINDOW} retry window")
+            rows = (
+                db.query(GarminWebhookEvent.id, GarminWebhookEvent.user_id, GarminWebhookEvent.garmin_user_id)
+                .filter(
+                    GarminWebhookEvent.status.in_(RETRYABLE_STATUSES),
+                    GarminWebhookEvent.source.in_(list(self._processors)),
+                    or_(GarminWebhookEvent.next_attempt_at.is_(None), GarminWebhookEvent.next_attempt_at <= now),
+                )
+                .order_by(GarminWebhookEvent.id.asc())
+                .limit(self._maxsize)
+                .all()
+            )
+            by_user: Dict[object, List[int]] = {}
+            for event_id, user_id, garmin_user_id in rows:
+                # Events of users that are not resolved yet are serialized per Garmin user id
+                key = user_id if user_id is not None else ("garmin", garmin_user_id)
+                by_user.setdefault(key, []).append(event_id)
+            return by_user
+        finally:
+            db.close()
+
+    def _schedule_retry(self, db: Session, event: GarminWebhookEvent) -> None:
+        """Give a partial/failed event its next attempt time, or dead-letter it; commits."""
+        if self._retry is None or event.status not in RETRYABLE_STATUSES:
+            return
+        attempts = event.attempts or 0
+        if attempts >= self._retry.max_attempts:
+            event.status = "dead_letter"
+            event.next_attempt_at = None
+            logger.warning(f"Webhook event {event.id} dead-lettered after {attempts} retries: {event.error}")
+        else:
+            event.next_attempt_at = datetime.utcnow() + self._retry.delay(attempts)
+        db.commit()
+
+    def prune(self) -> int:
+        """
+        Delete finished events past the retention window, drop old processed payloads,
+        expire item fingerprints and remove unreferenced activity files, with a fresh session.
+        """
+        from app.core.webhook_archive import prune_webhook_payloads
+        from app.tools.activity_file_store import prune_activity_file_chunks
+
+        db = self._session_factory()
+        try:
+            deleted = prune_webhook_events(db, self._retention_days)
+            dropped = prune_webhook_payloads(db, self._payload_retention_days)
+            if dropped:
+                logger.info(f"Dropped payloads of {dropped} processed webhook events")
+            if self._prune_fingerprints:
+                from app.core.webhook_dedupe import prune_webhook_fingerprints
+
+                prune_webhook_fingerprints(db)
+            removed = prune_activity_file_chunks(db)
+            if removed:
+                logger.info(f"Removed {removed} unreferenced activity files")
+            return deleted
+        finally:
+            db.close()
+
+    def _pending_event_ids(self) -> List[int]:
+        db = self._session_factory()
+        try:
+            stale_before = datetime.utcnow() - STALE_PROCESSING_AFTER
+            db.query(GarminWebhookEvent).filter(
+                GarminWebhookEvent.status == "processing",
+                GarminWebhookEvent.updated_at < stale_before,
+            ).update({"status": "received"}, synchronize_session=False)
+            db.commit()
+            rows = (
+                db.query(GarminWebhookEvent.id)
+                .filter(
+                    GarminWebhookEvent.status == "received",
+                    GarminWebhookEvent.source.in_(list(self._processors)),
+                )
+                .order_by(GarminWebhookEvent.id.asc())
+                .limit(self._maxsize)
+                .all()
+            )
+            return [event_id for (event_id,) in rows]
+        finally:
+            db.close()
+
+    def process_event(self, event_id: int, retry: bool = False) -> None:
+        """
+        Claim and process one stored event synchronously (runs in a worker thread).
+
+        With retry=True a due partial/failed event is claimed instead of a received one,
+        counting the attempt.
+        """
+        db = self._session_factory()
+        try:
+            now = datetime.utcnow()
+            query = db.query(GarminWebhookEvent).filter(GarminWebhookEvent.id == event_id)
+            if retry:
+                claimed = query.filter(
+                    GarminWebhookEvent.status.in_(RETRYABLE_STATUSES),
+                    or_(GarminWebhookEvent.next_attempt_at.is_(None), GarminWebhookEvent.next_attempt_at <= now),
+                ).update(
+                    {
+                        "status": "processing",
+                        "attempts": func.coalesce(GarminWebhookEvent.attempts, 0) + 1,
+                        "next_attempt_at": None,
+                        "updated_at": now,
+                    },
+                    synchronize_session=False,
+                )
+            else:
+                claimed = query.filter(GarminWebhookEvent.status == "received").update(
+                    {"status": "processing", "updated_at": now}, synchronize_session=False
+                )
+            db.commit()
+            if not claimed:
+                return
+
+            event = db.get(GarminWebhookEvent, event_id)
+            processor = self._processors.get(event.source)
+            if processor is None:
+                raise ValueError(f"No webhook processor registered for source {event.source}")
+            processor(db, event)
+            self._schedule_retry(db, event)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Webhook event {event_id} failed: {e}")
+            event = db.get(GarminWebhookEvent, event_id)
+            if event is not None:
+                event.status = "failed"
+                event.error = str(e)
+                event.updated_at = datetime.utcnow()
+                db.commit()
+                self._schedule_retry(db, event)
+        finally:
+            db.close()
+
+
+def prune_webhook_events(db: Session, retention_days: int, now: Optional[datetime] = None) -> int:
+    """
+    Delete processed/partial/failed/dead-lettered webhook events older than `retention_days`; commits.
+
+    Raw payloads are only needed for replay (72h window) and debugging, so they are not
+    kept forever. A retention of 0 or less keeps everything.
+    """
+    if retention_days <= 0:
+        return 0
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+    deleted = db.query(GarminWebhookEvent).filter(
+        GarminWebhookEvent.status.in_(PRUNABLE_STATUSES),
+        GarminWebhookEvent.created_at < cutoff,
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def _create_default_queue() -> WebhookQueue:
+    from app.config import settings
+    from app.database.database import SessionLocal
+
+    return WebhookQueue(
+        SessionLocal,
+        workers=settings.webhook_workers,
+        maxsize=settings.webhook_queue_size,
+        retention_days=settings.webhook_event_retention_days,
+        payload_retention_days=settings.webhook_payload_retention_days,
+        prune_fingerprints=settings.webhook_dedupe_window_hours > 0,
+        retry=RetryPolicy(
+            max_attempts=settings.webhook_retry_max_attempts,
+            base_seconds=settings.webhook_retry_base_seconds,
+            max_delay_seconds=settings.webhook_retry_max_delay_seconds,
+            concurrency=settings.webhook_retry_concurrency,
+        ),
+    )
+
+
+webhook_queue = _create_default_queue()
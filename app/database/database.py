@@ -1,8 +1,10 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, sessionmaker
 import os
+from datetime import datetime, timedelta
+from typing import Optional
 from dotenv import load_dotenv
-from app.database.models import Base
+from app.database.models import Base, UserDataVersion
 
 # Load environment variables
 load_dotenv()
@@ -19,9 +21,94 @@ if not DATABASE_URL:
     DB_NAME = os.getenv("DB_NAME", "coach_db")
     DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(DATABASE_URL)
+
+def _engine_options(url: str) -> dict:
+    """Pool settings for server databases; SQLite keeps SQLAlchemy's defaults."""
+    if url.startswith("sqlite"):
+        return {}
+    # Sized for the FastAPI thread pool (sync routes) plus the webhook workers.
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,
+    }
+
+
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Optional streaming replica for read-only analysis routes; unset means everything uses the primary.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+replica_engine = (
+    create_engine(DATABASE_REPLICA_URL, **_engine_options(DATABASE_REPLICA_URL)) if DATABASE_REPLICA_URL else None
+)
+
+# After a user's own ingest their reads stay on the primary this long (covers replica lag).
+READ_AFTER_WRITE_SECONDS = float(os.getenv("DB_READ_AFTER_WRITE_SECONDS", "30"))
+
+
+def user_wrote_recently(primary, user_id, window_seconds: Optional[float] = None) -> bool:
+    """
+    True when Garmin data for the user was committed within the window, by any process.
+
+    Reads user_data_versions.updated_at (bumped in every ingest transaction) on the
+    primary, so ingest in another worker or container is seen as well.
+    """
+    window = READ_AFTER_WRITE_SECONDS if window_seconds is None else window_seconds
+    with primary.connect() as connection:
+        updated_at = connection.execute(
+            select(UserDataVersion.updated_at).where(UserDataVersion.user_id == user_id)
+        ).scalar()
+    return updated_at is not None and datetime.utcnow() - updated_at < timedelta(seconds=window)
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to the replica and everything else to the primary.
+
+    Once the unit of work flushes or executes DML it stays on the primary, so it reads
+    its own writes. Reads for a user set with for_user() stay on the primary while
+    that user's data changed recently (see user_wrote_recently), checked once per session.
+    Without a replica it is a plain Session.
+    """
+
+    def __init__(self, *args, replica=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica = replica
+
+    def for_user(self, user_id) -> "RoutingSession":
+        self.info["user_id"] = user_id
+        return self
+
+    def _reads_from_replica(self, clause) -> bool:
+        if self.replica is None or self.info.get("primary"):
+            return False
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.info["primary"] = True
+            return False
+        user_id = self.info.get("user_id")
+        if user_id is None:
+            return True
+        if "wrote_recently" not in self.info:
+            self.info["wrote_recently"] = user_wrote_recently(self.bind, user_id)
+        return not self.info["wrote_recently"]
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._reads_from_replica(clause):
+            return self.replica
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+ReadSessionLocal = sessionmaker(
+    class_=RoutingSession,
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+    replica=replica_engine,
+)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -29,6 +116,14 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    """Dependency for read-mostly analysis routes; call db.for_user(user_id) before the first query."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 def create_tables():
     Base.metadata.create_all(bind=engine)
 
@@ -1,9 +1,36 @@
-from sqlalchemy import create_engine, Column, Integer, String, BigInteger, ForeignKey, DateTime, Float, Boolean, Text
+import json
+
+from sqlalchemy import create_engine, Column, Integer, String, BigInteger, ForeignKey, Date, DateTime, Float, Boolean, Text, UniqueConstraint, LargeBinary, Index, desc
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
 
 Base = declarative_base()
 
+
+class JSONPayload(TypeDecorator):
+    """Raw Garmin payload: JSONB on PostgreSQL, JSON text elsewhere; always read back as a dict."""
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(Text())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if dialect.name == 'postgresql':
+            return json.loads(value) if isinstance(value, str) else value
+        return value if isinstance(value, str) else json.dumps(value)
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
 class UserProfile(Base):
     __tablename__ = 'user_profile'
 
@@ -24,7 +51,8 @@ class UserSummary(Base):
     last_updated = Column(DateTime)
 
 # The following tables are intended to be TimescaleDB hypertables.
-# The conversion to hypertables will be handled separately.
+# The conversion to hypertables will be handled separately (garmin_health_data is
+# converted by migration a8c0e2f4b6d7 when the extension is available).
 
 class ActivitiesHypertable(Base):
     __tablename__ = 'activities_hypertable'
@@ -64,22 +92,35 @@ class GarminToken(Base):
 class GarminHealthData(Base):
     """Stores Garmin health/wellness data (dailies, epochs, sleep, etc.)."""
     __tablename__ = 'garmin_health_data'
+    __table_args__ = (
+        # Includes start_time so the table can be a Timescale hypertable partitioned on it;
+        # ingest still keeps one row per summary_id (see upsert_health_summaries).
+        UniqueConstraint('summary_id', 'start_time', name='uq_garmin_health_data_summary_start'),
+        Index('ix_garmin_health_data_user_type_start', 'user_id', 'summary_type', desc('start_time')),
+        Index('ix_garmin_health_data_user_calendar_date', 'user_id', 'calendar_date'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(BigInteger, ForeignKey('user_profile.user_id'), nullable=False)
-    summary_id = Column(String, unique=True, nullable=False)  # Garmin's unique summary ID
+    summary_id = Column(String, nullable=False)  # Garmin's summary ID; a re-send with a new start_time replaces the row
     summary_type = Column(String, nullable=False)  # dailies, epochs, sleeps, stressDetails, etc.
     calendar_date = Column(String, nullable=True)  # Format: yyyy-mm-dd
     start_time = Column(DateTime, nullable=False)  # UTC timestamp
     start_time_offset = Column(Integer, nullable=True)  # Offset in seconds
     duration = Column(Integer, nullable=True)  # Duration in seconds
-    data = Column(Text, nullable=False)  # JSON data of the full summary
+    resting_heart_rate = Column(Integer, nullable=True)  # dailies
+    sleep_score = Column(Integer, nullable=True)  # sleeps, overall sleep score
+    hrv_last_night_avg = Column(Integer, nullable=True)  # hrv, lastNightAvg in ms
+    data = Column(JSONPayload, nullable=False)  # Full summary payload
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class GarminActivityData(Base):
     """Stores Garmin activity data (runs, cycles, swims, etc.)."""
     __tablename__ = 'garmin_activity_data'
+    __table_args__ = (
+        Index('ix_garmin_activity_data_user_type_start', 'user_id', 'summary_type', desc('start_time')),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(BigInteger, ForeignKey('user_profile.user_id'), nullable=False)
@@ -96,14 +137,45 @@ class GarminActivityData(Base):
     average_heart_rate = Column(Integer, nullable=True)
     max_heart_rate = Column(Integer, nullable=True)
     device_name = Column(String, nullable=True)
+    elevation_gain = Column(Float, nullable=True)  # Total elevation gain in meters
+    average_speed = Column(Float, nullable=True)  # Meters per second
+    average_pace = Column(Float, nullable=True)  # Minutes per kilometer
+    average_run_cadence = Column(Float, nullable=True)  # Steps per minute
     manual = Column(Boolean, default=False)  # Manually created vs device recorded
-    data = Column(Text, nullable=False)  # JSON data of the full summary
+    data = Column(JSONPayload, nullable=False)  # Full summary payload
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class GarminActivityDailyRollup(Base):
+    """Per user, UTC day and activity type totals of activity summaries, maintained by ingest."""
+    __tablename__ = 'garmin_activity_daily_rollup'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'day', 'activity_type', name='uq_garmin_activity_daily_rollup_user_day_type'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, ForeignKey('user_profile.user_id'), nullable=False)
+    day = Column(Date, nullable=False)  # UTC date of start_time
+    activity_type = Column(String, nullable=False)
+    sessions = Column(Integer, nullable=False, default=0)
+    duration_seconds = Column(Integer, nullable=False, default=0)
+    distance_meters = Column(Float, nullable=False, default=0.0)
+    calories = Column(Integer, nullable=False, default=0)
+    load = Column(Float, nullable=False, default=0.0)  # sum of HR-weighted session load
+    hr_sum = Column(Integer, nullable=False, default=0)  # sum of average HR over sessions with HR
+    hr_count = Column(Integer, nullable=False, default=0)
+    max_heart_rate = Column(Integer, nullable=True)
+    longest_duration_seconds = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 class GarminActivityAuxiliaryData(Base):
     """Stores non-list activity payloads such as details, files, and MoveIQ events."""
     __tablename__ = 'garmin_activity_auxiliary_data'
+    __table_args__ = (
+        UniqueConstraint('summary_type', 'summary_id', name='uq_garmin_activity_aux_type_summary'),
+        Index('ix_garmin_activity_aux_user_type_start', 'user_id', 'summary_type', desc('start_time')),
+        Index('ix_garmin_activity_aux_user_type_activity', 'user_id', 'summary_type', 'activity_id'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(BigInteger, ForeignKey('user_profile.user_id'), nullable=False)
@@ -113,13 +185,104 @@ class GarminActivityAuxiliaryData(Base):
     start_time = Column(DateTime, nullable=True)
     start_time_offset = Column(Integer, nullable=True)
     duration = Column(Integer, nullable=True)
-    data = Column(Text, nullable=False)
+    data = Column(JSONPayload, nullable=False)
+    segments = Column(JSONPayload, nullable=True)  # activityDetails only: effort segments extracted at ingest
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class GarminActivityFileChunk(Base):
+    """Content-addressed chunks of downloaded Garmin activity files (FIT/TCX/GPX)."""
+    __tablename__ = 'garmin_activity_file_chunks'
+    __table_args__ = (
+        UniqueConstraint('content_hash', 'chunk_index', name='uq_garmin_activity_file_chunks_hash_index'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    content_hash = Column(String(64), nullable=False)  # sha256 hex digest of the whole file
+    chunk_index = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class GarminFitSeries(Base):
+    """Decoded FIT time series (packed float64 columns) cached per activity file content."""
+    __tablename__ = 'garmin_fit_series'
+    __table_args__ = (
+        UniqueConstraint('summary_id', 'content_hash', name='uq_garmin_fit_series_summary_hash'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    summary_id = Column(String, nullable=False)  # activityFiles summary ID
+    content_hash = Column(String(64), nullable=False)  # sha256 of the FIT file
+    version = Column(Integer, nullable=False)  # decoder version that produced the artifact
+    record_count = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)  # zlib-compressed column arrays
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class TrainingContextCache(Base):
+    """Materialized training context per user and request window, invalidated by a source stamp."""
+    __tablename__ = 'training_context_cache'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'period_days', 'current_days', name='uq_training_context_cache_user_window'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, ForeignKey('user_profile.user_id'), nullable=False)
+    period_days = Column(Integer, nullable=False)
+    current_days = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False)  # builder version; bump to invalidate all rows
+    source_stamp = Column(String, nullable=False)  # day + max(updated_at)/count of the source rows
+    context = Column(Text, nullable=False)  # JSON training context
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+class RecoverySnapshot(Base):
+    """Per-user recovery inputs (latest health summaries, HRV history, 72h activities) kept current by ingest."""
+    __tablename__ = 'recovery_snapshots'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, ForeignKey('user_profile.user_id'), nullable=False, unique=True)
+    version = Column(Integer, nullable=False)  # inputs layout version; bump to invalidate all rows
+    inputs = Column(Text, nullable=False)  # JSON recovery inputs
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class TrainingEffortSketch(Base):
+    """Per user, UTC day and sport counts of quantized effort observations, maintained by ingest."""
+    __tablename__ = 'training_effort_sketches'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'day', 'sport', name='uq_training_effort_sketches_user_day_sport'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, ForeignKey('user_profile.user_id'), nullable=False)
+    day = Column(Date, nullable=False)  # UTC date of the activities' start_time
+    sport = Column(String, nullable=False)
+    sketch = Column(Text, nullable=False)  # JSON EffortSketch
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class TrainingEffortSketchState(Base):
+    """Marks a user's effort sketches as fully built; ingest only refreshes built users."""
+    __tablename__ = 'training_effort_sketch_state'
+
+    user_id = Column(BigInteger, ForeignKey('user_profile.user_id'), primary_key=True)
+    version = Column(Integer, nullable=False)  # sketch layout version; bump to rebuild all users
+    built_at = Column(DateTime, default=datetime.utcnow)
+
+class UserDataVersion(Base):
+    """Per-user counter bumped whenever Garmin data for the user changes; part of read-endpoint ETags."""
+    __tablename__ = 'user_data_versions'
+
+    user_id = Column(BigInteger, ForeignKey('user_profile.user_id'), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 class GarminWebhookEvent(Base):
     """Audit log for incoming Garmin webhook deliveries and processing status."""
     __tablename__ = 'garmin_webhook_events'
+    __table_args__ = (
+        Index('ix_garmin_webhook_events_user_created', 'user_id', 'created_at'),
+        Index('ix_garmin_webhook_events_source_status', 'source', 'status'),
+        Index('ix_garmin_webhook_events_status_created', 'status', 'created_at'),
+        Index('ix_garmin_webhook_events_status_next_attempt', 'status', 'next_attempt_at'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(BigInteger, ForeignKey('user_profile.user_id'), nullable=True)
@@ -128,12 +291,35 @@ class GarminWebhookEvent(Base):
     summary_types = Column(Text, nullable=True)  # JSON array of top-level payload keys
     item_count = Column(Integer, default=0)
     callback_count = Column(Integer, default=0)
-    status = Column(String, default='received')  # received, processed, partial, failed
+    status = Column(String, default='received')  # received, processing, processed, partial, failed, duplicate, dead_letter
+    attempts = Column(Integer, default=0)  # background retries of a partial/failed event
+    next_attempt_at = Column(DateTime, nullable=True)  # when the retry scheduler picks it up again
+    skipped_count = Column(Integer, default=0)  # items already processed within the dedupe window
     error = Column(Text, nullable=True)
-    payload = Column(Text, nullable=False)
+    payload = Column(Text, nullable=True)  # plain JSON of events stored before the payload archive
+    payload_hash = Column(String(64), nullable=True, index=True)  # garmin_webhook_payloads.content_hash
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class GarminWebhookPayload(Base):
+    """Compressed webhook payloads, stored once per distinct content and shared by re-deliveries."""
+    __tablename__ = 'garmin_webhook_payloads'
+
+    content_hash = Column(String(64), primary_key=True)  # sha256 of the canonical JSON
+    encoding = Column(String, nullable=False, default='gzip')
+    body = Column(LargeBinary, nullable=False)
+    size_bytes = Column(Integer, nullable=False)  # uncompressed JSON size
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class GarminWebhookFingerprint(Base):
+    """Webhook items (PUSH summaries or PING callback URLs) already processed, for retry/overlap dedupe."""
+    __tablename__ = 'garmin_webhook_fingerprints'
+
+    fingerprint = Column(String(40), primary_key=True)  # sha1 hex
+    summary_type = Column(String, nullable=False)
+    user_id = Column(BigInteger, ForeignKey('user_profile.user_id'), nullable=True)
+    processed_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
 class OAuthSession(Base):
     """Stores temporary OAuth2 state and code verifier."""
     __tablename__ = 'oauth_sessions'
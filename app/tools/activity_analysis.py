@@ -6,15 +6,21 @@ import math
 import re
 import uuid
 import base64
+import hashlib
 from collections import defaultdict
 from datetime import date, datetime, time, timedelta
 from html import escape
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
+from app.core.activity_rollup import hr_weighted_load
+from app.core.payload_memo import payload_memo
+from app.core.sample_columns import decode_detail_samples, is_sorted, split_sorted
 from app.database.models import GarminActivityAuxiliaryData, GarminActivityData
+from app.tools.activity_file_store import load_activity_file_content
+from app.tools.fit_series_store import get_fit_series, save_fit_series
 
 MAX_ANALYSIS_DAYS = 365
 DEFAULT_TREND_DAYS = 84
@@ -97,6 +103,7 @@ def detect_activity_analysis_request(
     return request
 
 
+@payload_memo("activity_analysis")
 def build_activity_analysis(
     db: Session,
     user_id: int,
@@ -149,7 +156,12 @@ def build_activity_analysis(
     elif intent == "pace_hr_correlation":
         result = _pace_hr_correlation(current_rows, normalized)
     elif intent == "hr_response_kinetics":
-        result = _hr_response_kinetics(activities, details + activity_files, normalized)
+        result = _hr_response_kinetics(
+            activities,
+            details + activity_files,
+            normalized,
+            fit_columns_loader=lambda payload: _load_fit_columns(db, payload),
+        )
     elif intent == "personal_records":
         result = _personal_records(current_summary_rows, normalized)
     elif intent == "workout_pattern_analysis":
@@ -734,10 +746,10 @@ def _detail_segments_for_activity(
     sport: str,
 ) -> list[dict[str, Any]]:
     try:
-        from app.api.garmin import _activity_detail_for, _segments_from_detail
+        from app.core.detail_segments import activity_detail_for, detail_segments_for
 
-        detail = _activity_detail_for(activity, detail_index)
-        return _segments_from_detail(detail, sport) if detail else []
+        detail = activity_detail_for(activity, detail_index)
+        return detail_segments_for(detail, sport, detail_index) if detail else []
     except Exception:
         return []
 
@@ -774,7 +786,7 @@ def _activity_row_from_values(activity: GarminActivityData, source: str = "summa
         "max_hr": activity.max_heart_rate,
         "speed_kmh": speed_kmh,
         "pace_min_km": pace_min_km,
-        "load": _rough_load(duration_seconds, avg_hr, activity.max_heart_rate),
+        "load": hr_weighted_load(duration_seconds, avg_hr, activity.max_heart_rate),
         "source": source,
         "sample_count": None,
     }
@@ -817,7 +829,7 @@ def _segment_row(
         "max_hr": activity.max_heart_rate,
         "speed_kmh": speed_kmh,
         "pace_min_km": pace_min_km,
-        "load": _rough_load(duration_seconds, avg_hr, activity.max_heart_rate),
+        "load": hr_weighted_load(duration_seconds, avg_hr, activity.max_heart_rate),
         "source": "activityDetails",
         "sample_count": segment.get("sample_count"),
     }
@@ -861,19 +873,6 @@ def _normalize_raw_sport(raw: dict[str, Any], fallback: Optional[str] = None) ->
     return "OTHER"
 
 
-def _rough_load(duration_seconds: int, avg_hr: Optional[int], max_hr: Optional[int]) -> float:
-    minutes = duration_seconds / 60
-    if not minutes:
-        return 0
-    if avg_hr and max_hr:
-        intensity = max(0.45, min(1.15, avg_hr / max(max_hr, 1)))
-    elif avg_hr:
-        intensity = max(0.45, min(1.05, avg_hr / 190))
-    else:
-        intensity = 0.65
-    return round(minutes * (intensity ** 2), 1)
-
-
 def _activity_trend(rows: list[dict[str, Any]], request: dict[str, Any]) -> dict[str, Any]:
     bucket = request.get("bucket") or "week"
     grouped = _group_rows(rows, bucket)
@@ -1041,6 +1040,7 @@ def _hr_response_kinetics(
     activities: list[GarminActivityData],
     details: list[GarminActivityAuxiliaryData],
     request: dict[str, Any],
+    fit_columns_loader: Optional[Callable[[dict[str, Any]], Optional[dict[str, list[Any]]]]] = None,
 ) -> dict[str, Any]:
     sport = request.get("sport")
     activity_details = [item for item in details if getattr(item, "summary_type", None) == "activityDetails"]
@@ -1057,7 +1057,12 @@ def _hr_response_kinetics(
         series = _sample_series(activity, detail, normalized_sport) if detail else []
         if len(series) < 24:
             file_payload = _activity_file_for_activity(activity, file_index)
-            fit_series, fit_detail = _fit_series_from_activity_file(file_payload, normalized_sport) if file_payload else ([], {})
+            if file_payload and fit_columns_loader:
+                fit_series, fit_detail = _fit_series_from_columns(fit_columns_loader(file_payload), normalized_sport)
+            else:
+                fit_series, fit_detail = (
+                    _fit_series_from_activity_file(file_payload, normalized_sport) if file_payload else ([], {})
+                )
             if len(fit_series) > len(series):
                 detail = fit_detail
                 series = fit_series
@@ -1337,9 +1342,9 @@ def _detail_payload_for_activity(
     detail_index: dict[str, dict[str, Any]],
 ) -> Optional[dict[str, Any]]:
     try:
-        from app.api.garmin import _activity_detail_for
+        from app.core.detail_segments import activity_detail_for
 
-        return _activity_detail_for(activity, detail_index)
+        return activity_detail_for(activity, detail_index)
     except Exception:
         for key in [activity.activity_id, activity.summary_id, str(activity.summary_id).replace("-detail", "") if activity.summary_id else None]:
             if key is not None and str(key) in detail_index:
@@ -1351,7 +1356,7 @@ def _build_activity_file_index(details: list[GarminActivityAuxiliaryData]) -> di
     index: dict[str, dict[str, Any]] = {}
     for detail in details:
         payload = _raw_payload(detail)
-        if not payload.get("contentBase64"):
+        if not payload.get("contentHash") and not payload.get("contentBase64"):
             continue
         keys = [
             detail.activity_id,
@@ -1388,27 +1393,12 @@ def _sample_series(
     detail: dict[str, Any],
     sport: str,
 ) -> list[dict[str, Any]]:
-    samples = sorted(
-        [sample for sample in detail.get("samples", []) if isinstance(sample, dict) and sample.get("startTimeInSeconds")],
-        key=lambda sample: sample.get("startTimeInSeconds"),
-    )
-    if len(samples) < 2:
+    columns = decode_detail_samples(detail)
+    if len(columns) < 2:
         return []
-    first_start = samples[0].get("startTimeInSeconds")
     rows: list[dict[str, Any]] = []
     previous: Optional[dict[str, Any]] = None
-    for sample in samples:
-        elapsed = _sample_elapsed_seconds(sample, first_start)
-        if elapsed is None:
-            continue
-        hr = _number(sample.get("heartRate") or sample.get("heartRateInBeatsPerMinute"))
-        distance_m = _first_number(sample, "totalDistanceInMeters", "distanceInMeters")
-        speed_mps = _first_number(
-            sample,
-            "speedMetersPerSecond",
-            "enhancedSpeedMetersPerSecond",
-            "averageSpeedInMetersPerSecond",
-        )
+    for elapsed, hr, distance_m, speed_mps in zip(columns.elapsed, columns.hr, columns.distance, columns.speed):
         if not speed_mps and previous and distance_m is not None and previous.get("distance_m") is not None:
             delta_t = elapsed - previous["elapsed_s"]
             delta_d = distance_m - previous["distance_m"]
@@ -1449,35 +1439,34 @@ def _smooth_sample_series(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
     return smoothed
 
 
-def _sample_elapsed_seconds(sample: dict[str, Any], first_start: Optional[int]) -> Optional[float]:
-    for key in ("timerDurationInSeconds", "movingDurationInSeconds", "clockDurationInSeconds"):
-        value = _number(sample.get(key))
-        if value is not None:
-            return float(value)
-    start = _number(sample.get("startTimeInSeconds"))
-    if start is not None and first_start is not None:
-        return float(start - first_start)
-    return None
-
-
 def _fit_series_from_activity_file(
     payload: Optional[dict[str, Any]],
     sport: str,
+    content: Optional[bytes] = None,
 ) -> tuple[list[dict[str, Any]], dict[str, Any]]:
-    if not payload or not payload.get("contentBase64"):
+    if not payload or (content is None and not payload.get("contentBase64")):
         return [], {}
+    if content is None:
+        try:
+            content = base64.b64decode(str(payload.get("contentBase64")))
+        except Exception:
+            return [], {}
+    return _fit_series_from_columns(_decode_fit_columns(content), sport)
+
+
+def _decode_fit_columns(content: bytes) -> dict[str, list[Any]]:
+    """Parse a FIT file into sport-independent columns (the expensive, cacheable step)."""
+    columns: dict[str, list[Any]] = {"elapsed_s": [], "hr": [], "distance_m": [], "speed_mps": [], "laps": []}
     try:
         from fit_tool.fit_file import FitFile
 
-        content = base64.b64decode(str(payload.get("contentBase64")))
         fit_file = FitFile.from_bytes(content, check_crc=False)
     except Exception:
-        return [], {}
+        return columns
 
-    raw_rows: list[dict[str, Any]] = []
-    lap_starts: list[float] = []
     first_ts: Optional[float] = None
-    previous: Optional[dict[str, Any]] = None
+    previous_elapsed: Optional[float] = None
+    previous_distance: Optional[float] = None
     for record in fit_file.records:
         message = getattr(record, "message", None)
         name = getattr(message, "name", None)
@@ -1486,7 +1475,7 @@ def _fit_series_from_activity_file(
             if lap_ts is not None:
                 if first_ts is None:
                     first_ts = lap_ts
-                lap_starts.append(max(0.0, lap_ts - first_ts))
+                columns["laps"].append(max(0.0, lap_ts - first_ts))
             continue
         if name != "record":
             continue
@@ -1505,25 +1494,43 @@ def _fit_series_from_activity_file(
         )
         if speed_mps is not None and speed_mps > 80:
             speed_mps = speed_mps / 1000
-        if not speed_mps and previous and distance_m is not None and previous.get("distance_m") is not None:
-            delta_t = elapsed - previous["elapsed_s"]
-            delta_d = distance_m - previous["distance_m"]
+        if not speed_mps and previous_elapsed is not None and distance_m is not None and previous_distance is not None:
+            delta_t = elapsed - previous_elapsed
+            delta_d = distance_m - previous_distance
             if delta_t > 0 and delta_d >= 0:
                 speed_mps = delta_d / delta_t
-        row = {
+        columns["elapsed_s"].append(elapsed)
+        columns["hr"].append(int(round(hr)) if hr is not None else None)
+        columns["distance_m"].append(distance_m)
+        columns["speed_mps"].append(speed_mps)
+        previous_elapsed = elapsed
+        previous_distance = distance_m
+    return columns
+
+
+def _fit_series_from_columns(
+    columns: Optional[dict[str, list[Any]]],
+    sport: str,
+) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+    if not columns or len(columns.get("elapsed_s") or []) < 2:
+        return [], {}
+    raw_rows: list[dict[str, Any]] = []
+    for elapsed, hr, distance_m, speed_mps in zip(
+        columns["elapsed_s"],
+        columns["hr"],
+        columns["distance_m"],
+        columns["speed_mps"],
+    ):
+        raw_rows.append({
             "elapsed_s": elapsed,
             "hr": int(round(hr)) if hr is not None else None,
             "distance_m": distance_m,
             "speed_mps": speed_mps,
             "speed_kmh": speed_mps * 3.6 if speed_mps is not None else None,
             "pace_min_km": _pace_from_speed(speed_mps, sport),
-        }
-        raw_rows.append(row)
-        previous = row
-    if len(raw_rows) < 2:
-        return [], {}
+        })
     detail_like = {
-        "lapElapsedSeconds": sorted(set(round(value, 3) for value in lap_starts if value >= 0)),
+        "lapElapsedSeconds": sorted(set(round(value, 3) for value in columns.get("laps") or [] if value >= 0)),
         "samples": [
             {
                 "startTimeInSeconds": int(round(row["elapsed_s"])),
@@ -1537,6 +1544,37 @@ def _fit_series_from_activity_file(
     return _smooth_sample_series(raw_rows), detail_like
 
 
+def _load_fit_columns(db: Session, payload: Optional[dict[str, Any]]) -> Optional[dict[str, list[Any]]]:
+    """Decoded FIT columns for an activityFiles payload, parsed once per file content and cached."""
+    if not payload:
+        return None
+    summary_id = str(payload.get("summaryId") or payload.get("fileId") or payload.get("activityId") or "")
+    content = None
+    content_hash = payload.get("contentHash")
+    if not content_hash:
+        # Legacy inline contentBase64: decoding is cheap, parsing is not, so key by the content hash
+        content = load_activity_file_content(db, payload)
+        if content is None:
+            return None
+        content_hash = hashlib.sha256(content).hexdigest()
+    content_hash = str(content_hash)
+    if summary_id:
+        cached = get_fit_series(db, summary_id, content_hash)
+        if cached is not None:
+            return cached
+    if content is None:
+        content = load_activity_file_content(db, payload)
+    if content is None:
+        return None
+    columns = _decode_fit_columns(content)
+    if summary_id:
+        try:
+            save_fit_series(db, summary_id, content_hash, columns)
+        except Exception:
+            db.rollback()
+    return columns
+
+
 def _fit_field_number(message: Any, name: str) -> Optional[float]:
     try:
         field = message.get_field_by_name(name)
@@ -1586,6 +1624,17 @@ def _pace_from_speed(speed_mps: Optional[float], sport: str) -> Optional[float]:
     return 1000 / speed_mps / 60
 
 
+def _blocks_between(series: list[dict[str, Any]], boundaries: list[float]) -> list[list[dict[str, Any]]]:
+    """Split the series at ascending elapsed-second boundaries; keep blocks with 2+ rows."""
+    elapsed = [item["elapsed_s"] for item in series]
+    if is_sorted(elapsed):
+        ranges = split_sorted(elapsed, boundaries)
+        blocks = [series[lo:hi] for lo, hi in ranges]
+    else:
+        blocks = [[item for item in series if start <= item["elapsed_s"] < end] for start, end in zip(boundaries, boundaries[1:])]
+    return [block for block in blocks if len(block) >= 2]
+
+
 def _response_blocks(series: list[dict[str, Any]], detail: dict[str, Any]) -> list[list[dict[str, Any]]]:
     elapsed_laps = sorted(
         _number(value)
@@ -1594,11 +1643,7 @@ def _response_blocks(series: list[dict[str, Any]], detail: dict[str, Any]) -> li
     )
     if len(elapsed_laps) >= 2:
         boundaries = sorted(set([0.0, *elapsed_laps, series[-1]["elapsed_s"] + 1]))
-        blocks = []
-        for start, end in zip(boundaries, boundaries[1:]):
-            block = [item for item in series if start <= item["elapsed_s"] < end]
-            if len(block) >= 2:
-                blocks.append(block)
+        blocks = _blocks_between(series, boundaries)
         if len(blocks) >= 2:
             return blocks
 
@@ -1609,21 +1654,12 @@ def _response_blocks(series: list[dict[str, Any]], detail: dict[str, Any]) -> li
             if isinstance(lap, dict) and lap.get("startTimeInSeconds") is not None
         ]
     )
-    first_abs = None
-    raw_samples = sorted(
-        [sample for sample in detail.get("samples", []) if isinstance(sample, dict) and sample.get("startTimeInSeconds")],
-        key=lambda sample: sample.get("startTimeInSeconds"),
-    )
-    if raw_samples:
-        first_abs = _number(raw_samples[0].get("startTimeInSeconds"))
+    columns = decode_detail_samples(detail)
+    first_abs = columns.start[0] if len(columns) else None
     if first_abs is not None and len(laps) >= 2:
         boundaries = [float(lap - first_abs) for lap in laps if lap >= first_abs]
         boundaries = sorted(set([0.0, *boundaries, series[-1]["elapsed_s"] + 1]))
-        blocks = []
-        for start, end in zip(boundaries, boundaries[1:]):
-            block = [item for item in series if start <= item["elapsed_s"] < end]
-            if len(block) >= 2:
-                blocks.append(block)
+        blocks = _blocks_between(series, boundaries)
         if len(blocks) >= 2:
             return blocks
 
@@ -0,0 +1,152 @@
+"""Content-addressed chunk storage for downloaded Garmin activity files."""
+import base64
+import hashlib
+import io
+import logging
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Union
+
+from sqlalchemy.orm import Session
+
+from app.core.garmin_ingest import _dialect_insert
+from app.database.models import GarminActivityAuxiliaryData, GarminActivityFileChunk
+
+logger = logging.getLogger(__name__)
+
+FILE_CHUNK_SIZE = 1024 * 1024  # 1 MiB per stored chunk
+
+# Files written or reused this recently are never pruned: the activityFiles row that
+# references them may not be committed yet.
+FILE_PRUNE_GRACE = timedelta(minutes=15)
+
+
+def _hash_stream(stream: BinaryIO) -> tuple[str, int]:
+    digest = hashlib.sha256()
+    length = 0
+    for chunk in iter(lambda: stream.read(FILE_CHUNK_SIZE), b""):
+        digest.update(chunk)
+        length += len(chunk)
+    stream.seek(0)
+    return digest.hexdigest(), length
+
+
+def has_activity_file(db: Session, content_hash: str) -> bool:
+    """Chunks of one file are written in a single transaction, so chunk 0 implies the rest."""
+    return db.query(GarminActivityFileChunk.id).filter(
+        GarminActivityFileChunk.content_hash == content_hash,
+        GarminActivityFileChunk.chunk_index == 0,
+    ).first() is not None
+
+
+def store_activity_file(
+    db: Session,
+    content: Union[bytes, BinaryIO],
+    content_hash: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Write file content as fixed-size chunks keyed by its sha256 hash.
+
+    Accepts raw bytes or a seekable binary stream (e.g. a spooled download); streams
+    are read one chunk at a time so memory stays bounded by FILE_CHUNK_SIZE.
+    Identical files are stored once; concurrent fetches of the same file skip the
+    chunks the other one wrote. Reusing a file stamps its first chunk again, so
+    prune_activity_file_chunks leaves it alone until the reference is committed.
+    The caller commits.
+
+    Returns:
+        Dict with contentHash, contentLength and contentChunks
+    """
+    stream = io.BytesIO(content) if isinstance(content, (bytes, bytearray)) else content
+    stream.seek(0)
+    if content_hash is None:
+        content_hash, _ = _hash_stream(stream)
+
+    reused = db.query(GarminActivityFileChunk).filter(
+        GarminActivityFileChunk.content_hash == content_hash,
+        GarminActivityFileChunk.chunk_index == 0,
+    ).update({"created_at": datetime.utcnow()}, synchronize_session=False)
+    if reused:
+        stream.seek(0, io.SEEK_END)
+        length = stream.tell()
+        return {
+            "contentHash": content_hash,
+            "contentLength": length,
+            "contentChunks": max(1, -(-length // FILE_CHUNK_SIZE)),
+        }
+
+    insert = _dialect_insert(db)
+
+    def write_chunk(index: int, data: bytes) -> None:
+        # Core inserts keep chunks out of the session identity map.
+        db.execute(
+            insert(GarminActivityFileChunk)
+            .values(content_hash=content_hash, chunk_index=index, data=data, created_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=["content_hash", "chunk_index"])
+        )
+
+    length = 0
+    chunk_index = 0
+    for chunk in iter(lambda: stream.read(FILE_CHUNK_SIZE), b""):
+        write_chunk(chunk_index, chunk)
+        length += len(chunk)
+        chunk_index += 1
+    if chunk_index == 0:
+        write_chunk(0, b"")
+        chunk_index = 1
+    return {"contentHash": content_hash, "contentLength": length, "contentChunks": chunk_index}
+
+
+def prune_activity_file_chunks(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Delete the chunks of files no activityFiles row references any more (e.g. after
+    Garmin re-sent a file with other content); commits. Returns the files removed.
+    """
+    cutoff = (now or datetime.utcnow()) - FILE_PRUNE_GRACE
+    candidates = {
+        content_hash
+        for (content_hash,) in db.query(GarminActivityFileChunk.content_hash).filter(
+            GarminActivityFileChunk.chunk_index == 0,
+            GarminActivityFileChunk.created_at < cutoff,
+        )
+    }
+    if candidates:
+        for (data,) in db.query(GarminActivityAuxiliaryData.data).filter(
+            GarminActivityAuxiliaryData.summary_type == "activityFiles",
+        ).yield_per(500):
+            if isinstance(data, dict):
+                candidates.discard(data.get("contentHash"))
+    orphaned = sorted(candidates)
+    for offset in range(0, len(orphaned), 500):
+        db.query(GarminActivityFileChunk).filter(
+            GarminActivityFileChunk.content_hash.in_(orphaned[offset:offset + 500]),
+        ).delete(synchronize_session=False)
+    db.commit()
+    return len(orphaned)
+
+
+def iter_activity_file_chunks(db: Session, content_hash: str) -> Iterator[bytes]:
+    """Yield the stored chunks of one file in order, one row at a time."""
+    query = (
+        db.query(GarminActivityFileChunk.data)
+        .filter(GarminActivityFileChunk.content_hash == content_hash)
+        .order_by(GarminActivityFileChunk.chunk_index.asc())
+        .yield_per(1)
+    )
+    for (data,) in query:
+        yield data
+
+
+def load_activity_file_content(db: Session, payload: Optional[Dict[str, Any]]) -> Optional[bytes]:
+    """Return the file bytes for an activityFiles payload (chunk store or legacy contentBase64)."""
+    if not payload:
+        return None
+    content_hash = payload.get("contentHash")
+    if content_hash:
+        content = b"".join(iter_activity_file_chunks(db, str(content_hash)))
+        return content or None
+    if payload.get("contentBase64"):
+        try:
+            return base64.b64decode(str(payload["contentBase64"]))
+        except Exception:
+            logger.warning(f"Invalid contentBase64 in activity file {payload.get('summaryId')}")
+    return None
@@ -0,0 +1,96 @@
+"""Compact columnar cache of decoded FIT time series, keyed by activity file and content hash."""
+import math
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.database.models import GarminFitSeries
+
+# Bump when the decoder output changes so stale artifacts are rebuilt.
+FIT_SERIES_VERSION = 1
+
+FIT_SERIES_COLUMNS = ("elapsed_s", "hr", "distance_m", "speed_mps")
+
+_HEADER = struct.Struct("<HII")  # version, row count, lap count
+
+
+def _to_array(values: List[Optional[float]]) -> array:
+    packed = array("d", (math.nan if value is None else float(value) for value in values))
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed
+
+
+def _from_bytes(raw: bytes) -> array:
+    values = array("d")
+    values.frombytes(raw)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def pack_fit_series(series: Dict[str, List[Optional[float]]]) -> bytes:
+    """Pack decoded columns plus lap starts into zlib-compressed little-endian float64 arrays."""
+    rows = len(series["elapsed_s"])
+    laps = series.get("laps") or []
+    parts = [_HEADER.pack(FIT_SERIES_VERSION, rows, len(laps))]
+    parts.extend(_to_array(series[column]).tobytes() for column in FIT_SERIES_COLUMNS)
+    parts.append(_to_array(laps).tobytes())
+    return zlib.compress(b"".join(parts))
+
+
+def unpack_fit_series(blob: bytes) -> Dict[str, List[Optional[float]]]:
+    """Inverse of pack_fit_series; NaN cells come back as None."""
+    raw = zlib.decompress(blob)
+    _version, rows, laps = _HEADER.unpack_from(raw)
+    offset = _HEADER.size
+    series: Dict[str, List[Optional[float]]] = {}
+    for column in FIT_SERIES_COLUMNS:
+        end = offset + rows * 8
+        series[column] = [None if math.isnan(value) else value for value in _from_bytes(raw[offset:end])]
+        offset = end
+    series["laps"] = list(_from_bytes(raw[offset:offset + laps * 8]))
+    return series
+
+
+def get_fit_series(db: Session, summary_id: str, content_hash: str) -> Optional[Dict[str, Any]]:
+    """Return the cached series for one activity file, or None when missing or stale."""
+    record = db.query(GarminFitSeries).filter(
+        GarminFitSeries.summary_id == summary_id,
+        GarminFitSeries.content_hash == content_hash,
+    ).first()
+    if record is None or record.version != FIT_SERIES_VERSION:
+        return None
+    try:
+        return unpack_fit_series(record.data)
+    except (zlib.error, struct.error, ValueError):
+        return None
+
+
+def save_fit_series(db: Session, summary_id: str, content_hash: str, series: Dict[str, Any]) -> None:
+    """Upsert the packed series for one activity file and commit."""
+    from app.core.garmin_ingest import upsert_rows
+
+    now = datetime.utcnow()
+    upsert_rows(
+        db,
+        GarminFitSeries,
+        [
+            {
+                "summary_id": summary_id,
+                "content_hash": content_hash,
+                "version": FIT_SERIES_VERSION,
+                "record_count": len(series["elapsed_s"]),
+                "data": pack_fit_series(series),
+                "created_at": now,
+            }
+        ],
+        conflict_columns=["summary_id", "content_hash"],
+        update_columns=["version", "record_count", "data", "created_at"],
+    )
+    db.commit()
@@ -0,0 +1,296 @@
+"""Pooled, concurrent fetching of Garmin PING callback URLs."""
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Streamed downloads stay in memory up to this size, then spill to a temp file.
+SPOOL_MEMORY_LIMIT = 1024 * 1024
+# Only this much of a non-200 streamed body is kept for error messages.
+ERROR_BODY_LIMIT = 2048
+
+
+@dataclass
+class CallbackRequest:
+    """One callback URL to fetch with the headers of the user it belongs to."""
+    url: str
+    headers: Dict[str, str]
+    timeout: Optional[float] = None
+    stream: bool = False  # spool the body to `CallbackResult.body` instead of `content`
+
+
+@dataclass
+class CallbackResult:
+    """Outcome of a callback fetch; `error` is set when no HTTP response was obtained."""
+    url: str
+    status_code: Optional[int] = None
+    content: bytes = b""
+    headers: Dict[str, str] = field(default_factory=dict)
+    error: Optional[str] = None
+    attempts: int = 0
+    body: Optional[BinaryIO] = None
+    content_hash: Optional[str] = None
+    content_length: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code == 200
+
+    def close(self) -> None:
+        """Release the spooled body of a streamed download."""
+        if self.body is not None:
+            self.body.close()
+            self.body = None
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+class CallbackFetcher:
+    """
+    Shared httpx.AsyncClient for Garmin callback URLs.
+
+    The client lives on a private event loop thread so that sync callers (webhook
+    workers, replay_failed_webhooks) and async callers share one connection pool.
+    Requests are limited per host, kept alive between pings, and retried with
+    full-jitter exponential backoff on 429/5xx and transport errors.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_connections: int = 20,
+        per_host_limit: int = 8,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 8.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.max_connections = max_connections
+        self.per_host_limit = max(1, per_host_limit)
+        self.timeout = timeout
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._transport = transport
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="garmin-callback-fetcher", daemon=True)
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Only called on the fetcher loop, so no locking is needed.
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0,
+                ),
+                follow_redirects=True,
+                transport=self._transport,
+            )
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(self.backoff_cap, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    async def _fetch_one(self, request: CallbackRequest) -> CallbackResult:
+        client = self._get_client()
+        result = CallbackResult(url=request.url)
+        for attempt in range(self.max_retries + 1):
+            result.attempts = attempt + 1
+            retry_after = None
+            result.close()
+            try:
+                async with self._host_limit(request.url):
+                    if request.stream:
+                        await self._stream_into(client, request, result)
+                    else:
+                        response = await client.get(
+                            request.url,
+                            headers=request.headers,
+                            timeout=request.timeout or self.timeout,
+                        )
+                        result.status_code = response.status_code
+                        result.content = response.content
+                        result.headers = dict(response.headers)
+                result.error = None
+                if result.status_code not in RETRYABLE_STATUS_CODES:
+                    return result
+                retry_after = result.headers.get("retry-after")
+            except httpx.HTTPError as e:
+                result.close()
+                result.error = f"{type(e).__name__}: {e}"
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+        return result
+
+    async def _stream_into(
+        self,
+        client: httpx.AsyncClient,
+        request: CallbackRequest,
+        result: CallbackResult,
+    ) -> None:
+        """Download into a spooled temp file while hashing, so memory stays bounded."""
+        async with client.stream(
+            "GET",
+            request.url,
+            headers=request.headers,
+            timeout=request.timeout or self.timeout,
+        ) as response:
+            result.status_code = response.status_code
+            result.headers = dict(response.headers)
+            if response.status_code != 200:
+                error_body = b""
+                async for chunk in response.aiter_bytes():
+                    error_body += chunk[:ERROR_BODY_LIMIT - len(error_body)]
+                    if len(error_body) >= ERROR_BODY_LIMIT:
+                        break
+                result.content = error_body
+                return
+
+            body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_LIMIT)
+            result.body = body
+            digest = hashlib.sha256()
+            length = 0
+            async for chunk in response.aiter_bytes():
+                body.write(chunk)
+                digest.update(chunk)
+                length += len(chunk)
+            body.seek(0)
+            result.content_hash = digest.hexdigest()
+            result.content_length = length
+
+    async def _fetch_all(self, requests: List[CallbackRequest]) -> List[CallbackResult]:
+        return list(await asyncio.gather(*(self._fetch_one(request) for request in requests)))
+
+    def fetch_many(self, requests: List[CallbackRequest]) -> List[CallbackResult]:
+        """Fetch all callbacks concurrently and block until done; results keep input order."""
+        if not requests:
+            return []
+        future = asyncio.run_coroutine_threadsafe(self._fetch_all(requests), self._ensure_loop())
+        return future.result()
+
+    async def afetch_many(self, requests: List[CallbackRequest]) -> List[CallbackResult]:
+        """Async variant of fetch_many for callers already on an event loop."""
+        if not requests:
+            return []
+        future = asyncio.run_coroutine_threadsafe(self._fetch_all(requests), self._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+    def close(self) -> None:
+        """Close the pooled client and stop the fetcher loop."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result()
+            self._client = None
+        self._host_limits = {}
+        loop.call_soon_threadsafe(loop.stop)
+
+
+@dataclass
+class PingCallback:
+    """A PING item waiting for its callbackURL to be fetched."""
+    user_id: int
+    summary_type: str
+    item: Dict[str, Any]
+
+
+def fetch_ping_callbacks(
+    db: Session,
+    pings: List[PingCallback],
+    fetcher: Optional[CallbackFetcher] = None,
+) -> List[Tuple[PingCallback, CallbackResult]]:
+    """
+    Fetch the callback URLs of a batch of PING items concurrently.
+
+    Authorization headers are built once per user. Users without a valid token get
+    an error result instead of a request. activityFiles are streamed to a spooled
+    `body`; callers should `close()` those results once stored.
+    """
+    from app.tools.garmin_client import GarminAPIClient
+
+    fetcher = fetcher or callback_fetcher
+    headers_by_user: Dict[int, Any] = {}
+    requests: List[CallbackRequest] = []
+    pending: List[PingCallback] = []
+    results: List[Tuple[PingCallback, CallbackResult]] = []
+
+    for ping in pings:
+        if ping.user_id not in headers_by_user:
+            try:
+                headers_by_user[ping.user_id] = GarminAPIClient(db, ping.user_id)._get_headers()
+            except Exception as e:
+                headers_by_user[ping.user_id] = e
+        headers = headers_by_user[ping.user_id]
+        callback_url = ping.item["callbackURL"]
+        if isinstance(headers, Exception):
+            results.append((ping, CallbackResult(url=callback_url, error=str(headers))))
+            continue
+        if ping.summary_type == "activityFiles":
+            request = CallbackRequest(
+                url=callback_url,
+                headers=headers,
+                timeout=settings.callback_file_timeout_seconds,
+                stream=True,
+            )
+        else:
+            request = CallbackRequest(url=callback_url, headers=headers)
+        requests.append(request)
+        pending.append(ping)
+
+    results.extend(zip(pending, fetcher.fetch_many(requests)))
+    return results
+
+
+callback_fetcher = CallbackFetcher(
+    max_connections=settings.callback_max_connections,
+    per_host_limit=settings.callback_per_host_limit,
+    timeout=settings.callback_timeout_seconds,
+    max_retries=settings.callback_max_retries,
+)
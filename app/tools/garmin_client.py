@@ -1,14 +1,18 @@
 """Garmin API client for fetching health and activity data."""
 import requests
 import logging
-from typing import Dict, List, Optional
+from typing import BinaryIO, Dict, List, Optional, Union
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-import base64
 import json
 
+from app.core.garmin_ingest import (
+    upsert_activity_summaries,
+    upsert_auxiliary_summaries,
+    upsert_health_summaries,
+)
+from app.tools.activity_file_store import store_activity_file
 from app.tools.garmin_oauth import GarminOAuthService
-from app.database.models import GarminActivityAuxiliaryData, GarminHealthData, GarminActivityData
 
 logger = logging.getLogger(__name__)
 
@@ -111,182 +115,69 @@ class GarminAPIClient:
         self,
         summary_type: str,
         summaries: List[Dict]
-    ):
+    ) -> Dict[str, int]:
         """
         Store health data summaries in database.
 
         Args:
             summary_type: Type of summary (dailies, sleeps, etc.)
             summaries: List of summary data dicts
-        """
-        for summary in summaries:
-            summary_id = summary.get("summaryId")
-            start_time = None
-            if "startTimeInSeconds" in summary:
-                start_time = datetime.utcfromtimestamp(summary["startTimeInSeconds"])
-            elif isinstance(summary.get("summary"), dict) and summary["summary"].get("startTimeInSeconds"):
-                start_time = datetime.utcfromtimestamp(summary["summary"]["startTimeInSeconds"])
-            elif "measurementTimeInSeconds" in summary:
-                start_time = datetime.utcfromtimestamp(summary["measurementTimeInSeconds"])
-
-            if not summary_id and start_time is not None:
-                summary_id = f"{summary_type}-{self.user_id}-{int(start_time.timestamp())}"
-
-            if not summary_id:
-                continue
-
-            if not start_time:
-                logger.warning(f"No timestamp found in summary {summary_id}")
-                continue
-
-            data_json = json.dumps(summary)
 
-            existing = self.db.query(GarminHealthData).filter(
-                GarminHealthData.summary_id == summary_id
-            ).first()
-
-            if existing:
-                # Update existing record
-                existing.data = data_json
-                existing.updated_at = datetime.utcnow()
-            else:
-                # Create new record
-                health_data = GarminHealthData(
-                    user_id=self.user_id,
-                    summary_id=summary_id,
-                    summary_type=summary_type,
-                    calendar_date=summary.get('calendarDate'),
-                    start_time=start_time,
-                    start_time_offset=summary.get('startTimeOffsetInSeconds') or summary.get('offsetInSeconds'),
-                    duration=summary.get('durationInSeconds'),
-                    data=data_json
-                )
-                self.db.add(health_data)
-
-        self.db.commit()
+        Returns:
+            Dict with inserted/updated/skipped counts
+        """
+        return upsert_health_summaries(self.db, self.user_id, summary_type, summaries)
 
     def _store_activity_data(
         self,
         summaries: List[Dict],
         summary_type: str = "activities",
-    ):
+    ) -> Dict[str, int]:
         """
         Store activity data summaries in database.
 
         Args:
             summaries: List of activity summary dicts
             summary_type: Garmin summary type from webhook payload
-        """
-        if summary_type not in {"activities", "manuallyUpdatedActivities"}:
-            self._store_activity_auxiliary_data(summary_type, summaries)
-            return
-
-        for summary in summaries:
-            summary_id = summary.get('summaryId')
-            if not summary_id:
-                continue
-
-            # Check if already exists
-            existing = self.db.query(GarminActivityData).filter(
-                GarminActivityData.summary_id == summary_id
-            ).first()
-
-            # Parse timestamp
-            start_time = datetime.utcfromtimestamp(summary['startTimeInSeconds'])
-
-            data_json = json.dumps(summary)
-
-            if existing:
-                # Update existing record
-                existing.summary_type = summary_type
-                existing.data = data_json
-                existing.updated_at = datetime.utcnow()
-            else:
-                # Create new record
-                activity_data = GarminActivityData(
-                    user_id=self.user_id,
-                    summary_id=summary_id,
-                    summary_type=summary_type,
-                    activity_id=summary.get('activityId'),
-                    activity_type=summary.get('activityType'),
-                    activity_name=summary.get('activityName'),
-                    start_time=start_time,
-                    start_time_offset=summary.get('startTimeOffsetInSeconds'),
-                    duration=summary.get('durationInSeconds'),
-                    distance=summary.get('distanceInMeters'),
-                    calories=summary.get('activeKilocalories'),
-                    average_heart_rate=summary.get('averageHeartRateInBeatsPerMinute'),
-                    max_heart_rate=summary.get('maxHeartRateInBeatsPerMinute'),
-                    device_name=summary.get('deviceName'),
-                    manual=summary.get('manual', False),
-                    data=data_json
-                )
-                self.db.add(activity_data)
 
-        self.db.commit()
+        Returns:
+            Dict with inserted/updated/skipped counts
+        """
+        return upsert_activity_summaries(self.db, self.user_id, summaries, summary_type)
 
     def _store_activity_auxiliary_data(
         self,
         summary_type: str,
         summaries: List[Dict],
-    ):
+    ) -> Dict[str, int]:
         """Store activity details, files, MoveIQ, and other non-list activity payloads."""
-        for summary in summaries:
-            summary_id = (
-                summary.get('summaryId')
-                or summary.get('activityId')
-                or summary.get('fileId')
-                or summary.get('callbackURL')
-            )
-            if not summary_id:
-                logger.warning(f"No stable identifier found in {summary_type} summary")
-                continue
-
-            existing = self.db.query(GarminActivityAuxiliaryData).filter(
-                GarminActivityAuxiliaryData.summary_type == summary_type,
-                GarminActivityAuxiliaryData.summary_id == str(summary_id),
-            ).first()
-
-            start_time = None
-            if 'startTimeInSeconds' in summary:
-                start_time = datetime.utcfromtimestamp(summary['startTimeInSeconds'])
-
-            data_json = json.dumps(summary)
-
-            if existing:
-                existing.activity_id = summary.get('activityId')
-                existing.start_time = start_time
-                existing.start_time_offset = summary.get('startTimeOffsetInSeconds')
-                existing.duration = summary.get('durationInSeconds')
-                existing.data = data_json
-                existing.updated_at = datetime.utcnow()
-            else:
-                aux_data = GarminActivityAuxiliaryData(
-                    user_id=self.user_id,
-                    summary_id=str(summary_id),
-                    summary_type=summary_type,
-                    activity_id=summary.get('activityId'),
-                    start_time=start_time,
-                    start_time_offset=summary.get('startTimeOffsetInSeconds'),
-                    duration=summary.get('durationInSeconds'),
-                    data=data_json,
-                )
-                self.db.add(aux_data)
-
-        self.db.commit()
+        return upsert_auxiliary_summaries(self.db, self.user_id, summary_type, summaries)
 
     def _store_activity_file_content(
         self,
         metadata: Dict,
-        content: bytes,
+        content: Union[bytes, BinaryIO],
         content_type: Optional[str] = None,
-    ):
-        """Store activity file metadata plus raw callback content as base64."""
+        content_hash: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """
+        Store activity file content in the chunk store and its metadata in the auxiliary table.
+
+        Args:
+            metadata: activityFiles ping item
+            content: File bytes or a seekable binary stream (e.g. a spooled download)
+            content_type: Content-Type of the callback response
+            content_hash: sha256 hex digest when already computed during download
+
+        Returns:
+            Dict with inserted/updated/skipped counts for the metadata row
+        """
+        stored = store_activity_file(self.db, content, content_hash=content_hash)
         payload = dict(metadata)
+        payload.pop("contentBase64", None)
         payload["contentType"] = content_type
-        payload["contentLength"] = len(content)
-        payload["contentBase64"] = base64.b64encode(content).decode("ascii")
-        self._store_activity_auxiliary_data("activityFiles", [payload])
+        payload.update(stored)
+        return self._store_activity_auxiliary_data("activityFiles", [payload])
 
     # =========================================================================
     # HEALTH DATA METHODS
@@ -700,12 +591,12 @@ class GarminAPIClient:
         return result
 
 
-def write_health_data(db: Session, user_id: int, summary_type: str, summaries: List[Dict]) -> None:
+def write_health_data(db: Session, user_id: int, summary_type: str, summaries: List[Dict]) -> Dict[str, int]:
     """Persist health webhook payloads without a live Garmin API token."""
     writer = GarminAPIClient.__new__(GarminAPIClient)
     writer.db = db
     writer.user_id = user_id
-    writer._store_health_data(summary_type, summaries)
+    return writer._store_health_data(summary_type, summaries)
 
 
 def write_activity_data(
@@ -713,12 +604,12 @@ def write_activity_data(
     user_id: int,
     summaries: List[Dict],
     summary_type: str = "activities",
-) -> None:
+) -> Dict[str, int]:
     """Persist activity webhook payloads without a live Garmin API token."""
     writer = GarminAPIClient.__new__(GarminAPIClient)
     writer.db = db
     writer.user_id = user_id
-    writer._store_activity_data(summaries, summary_type)
+    return writer._store_activity_data(summaries, summary_type)
 
 
 def write_activity_auxiliary_data(
@@ -726,9 +617,24 @@ def write_activity_auxiliary_data(
     user_id: int,
     summary_type: str,
     summaries: List[Dict],
-) -> None:
+) -> Dict[str, int]:
     """Persist auxiliary activity webhook payloads without a live Garmin API token."""
     writer = GarminAPIClient.__new__(GarminAPIClient)
     writer.db = db
     writer.user_id = user_id
-    writer._store_activity_auxiliary_data(summary_type, summaries)
+    return writer._store_activity_auxiliary_data(summary_type, summaries)
+
+
+def write_activity_file_content(
+    db: Session,
+    user_id: int,
+    metadata: Dict,
+    content: Union[bytes, BinaryIO],
+    content_type: Optional[str] = None,
+    content_hash: Optional[str] = None,
+) -> Dict[str, int]:
+    """Persist a fetched activity file without a live Garmin API token."""
+    writer = GarminAPIClient.__new__(GarminAPIClient)
+    writer.db = db
+    writer.user_id = user_id
+    return writer._store_activity_file_content(metadata, content, content_type, content_hash)
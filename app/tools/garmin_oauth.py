@@ -3,6 +3,9 @@ import base64
 import hashlib
 import logging
 import secrets
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Dict, Tuple, Optional
 from urllib.parse import urlencode
@@ -16,6 +19,56 @@ from app.database.database import get_db
 
 logger = logging.getLogger(__name__)
 
+# Refresh access tokens this long before Garmin expires them.
+ACCESS_TOKEN_EXPIRY_BUFFER = timedelta(minutes=10)
+
+
+@dataclass
+class _CachedAccessToken:
+    access_token: str
+    refresh_at: datetime  # expires_at minus the buffer
+    cached_until: float  # time.monotonic(); bounds staleness against other processes
+
+
+_access_tokens: Dict[int, _CachedAccessToken] = {}
+_access_tokens_lock = threading.Lock()
+_refresh_locks: Dict[int, threading.Lock] = {}
+
+
+def _cached_access_token(user_id: int) -> Optional[str]:
+    with _access_tokens_lock:
+        cached = _access_tokens.get(user_id)
+        if cached is None:
+            return None
+        if datetime.utcnow() >= cached.refresh_at or time.monotonic() >= cached.cached_until:
+            del _access_tokens[user_id]
+            return None
+        return cached.access_token
+
+
+def _cache_access_token(user_id: int, access_token: str, expires_at: datetime) -> None:
+    if settings.garmin_token_cache_seconds <= 0:
+        return
+    with _access_tokens_lock:
+        _access_tokens[user_id] = _CachedAccessToken(
+            access_token=access_token,
+            refresh_at=expires_at - ACCESS_TOKEN_EXPIRY_BUFFER,
+            cached_until=time.monotonic() + settings.garmin_token_cache_seconds,
+        )
+
+
+def _refresh_lock(user_id: int) -> threading.Lock:
+    with _access_tokens_lock:
+        return _refresh_locks.setdefault(user_id, threading.Lock())
+
+
+def invalidate_access_token(*user_ids: Optional[int]) -> None:
+    """Drop cached access tokens, e.g. after the stored tokens were replaced or deleted."""
+    with _access_tokens_lock:
+        for user_id in user_ids:
+            if user_id is not None:
+                _access_tokens.pop(user_id, None)
+
 
 class GarminOAuthService:
     """Handles Garmin OAuth2 PKCE authentication flow."""
@@ -323,6 +376,7 @@ class GarminOAuthService:
             GarminToken.garmin_user_id == garmin_user_id
         ).first()
 
+        replaced_garmin_user_id = token_for_user.garmin_user_id if token_for_user else None
         previous_user_id = None
         if token_for_garmin and token_for_garmin.user_id != user_id:
             previous_user_id = token_for_garmin.user_id
@@ -365,9 +419,12 @@ class GarminOAuthService:
         db.commit()
         db.refresh(garmin_token)
 
-        try:
-            from app.core.garmin_import import migrate_garmin_account_data
+        from app.core.garmin_import import invalidate_garmin_user, migrate_garmin_account_data
+
+        invalidate_access_token(user_id, previous_user_id)
+        invalidate_garmin_user(garmin_user_id, replaced_garmin_user_id)
 
+        try:
             migration = migrate_garmin_account_data(
                 db,
                 garmin_user_id=garmin_user_id,
@@ -390,6 +447,9 @@ class GarminOAuthService:
         """
         Get a valid access token, refreshing if necessary.
 
+        Decrypted tokens are cached per process until shortly before they expire, and
+        concurrent callers for one user share a single refresh.
+
         Args:
             db: Database session
             user_id: Internal user ID
@@ -400,30 +460,38 @@ class GarminOAuthService:
         Raises:
             Exception: If token refresh fails
         """
-        garmin_token = db.query(GarminToken).filter(
-            GarminToken.user_id == user_id
-        ).first()
+        access_token = _cached_access_token(user_id)
+        if access_token:
+            return access_token
 
-        if not garmin_token:
-            return None
+        with _refresh_lock(user_id):
+            # Another caller may have refreshed or loaded the token while we waited.
+            access_token = _cached_access_token(user_id)
+            if access_token:
+                return access_token
 
-        # Check if access token is expired (with 10 minute buffer)
-        if datetime.utcnow() >= (garmin_token.expires_at - timedelta(minutes=10)):
-            # Token is expired or about to expire, refresh it
-            encrypted_refresh = garmin_token.refresh_token
-            refresh_token = self.decrypt_token(encrypted_refresh)
+            garmin_token = db.query(GarminToken).filter(
+                GarminToken.user_id == user_id
+            ).first()
+
+            if not garmin_token:
+                return None
 
-            # Refresh the token
+            if datetime.utcnow() < garmin_token.expires_at - ACCESS_TOKEN_EXPIRY_BUFFER:
+                # Token is still valid
+                access_token = self.decrypt_token(garmin_token.access_token)
+                _cache_access_token(user_id, access_token, garmin_token.expires_at)
+                return access_token
+
+            # Token is expired or about to expire, refresh it
+            refresh_token = self.decrypt_token(garmin_token.refresh_token)
             new_token_data = self.refresh_access_token(refresh_token)
 
             # Store the new tokens
-            self.store_tokens(db, user_id, new_token_data)
-
-            return new_token_data['access_token']
-        else:
-            # Token is still valid
-            encrypted_access = garmin_token.access_token
-            return self.decrypt_token(encrypted_access)
+            garmin_token = self.store_tokens(db, user_id, new_token_data)
+            access_token = new_token_data['access_token']
+            _cache_access_token(user_id, access_token, garmin_token.expires_at)
+            return access_token
 
     def delete_tokens(self, db: Session, user_id: int):
         """
@@ -432,5 +500,13 @@ class GarminOAuthService:
         Keep profile.garmin_user_id so late backfill webhooks can still be routed
         to the correct account. Connected state is derived from GarminToken rows.
         """
+        from app.core.garmin_import import invalidate_garmin_user
+
+        garmin_user_ids = [
+            garmin_user_id
+            for (garmin_user_id,) in db.query(GarminToken.garmin_user_id).filter(GarminToken.user_id == user_id)
+        ]
         db.query(GarminToken).filter(GarminToken.user_id == user_id).delete()
         db.commit()
+        invalidate_access_token(user_id)
+        invalidate_garmin_user(*garmin_user_ids)
@@ -1,6 +1,5 @@
 """Garmin tools for fetching health and activity data via OAuth API."""
 import datetime
-import json
 import logging
 from typing import List, Optional
 from sqlalchemy import and_
@@ -97,7 +96,7 @@ def get_health_data(
                 for item in health_data:
                     if item.summary_type not in results:
                         results[item.summary_type] = []
-                    results[item.summary_type].append(json.loads(item.data))
+                    results[item.summary_type].append(item.data)
 
             # For other health types (sleep, stress, etc.), use calendar_date (more reliable than start_time due to timezones)
             other_types = [t for t in health_types if t != "dailies"]
@@ -115,7 +114,7 @@ def get_health_data(
                 for item in health_data:
                     if item.summary_type not in results:
                         results[item.summary_type] = []
-                    results[item.summary_type].append(json.loads(item.data))
+                    results[item.summary_type].append(item.data)
 
         # Fetch activity data
         if "activities" in data_types:
@@ -127,7 +126,7 @@ def get_health_data(
                 )
             ).order_by(GarminActivityData.start_time).all()
 
-            results["activities"] = [json.loads(item.data) for item in activity_data]
+            results["activities"] = [item.data for item in activity_data]
 
         # Check if any data was found
         if not results or all(len(v) == 0 for v in results.values()):
@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from app.core.readiness import format_assessment_text
-from app.core.recovery_snapshot import build_live_recovery_snapshot
+from app.core.recovery_snapshot import load_recovery_snapshot
 from app.config import settings
 from app.database.database import SessionLocal
 
@@ -15,7 +15,7 @@ def assess_recovery_status(user_id: int) -> str:
     """
     try:
         with SessionLocal() as db:
-            snapshot = build_live_recovery_snapshot(
+            snapshot = load_recovery_snapshot(
                 db,
                 user_id,
                 lookback_days=14,
@@ -30,7 +30,7 @@ def get_recovery_metrics(user_id: int, date: str = None) -> str:
     """Get recovery metrics (same canonical snapshot as the web UI)."""
     try:
         with SessionLocal() as db:
-            snapshot = build_live_recovery_snapshot(
+            snapshot = load_recovery_snapshot(
                 db,
                 user_id,
                 lookback_days=14,
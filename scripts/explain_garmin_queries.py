@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Record EXPLAIN plans for the hot Garmin read paths.
+
+Run it once before and once after `alembic upgrade head` and diff the two files to
+see which queries moved from sequential scans to index scans.
+
+Usage:
+  python scripts/explain_garmin_queries.py --label before --user-id 1
+  alembic upgrade head
+  python scripts/explain_garmin_queries.py --label after --user-id 1
+  diff explain_before.txt explain_after.txt
+
+On PostgreSQL the plans come from EXPLAIN (ANALYZE, BUFFERS); pass --no-analyze to
+skip executing the queries. On SQLite EXPLAIN QUERY PLAN is used.
+"""
+
+import sys
+import os
+import argparse
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from sqlalchemy import select, text
+
+from app.database.database import engine
+from app.database.models import (
+    GarminActivityAuxiliaryData,
+    GarminActivityData,
+    GarminHealthData,
+    GarminWebhookEvent,
+)
+
+load_dotenv()
+
+
+def representative_queries(user_id):
+    """One statement per access pattern the API and tools issue on every request."""
+    now = datetime.utcnow()
+    return {
+        "latest health summary (recovery)": (
+            select(GarminHealthData)
+            .where(
+                GarminHealthData.user_id == user_id,
+                GarminHealthData.summary_type == "stressDetails",
+                GarminHealthData.start_time >= now - timedelta(days=14),
+            )
+            .order_by(GarminHealthData.start_time.desc())
+            .limit(1)
+        ),
+        "hrv history (recovery)": (
+            select(GarminHealthData)
+            .where(
+                GarminHealthData.user_id == user_id,
+                GarminHealthData.summary_type == "hrv",
+                GarminHealthData.start_time >= now - timedelta(days=14),
+            )
+            .order_by(GarminHealthData.start_time.desc())
+            .limit(14)
+        ),
+        "health by calendar date": (
+            select(GarminHealthData)
+            .where(
+                GarminHealthData.user_id == user_id,
+                GarminHealthData.calendar_date == now.date().isoformat(),
+            )
+        ),
+        "recent activities (fatigue, training context)": (
+            select(GarminActivityData)
+            .where(
+                GarminActivityData.user_id == user_id,
+                GarminActivityData.summary_type.in_(["activities", "manuallyUpdatedActivities"]),
+                GarminActivityData.start_time >= now - timedelta(days=120),
+            )
+            .order_by(GarminActivityData.start_time.desc())
+        ),
+        "activity details window (analysis)": (
+            select(GarminActivityAuxiliaryData)
+            .where(
+                GarminActivityAuxiliaryData.user_id == user_id,
+                GarminActivityAuxiliaryData.summary_type == "activityDetails",
+                GarminActivityAuxiliaryData.start_time >= now - timedelta(days=120),
+            )
+            .order_by(GarminActivityAuxiliaryData.start_time.desc())
+        ),
+        "activity file by activity id (analysis)": (
+            select(GarminActivityAuxiliaryData)
+            .where(
+                GarminActivityAuxiliaryData.user_id == user_id,
+                GarminActivityAuxiliaryData.summary_type == "activityFiles",
+                GarminActivityAuxiliaryData.activity_id == "0",
+            )
+        ),
+        "pending webhook events (queue recovery)": (
+            select(GarminWebhookEvent.id)
+            .where(
+                GarminWebhookEvent.status == "received",
+                GarminWebhookEvent.created_at >= now - timedelta(days=1),
+            )
+            .order_by(GarminWebhookEvent.created_at.asc())
+        ),
+    }
+
+
+def explain(connection, statement, analyze=True):
+    """Return the plan lines for one statement on the connected dialect."""
+    dialect = connection.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+        return [row[0] for row in connection.execute(text(prefix + sql))]
+    if dialect.name == "sqlite":
+        return [row[-1] for row in connection.execute(text("EXPLAIN QUERY PLAN " + sql))]
+    return [str(row) for row in connection.execute(text("EXPLAIN " + sql))]
+
+
+def record_plans(label, user_id, analyze=True, output=None):
+    output = output or f"explain_{label}.txt"
+    lines = [f"# {label} — {engine.dialect.name} — {datetime.utcnow().isoformat()}Z", ""]
+    with engine.connect() as connection:
+        for name, statement in representative_queries(user_id).items():
+            lines.append(f"## {name}")
+            lines.extend(explain(connection, statement, analyze=analyze))
+            lines.append("")
+    with open(output, "w") as handle:
+        handle.write("\n".join(lines))
+    print(f"✓ Wrote {len(representative_queries(user_id))} plans to {output}")
+    return output
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Record EXPLAIN plans for the Garmin read paths',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        '--label',
+        default='current',
+        help='Name for this run, e.g. before/after (default: current)'
+    )
+    parser.add_argument(
+        '--user-id',
+        type=int,
+        default=1,
+        help='Internal user ID to plan the per-user queries for'
+    )
+    parser.add_argument(
+        '--output',
+        help='Output file (default: explain_<label>.txt)'
+    )
+    parser.add_argument(
+        '--no-analyze',
+        action='store_true',
+        help='Plan only; do not execute the queries (PostgreSQL)'
+    )
+
+    args = parser.parse_args()
+    record_plans(args.label, args.user_id, analyze=not args.no_analyze, output=args.output)
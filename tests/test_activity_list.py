@@ -0,0 +1,62 @@
+"""Tests for keyset pagination of the activity list."""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+
+from app.api.garmin import list_activities
+from app.core.activity_rollup import rebuild_activity_rollup
+from app.database.database import RoutingSession
+from app.database.models import Base, GarminActivityData, UserProfile
+
+
+def _session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = RoutingSession(bind=engine)
+    session.add(UserProfile(user_id=1))
+    session.commit()
+    return session
+
+
+def _list(session, **params):
+    defaults = {"user_id": 1, "telegram_user_id": None, "limit": 200, "period_days": 30, "cursor": None, "fields": None}
+    return list_activities(db=session, **{**defaults, **params})
+
+
+def test_pages_walk_the_window_newest_first_without_payloads():
+    session = _session()
+    now = datetime.utcnow().replace(microsecond=0)
+    same_start = now - timedelta(days=2)
+    for index, start in enumerate([now - timedelta(days=1), same_start, same_start, now - timedelta(days=5)]):
+        session.add(
+            GarminActivityData(
+                user_id=1,
+                summary_id=f"a-{index}",
+                activity_type="RUNNING",
+                start_time=start,
+                duration=600,
+                data={"big": "payload"},
+            )
+        )
+    session.commit()
+    rebuild_activity_rollup(session, 1)
+
+    first = _list(session, limit=2)
+    assert [item["summary_id"] for item in first["activities"]] == ["a-0", "a-2"]
+    assert "raw_data" not in first["activities"][0]
+    assert first["summary"]["sessions"] == 4
+    assert first["type_distribution"] == {"RUNNING": 4}
+
+    second = _list(session, limit=2, cursor=first["next_cursor"], fields="summary_id,raw_data")
+    assert second["activities"] == [
+        {"summary_id": "a-1", "raw_data": {"big": "payload"}},
+        {"summary_id": "a-3", "raw_data": {"big": "payload"}},
+    ]
+    assert second["next_cursor"] is None
+    assert "summary" not in second
+
+    with pytest.raises(HTTPException) as error:
+        _list(session, fields="summary_id,secret")
+    assert error.value.status_code == 400
@@ -0,0 +1,129 @@
+"""Tests for the daily activity rollup."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.garmin import summarize_activities
+from app.core.activity_rollup import load_activity_buckets
+from app.core.garmin_ingest import upsert_activity_summaries
+from app.database.models import Base, GarminActivityDailyRollup, GarminActivityData, UserProfile
+
+
+def _session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(UserProfile(user_id=1))
+    session.commit()
+    return session
+
+
+def _summary(summary_id, start, activity_type="RUNNING", duration=3600, hr=150):
+    return {
+        "summaryId": summary_id,
+        "activityType": activity_type,
+        "startTimeInSeconds": int((start - datetime(1970, 1, 1)).total_seconds()),
+        "durationInSeconds": duration,
+        "distanceInMeters": duration * 3.0,
+        "averageHeartRateInBeatsPerMinute": hr,
+        "maxHeartRateInBeatsPerMinute": hr + 25,
+    }
+
+
+def test_ingest_keeps_rollup_in_sync_with_edits_and_day_moves():
+    session = _session()
+    day = datetime(2026, 3, 10, 8, 0)
+    upsert_activity_summaries(session, 1, [_summary("a-1", day), _summary("a-2", day + timedelta(hours=9), duration=1800)])
+    row = session.query(GarminActivityDailyRollup).one()
+    assert (row.day, row.sessions, row.duration_seconds, row.hr_count) == (day.date(), 2, 5400, 2)
+
+    # Garmin edit moves one activity to the next day.
+    upsert_activity_summaries(session, 1, [_summary("a-2", day + timedelta(days=1), duration=1800)])
+    rows = {row.day: row for row in session.query(GarminActivityDailyRollup)}
+    assert rows[day.date()].sessions == 1
+    assert rows[(day + timedelta(days=1)).date()].duration_seconds == 1800
+
+
+def test_refresh_updates_rollup_rows_in_place_and_drops_vanished_types():
+    from app.core.activity_rollup import refresh_activity_rollup
+
+    session = _session()
+    day = datetime(2026, 3, 10, 8, 0)
+    upsert_activity_summaries(session, 1, [_summary("a-1", day)])
+    running = session.query(GarminActivityDailyRollup).one()
+    # A concurrent ingest already wrote rows for the same day, including a type that is gone now
+    session.add(GarminActivityDailyRollup(user_id=1, day=day.date(), activity_type="SWIMMING", sessions=1))
+    session.commit()
+
+    assert refresh_activity_rollup(session, 1, [day.date()]) == 1
+    session.commit()
+
+    rows = session.query(GarminActivityDailyRollup).all()
+    assert [(row.id, row.activity_type, row.sessions) for row in rows] == [(running.id, "RUNNING", 1)]
+
+
+def test_refresh_reads_only_the_touched_days(monkeypatch):
+    from app.core import activity_rollup
+
+    session = _session()
+    first = datetime(2020, 1, 1, 8, 0)
+    today = datetime(2026, 3, 11, 8, 0)  # no stored activity on this day
+    upsert_activity_summaries(
+        session, 1, [_summary(f"a-{index}", first + timedelta(days=index)) for index in range(0, 2500, 5)]
+    )
+    loaded = []
+    load = activity_rollup.load_activities_on_days
+    monkeypatch.setattr(
+        activity_rollup,
+        "load_activities_on_days",
+        lambda db, user_id, days: loaded.extend(load(db, user_id, days)) or loaded,
+    )
+
+    upsert_activity_summaries(session, 1, [_summary("a-0", first, duration=600), _summary("new", today)])
+
+    assert sorted(activity.summary_id for activity in loaded) == ["a-0", "new"]
+    rows = {row.day: row for row in session.query(GarminActivityDailyRollup)}
+    assert rows[first.date()].duration_seconds == 600
+    assert rows[today.date()].sessions == 1
+
+
+def test_rollup_buckets_match_raw_rows_across_window_edges():
+    session = _session()
+    now = datetime(2026, 3, 31, 13, 30)
+    summaries = [
+        _summary(f"a-{index}", now - timedelta(hours=7 * index), activity_type="CYCLING" if index % 3 else "RUNNING", hr=120 + index % 40)
+        for index in range(1, 130)
+    ]
+    upsert_activity_summaries(session, 1, summaries)
+
+    current_start = now - timedelta(days=7)
+    baseline_start = current_start - timedelta(days=28)
+    buckets = load_activity_buckets(session, 1, baseline_start, boundaries=[current_start])
+    raw = session.query(GarminActivityData).filter(GarminActivityData.start_time >= baseline_start).all()
+
+    assert len(buckets) < len(raw)
+    for lo, hi in [(current_start, None), (baseline_start, current_start)]:
+        from_buckets = [b for b in buckets if b.start_time >= lo and (hi is None or b.start_time < hi)]
+        from_raw = [a for a in raw if a.start_time >= lo and (hi is None or a.start_time < hi)]
+        assert summarize_activities(from_buckets) == summarize_activities(from_raw)
+
+
+def test_load_metrics_from_rollup_buckets_match_raw_rows():
+    from app.core.load_metrics import compute_load_metrics
+
+    session = _session()
+    now = datetime(2026, 3, 31, 13, 30)
+    summaries = [
+        _summary(f"a-{index}", now - timedelta(hours=11 * index), duration=1200 + 60 * (index % 30))
+        for index in range(1, 90)
+    ]
+    upsert_activity_summaries(session, 1, summaries)
+
+    current_start = now - timedelta(days=7)
+    buckets = load_activity_buckets(session, 1, current_start - timedelta(days=28), boundaries=[current_start])
+    raw = session.query(GarminActivityData).all()
+
+    from_rollup = compute_load_metrics(buckets, now=now)
+    assert from_rollup.load_ratio is not None
+    assert from_rollup == compute_load_metrics(raw, now=now)
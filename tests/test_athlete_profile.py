@@ -0,0 +1,63 @@
+"""Tests for the streamed athlete profile."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+
+from app.api.analysis import athlete_profile
+from app.database.database import RoutingSession
+from app.database.models import Base, GarminActivityData, GarminHealthData, UserProfile
+
+
+def _session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = RoutingSession(bind=engine)
+    session.add(UserProfile(user_id=1))
+    session.commit()
+    return session
+
+
+def test_profile_folds_streamed_rows_into_totals_and_records(monkeypatch):
+    monkeypatch.setattr("app.api.analysis.PROFILE_STREAM_BATCH", 2)
+    session = _session()
+    start = datetime(2026, 3, 2, 7)
+    runs = [(5000.0, 5.5, 150), (10000.0, 4.8, 178), (8000.0, 4.8, 160)]
+    for index, (distance, pace, max_hr) in enumerate(runs):
+        session.add(
+            GarminActivityData(
+                user_id=1,
+                summary_id=f"run-{index}",
+                activity_type="RUNNING",
+                activity_name=f"Run {index}",
+                start_time=start + timedelta(days=2 * index),
+                duration=1800,
+                distance=distance,
+                max_heart_rate=max_hr,
+                average_pace=pace,
+                data={},
+            )
+        )
+    for day, resting_hr in enumerate([50, 54, 0]):
+        session.add(
+            GarminHealthData(
+                user_id=1,
+                summary_id=f"d-{day}",
+                summary_type="dailies",
+                start_time=start + timedelta(days=day),
+                resting_heart_rate=resting_hr,
+                data={},
+            )
+        )
+    session.commit()
+
+    profile = athlete_profile(user_id=1, db=session)
+
+    assert profile["overview"]["total_activities"] == 3
+    assert profile["overview"]["total_distance_km"] == 23.0
+    assert profile["running"]["best_pace_min_km"] == 4.8
+    assert profile["running"]["longest_run_km"] == 10.0
+    # Equal paces: the most recent run holds the record.
+    assert profile["personal_records"]["running"]["fastest_pace"]["activity"] == "Run 2"
+    assert profile["training_patterns"]["avg_days_between_sessions"] == 2.0
+    assert profile["heart_rate_zones"]["max_hr_observed"] == 178
+    assert profile["health"] == {"days_with_data": 3, "avg_resting_hr": 52, "min_resting_hr": 50, "max_resting_hr": 54}
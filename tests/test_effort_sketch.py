@@ -0,0 +1,130 @@
+"""Tests for the per-day effort sketches behind the personal training targets."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.garmin import _training_profile_from_sketches, build_personal_training_profile
+from app.core.effort_sketch import (
+    EFFORT_SKETCH_RETENTION_DAYS,
+    load_effort_sketches,
+    refresh_effort_sketches,
+)
+from app.core.garmin_ingest import upsert_activity_summaries, upsert_auxiliary_summaries
+from app.database.models import (
+    Base,
+    GarminActivityAuxiliaryData,
+    GarminActivityData,
+    TrainingEffortSketch,
+    UserProfile,
+)
+
+
+def _session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(UserProfile(user_id=1))
+    session.commit()
+    return session
+
+
+def _seconds(start):
+    return int((start - datetime(1970, 1, 1)).total_seconds())
+
+
+def _summary(index, start, activity_type="RUNNING", name="Run"):
+    duration = 1800 + 300 * (index % 5)
+    return {
+        "summaryId": f"a-{index}",
+        "activityId": 1000 + index,
+        "activityType": activity_type,
+        "activityName": name,
+        "startTimeInSeconds": _seconds(start),
+        "durationInSeconds": duration,
+        "distanceInMeters": duration * (7.5 if activity_type == "CYCLING" else 2.6 + (index % 4) * 0.2),
+        "averageHeartRateInBeatsPerMinute": 128 + (index * 7) % 40,
+        "maxHeartRateInBeatsPerMinute": 165 + index % 20,
+    }
+
+
+def _detail(index, start, seconds=1500):
+    samples = [
+        {
+            "startTimeInSeconds": _seconds(start) + second,
+            "heartRate": 125 + (second // 60) % 45,
+            "speedMetersPerSecond": 2.8 + (second // 300) * 0.2,
+            "totalDistanceInMeters": second * 3.0,
+        }
+        for second in range(0, seconds, 5)
+    ]
+    return {
+        "summaryId": f"a-{index}-detail",
+        "activityId": 1000 + index,
+        "summary": {"startTimeInSeconds": _seconds(start), "activityType": "RUNNING"},
+        "samples": samples,
+    }
+
+
+def _live_profile(session, since):
+    activities = session.query(GarminActivityData).filter(GarminActivityData.start_time >= since).all()
+    details = session.query(GarminActivityAuxiliaryData).all()
+    return build_personal_training_profile(activities, details)
+
+
+def test_stored_sketches_match_the_live_profile_through_ingest():
+    session = _session()
+    today = datetime.utcnow().replace(hour=7, minute=0, second=0, microsecond=0)
+    names = ["Easy run", "Tempo", "Run", "Intervals", "Zwift ride"]
+    summaries = [
+        _summary(
+            index,
+            today - timedelta(days=index, hours=index % 3),
+            activity_type="CYCLING" if index % 5 == 4 else "RUNNING",
+            name=names[index % 5],
+        )
+        for index in range(1, 40)
+    ]
+    upsert_activity_summaries(session, 1, summaries)
+    upsert_auxiliary_summaries(session, 1, "activityDetails", [_detail(index, today - timedelta(days=index)) for index in (1, 2, 3)])
+
+    since = (today - timedelta(days=60)).replace(hour=0)
+    stored = _training_profile_from_sketches(load_effort_sketches(session, 1, since.date()))
+    assert stored == _live_profile(session, since)
+    assert stored["RUNNING"]["detail_activities"] == 3
+
+    # Once built, ingest keeps the stored sketches current: new summaries, a late detail, an edit.
+    upsert_activity_summaries(session, 1, [_summary(50, today), _summary(51, today - timedelta(days=2), name="Recovery")])
+    upsert_auxiliary_summaries(session, 1, "activityDetails", [_detail(6, today - timedelta(days=6))])
+    upsert_activity_summaries(session, 1, [_summary(8, today - timedelta(days=9), activity_type="CYCLING")])
+
+    stored = _training_profile_from_sketches(load_effort_sketches(session, 1, since.date()))
+    assert stored == _live_profile(session, since)
+    assert stored["RUNNING"]["detail_activities"] == 4
+    assert stored["RUNNING"]["sessions"] + stored["CYCLING"]["sessions"] == 41
+
+
+def test_refresh_drops_vanished_sports_and_days_past_retention():
+    session = _session()
+    today = datetime.utcnow().replace(hour=7, minute=0, second=0, microsecond=0)
+    upsert_activity_summaries(session, 1, [_summary(1, today - timedelta(days=1))])
+    load_effort_sketches(session, 1, (today - timedelta(days=30)).date())
+    old_day = (today - timedelta(days=EFFORT_SKETCH_RETENTION_DAYS + 5)).date()
+    session.add(TrainingEffortSketch(user_id=1, day=old_day, sport="RUNNING", sketch="{}"))
+    session.commit()
+
+    # The activity turns out to be a ride: the running sketch of that day goes away.
+    upsert_activity_summaries(session, 1, [_summary(1, today - timedelta(days=1), activity_type="CYCLING")])
+
+    rows = session.query(TrainingEffortSketch).all()
+    assert [(row.day, row.sport) for row in rows] == [((today - timedelta(days=1)).date(), "CYCLING")]
+
+
+def test_ingest_skips_users_whose_sketches_were_never_built():
+    session = _session()
+    today = datetime.utcnow()
+    upsert_activity_summaries(session, 1, [_summary(1, today)])
+
+    assert session.query(TrainingEffortSketch).count() == 0
+    assert refresh_effort_sketches(session, 1, [today.date()]) == 0
+    assert set(load_effort_sketches(session, 1, today.date())) == {"RUNNING"}
@@ -0,0 +1,69 @@
+"""Tests for the packed FIT series cache."""
+import base64
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models import Base, GarminFitSeries
+from app.tools import activity_analysis
+from app.tools.activity_file_store import store_activity_file
+from app.tools.fit_series_store import pack_fit_series, unpack_fit_series
+
+
+def test_pack_round_trip_keeps_missing_values():
+    series = {
+        "elapsed_s": [0.0, 1.0, 2.0],
+        "hr": [120, None, 131],
+        "distance_m": [0.0, 2.5, None],
+        "speed_mps": [None, 2.5, 2.6],
+        "laps": [0.0, 1.5],
+    }
+
+    assert unpack_fit_series(pack_fit_series(series)) == series
+
+
+def test_load_fit_columns_parses_each_file_once(monkeypatch):
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    stored = store_activity_file(session, b"fake-fit-bytes")
+    session.commit()
+    payload = {"summaryId": "file-1", **stored}
+    calls = []
+
+    def fake_decode(content):
+        calls.append(content)
+        return {"elapsed_s": [0.0, 1.0], "hr": [100, 101], "distance_m": [0.0, 3.0], "speed_mps": [3.0, 3.0], "laps": []}
+
+    monkeypatch.setattr(activity_analysis, "_decode_fit_columns", fake_decode)
+
+    first = activity_analysis._load_fit_columns(session, payload)
+    second = activity_analysis._load_fit_columns(session, payload)
+
+    assert calls == [b"fake-fit-bytes"]
+    assert first == second
+    assert session.query(GarminFitSeries).one().record_count == 2
+    series, detail = activity_analysis._fit_series_from_columns(second, "RUNNING")
+    assert len(series) == 2
+    assert len(detail["samples"]) == 2
+
+
+def test_load_fit_columns_caches_legacy_inline_files(monkeypatch):
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    payload = {"summaryId": "legacy-1", "contentBase64": base64.b64encode(b"legacy-fit-bytes").decode()}
+    calls = []
+
+    def fake_decode(content):
+        calls.append(content)
+        return {"elapsed_s": [0.0, 1.0], "hr": [100, 101], "distance_m": [0.0, 3.0], "speed_mps": [3.0, 3.0], "laps": []}
+
+    monkeypatch.setattr(activity_analysis, "_decode_fit_columns", fake_decode)
+
+    first = activity_analysis._load_fit_columns(session, payload)
+    second = activity_analysis._load_fit_columns(session, payload)
+
+    assert calls == [b"legacy-fit-bytes"]
+    assert first == second
+    assert session.query(GarminFitSeries).count() == 1
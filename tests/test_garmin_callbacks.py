@@ -0,0 +1,73 @@
+"""Tests for the pooled Garmin callback fetcher."""
+import asyncio
+
+import httpx
+
+from app.tools.garmin_callbacks import CallbackFetcher, CallbackRequest
+
+
+def test_fetch_many_retries_retryable_status_and_keeps_order():
+    calls = {}
+
+    def handler(request):
+        url = str(request.url)
+        calls[url] = calls.get(url, 0) + 1
+        if url.endswith("/flaky") and calls[url] == 1:
+            return httpx.Response(503)
+        if url.endswith("/missing"):
+            return httpx.Response(404)
+        return httpx.Response(200, json=[{"url": url, "auth": request.headers.get("authorization")}])
+
+    fetcher = CallbackFetcher(backoff_base=0, transport=httpx.MockTransport(handler))
+    try:
+        results = fetcher.fetch_many(
+            [
+                CallbackRequest("https://apis.garmin.com/flaky", {"Authorization": "Bearer a"}),
+                CallbackRequest("https://apis.garmin.com/missing", {}),
+                CallbackRequest("https://apis.garmin.com/ok", {"Authorization": "Bearer b"}),
+            ]
+        )
+    finally:
+        fetcher.close()
+
+    assert [result.status_code for result in results] == [200, 404, 200]
+    assert results[0].attempts == 2
+    assert results[1].attempts == 1
+    assert results[2].json() == [{"url": "https://apis.garmin.com/ok", "auth": "Bearer b"}]
+
+
+def test_fetch_many_reports_transport_errors_after_retries():
+    def handler(request):
+        raise httpx.ConnectError("boom", request=request)
+
+    fetcher = CallbackFetcher(max_retries=2, backoff_base=0, transport=httpx.MockTransport(handler))
+    try:
+        (result,) = asyncio.run(fetcher.afetch_many([CallbackRequest("https://apis.garmin.com/x", {})]))
+    finally:
+        fetcher.close()
+
+    assert result.status_code is None
+    assert result.attempts == 3
+    assert "ConnectError" in result.error
+
+
+def test_streamed_download_is_spooled_and_hashed():
+    import hashlib
+
+    payload = b"x" * 5000
+
+    def handler(request):
+        return httpx.Response(200, content=payload, headers={"content-type": "application/fit"})
+
+    fetcher = CallbackFetcher(transport=httpx.MockTransport(handler))
+    try:
+        (result,) = fetcher.fetch_many([CallbackRequest("https://apis.garmin.com/file", {}, stream=True)])
+    finally:
+        fetcher.close()
+
+    assert result.content == b""
+    assert result.content_length == len(payload)
+    assert result.content_hash == hashlib.sha256(payload).hexdigest()
+    assert result.body.read() == payload
+    result.close()
+    assert result.body is None
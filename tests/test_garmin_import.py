@@ -5,6 +5,8 @@ from app.core.garmin_import import (
     activity_backfill_summary,
     build_import_log,
     build_import_message,
+    garmin_user_resolver,
+    invalidate_garmin_user,
     migrate_garmin_data_between_users,
     pull_activity_history_direct,
     resolve_internal_user_for_garmin,
@@ -113,7 +115,28 @@ def test_build_import_log_includes_backfill_and_replay():
 
 
 def test_resolve_internal_user_prefers_token():
+    invalidate_garmin_user("garmin-123")
     token = MagicMock(user_id=42)
     db = MagicMock()
     db.query.return_value.filter.return_value.first.side_effect = [token, None]
     assert resolve_internal_user_for_garmin(db, "garmin-123") == 42
+    invalidate_garmin_user("garmin-123")
+
+
+def test_resolve_internal_user_caches_known_and_unknown_users_until_invalidated():
+    invalidate_garmin_user("garmin-known", "garmin-unknown")
+    db = MagicMock()
+    first = db.query.return_value.filter.return_value.first
+    first.side_effect = [MagicMock(user_id=7), None, None]
+
+    resolve = garmin_user_resolver(db)
+    assert [resolve("garmin-known") for _ in range(500)] == [7] * 500
+    assert resolve_internal_user_for_garmin(db, "garmin-known") == 7
+    assert resolve_internal_user_for_garmin(db, "garmin-unknown") is None
+    assert resolve_internal_user_for_garmin(db, "garmin-unknown") is None
+    assert first.call_count == 3  # one token lookup for the known id, token + profile for the unknown one
+
+    invalidate_garmin_user("garmin-known", "garmin-unknown")
+    first.side_effect = [MagicMock(user_id=8)]
+    assert resolve_internal_user_for_garmin(db, "garmin-known") == 8
+    invalidate_garmin_user("garmin-known")
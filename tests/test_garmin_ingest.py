@@ -0,0 +1,267 @@
+"""Tests for the set-based Garmin summary writers."""
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.garmin_ingest import (
+    upsert_activity_summaries,
+    upsert_health_summaries,
+)
+from app.database.models import (
+    Base,
+    GarminActivityAuxiliaryData,
+    GarminActivityData,
+    GarminActivityFileChunk,
+    GarminHealthData,
+    UserProfile,
+)
+
+
+def _session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(UserProfile(user_id=1))
+    session.commit()
+    return session
+
+
+def test_upsert_health_summaries_inserts_updates_and_counts():
+    session = _session()
+
+    first = upsert_health_summaries(
+        session,
+        1,
+        "dailies",
+        [
+            {"summaryId": "d-1", "calendarDate": "2026-01-01", "startTimeInSeconds": 1767225600, "steps": 10},
+            {"summaryId": "d-2", "calendarDate": "2026-01-02", "startTimeInSeconds": 1767312000, "steps": 20},
+            {"summaryId": "d-3"},
+        ],
+        chunk_size=1,
+    )
+    assert first == {"inserted": 2, "updated": 0, "skipped": 1}
+
+    second = upsert_health_summaries(
+        session,
+        1,
+        "dailies",
+        [
+            {"summaryId": "d-2", "calendarDate": "2026-01-02", "startTimeInSeconds": 1767312000, "steps": 25},
+            {"summaryId": "d-2", "calendarDate": "2026-01-02", "startTimeInSeconds": 1767312000, "steps": 30},
+            {"summaryId": "d-4", "calendarDate": "2026-01-03", "startTimeInSeconds": 1767398400, "steps": 40},
+        ],
+    )
+    assert second == {"inserted": 1, "updated": 1, "skipped": 1}
+
+    rows = {row.summary_id: row for row in session.query(GarminHealthData).all()}
+    assert sorted(rows) == ["d-1", "d-2", "d-4"]
+    assert rows["d-2"].data["steps"] == 30
+    assert rows["d-2"].calendar_date == "2026-01-02"
+
+
+def test_resent_summary_with_shifted_start_time_replaces_the_stored_row():
+    session = _session()
+    upsert_health_summaries(
+        session, 1, "sleeps", [{"summaryId": "s-1", "startTimeInSeconds": 1767225600, "durationInSeconds": 28000}]
+    )
+
+    stats = upsert_health_summaries(
+        session, 1, "sleeps", [{"summaryId": "s-1", "startTimeInSeconds": 1767225900, "durationInSeconds": 27700}]
+    )
+
+    assert stats == {"inserted": 0, "updated": 1, "skipped": 0}
+    row = session.query(GarminHealthData).one()
+    assert row.start_time == datetime.utcfromtimestamp(1767225900)
+    assert row.data["durationInSeconds"] == 27700
+
+
+def test_upsert_health_summaries_derives_id_from_timestamp():
+    session = _session()
+
+    stats = upsert_health_summaries(session, 1, "hrv", [{"summary": {"startTimeInSeconds": 1767225600}}])
+
+    assert stats["inserted"] == 1
+    row = session.query(GarminHealthData).one()
+    assert row.summary_id.startswith("hrv-1-")
+
+
+def test_upsert_activity_summaries_refreshes_typed_columns():
+    session = _session()
+    activity = {
+        "summaryId": "a-1",
+        "activityId": 42,
+        "activityType": "RUNNING",
+        "activityName": "Morning Run",
+        "startTimeInSeconds": 1767225600,
+        "durationInSeconds": 1800,
+        "averageHeartRateInBeatsPerMinute": 140,
+    }
+
+    first = upsert_activity_summaries(session, 1, [activity, {"summaryId": "a-2"}])
+    assert first == {"inserted": 1, "updated": 0, "skipped": 1}
+
+    edited = dict(activity, activityName="Tempo Run", durationInSeconds=2000)
+    second = upsert_activity_summaries(session, 1, [edited], "manuallyUpdatedActivities")
+    assert second == {"inserted": 0, "updated": 1, "skipped": 0}
+
+    row = session.query(GarminActivityData).one()
+    assert row.activity_id == "42"
+    assert row.activity_name == "Tempo Run"
+    assert row.duration == 2000
+    assert row.summary_type == "manuallyUpdatedActivities"
+
+
+def test_upserts_fill_typed_metric_columns():
+    session = _session()
+    upsert_activity_summaries(
+        session,
+        1,
+        [
+            {
+                "summaryId": "a-1",
+                "activityType": "RUNNING",
+                "startTimeInSeconds": 1767225600,
+                "totalElevationGainInMeters": 120.5,
+                "averageSpeedInMetersPerSecond": 3.2,
+                "averagePaceInMinutesPerKilometer": 5.2,
+                "averageRunCadenceInStepsPerMinute": 172.0,
+            }
+        ],
+    )
+    upsert_health_summaries(
+        session, 1, "dailies", [{"summaryId": "d-1", "startTimeInSeconds": 1767225600, "restingHeartRateInBeatsPerMinute": 48}]
+    )
+    upsert_health_summaries(
+        session, 1, "sleeps", [{"summaryId": "s-1", "startTimeInSeconds": 1767225600, "overallSleepScore": {"value": 81}}]
+    )
+    upsert_health_summaries(
+        session, 1, "hrv", [{"summaryId": "h-1", "startTimeInSeconds": 1767225600, "lastNightAvg": 62}]
+    )
+
+    activity = session.query(GarminActivityData).one()
+    assert (activity.elevation_gain, activity.average_speed, activity.average_pace, activity.average_run_cadence) == (
+        120.5,
+        3.2,
+        5.2,
+        172.0,
+    )
+    assert activity.data["activityType"] == "RUNNING"
+    health = {row.summary_type: row for row in session.query(GarminHealthData).all()}
+    assert health["dailies"].resting_heart_rate == 48
+    assert health["sleeps"].sleep_score == 81
+    assert health["hrv"].hrv_last_night_avg == 62
+    assert health["dailies"].sleep_score is None
+
+
+def test_upserts_accept_null_score_fields():
+    session = _session()
+
+    sleeps = upsert_health_summaries(
+        session,
+        1,
+        "sleeps",
+        [
+            {"summaryId": "s-1", "startTimeInSeconds": 1767225600, "overallSleepScore": None},
+            {"summaryId": "s-2", "startTimeInSeconds": 1767312000, "sleepScores": {"overall": None}},
+            {"summaryId": "s-3", "startTimeInSeconds": 1767398400, "overallSleepScore": None, "sleepScores": {"overall": {"value": 77}}},
+        ],
+    )
+    hrv = upsert_health_summaries(
+        session, 1, "hrv", [{"summaryId": "h-1", "startTimeInSeconds": 1767225600, "lastNightAvg": None, "hrvValues": None}]
+    )
+
+    assert sleeps["inserted"] == 3
+    assert hrv["inserted"] == 1
+    scores = {row.summary_id: row.sleep_score for row in session.query(GarminHealthData).filter_by(summary_type="sleeps")}
+    assert scores == {"s-1": None, "s-2": None, "s-3": 77}
+    assert session.query(GarminHealthData).filter_by(summary_type="hrv").one().hrv_last_night_avg is None
+
+
+def test_upsert_activity_summaries_routes_details_to_auxiliary_table():
+    session = _session()
+    detail = {
+        "summaryId": "a-1-detail",
+        "activityId": 42,
+        "summary": {"startTimeInSeconds": 1767225600, "durationInSeconds": 1800},
+        "samples": [],
+    }
+
+    stats = upsert_activity_summaries(session, 1, [detail, detail], "activityDetails")
+    assert stats == {"inserted": 1, "updated": 0, "skipped": 1}
+    stats = upsert_activity_summaries(session, 1, [detail], "activityDetails")
+    assert stats == {"inserted": 0, "updated": 1, "skipped": 0}
+
+    row = session.query(GarminActivityAuxiliaryData).one()
+    assert row.summary_type == "activityDetails"
+    assert row.start_time is not None
+    assert row.duration == 1800
+
+
+def test_activity_file_content_is_stored_as_deduplicated_chunks(monkeypatch):
+    import io
+
+    from app.tools import activity_file_store
+    from app.tools.activity_file_store import load_activity_file_content
+    from app.tools.garmin_client import write_activity_file_content
+
+    monkeypatch.setattr(activity_file_store, "FILE_CHUNK_SIZE", 4)
+    session = _session()
+    content = b"FIT-file-content"
+
+    write_activity_file_content(session, 1, {"summaryId": "f-1", "activityId": 42}, io.BytesIO(content), "application/fit")
+    write_activity_file_content(session, 1, {"summaryId": "f-2", "activityId": 43}, content)
+
+    assert session.query(GarminActivityFileChunk).count() == 4
+    rows = {row.summary_id: row.data for row in session.query(GarminActivityAuxiliaryData).all()}
+    assert "contentBase64" not in rows["f-1"]
+    assert rows["f-1"]["contentLength"] == len(content)
+    assert rows["f-1"]["contentHash"] == rows["f-2"]["contentHash"]
+    assert load_activity_file_content(session, rows["f-1"]) == content
+
+
+def test_resent_file_ping_keeps_the_stored_file_reference():
+    from app.tools.activity_file_store import load_activity_file_content
+    from app.tools.garmin_client import write_activity_auxiliary_data, write_activity_file_content
+
+    session = _session()
+    ping = {"summaryId": "f-1", "activityId": 42, "fileType": "FIT", "callbackURL": "https://example.test/file"}
+    write_activity_auxiliary_data(session, 1, "activityFiles", [ping])
+    write_activity_file_content(session, 1, ping, b"FIT-file-content", "application/fit")
+
+    # Garmin re-sends the ping; its metadata is stored again before the (failing) re-fetch.
+    write_activity_auxiliary_data(session, 1, "activityFiles", [dict(ping, callbackURL="https://example.test/again")])
+
+    row = session.query(GarminActivityAuxiliaryData).one()
+    assert row.data["callbackURL"] == "https://example.test/again"
+    assert row.data["contentType"] == "application/fit"
+    assert load_activity_file_content(session, row.data) == b"FIT-file-content"
+
+
+def test_file_chunks_tolerate_concurrent_writes_and_unreferenced_files_are_pruned(monkeypatch):
+    import hashlib
+    from datetime import timedelta
+
+    from app.tools import activity_file_store
+    from app.tools.activity_file_store import prune_activity_file_chunks
+    from app.tools.garmin_client import write_activity_file_content
+
+    monkeypatch.setattr(activity_file_store, "FILE_CHUNK_SIZE", 4)
+    session = _session()
+    write_activity_file_content(session, 1, {"summaryId": "f-1"}, b"first-content")
+    # A concurrent fetch of the other file already wrote one of its chunks: the insert skips it.
+    other = b"other-content"
+    other_hash = hashlib.sha256(other).hexdigest()
+    session.add(GarminActivityFileChunk(content_hash=other_hash, chunk_index=1, data=other[4:8]))
+    session.commit()
+    write_activity_file_content(session, 1, {"summaryId": "f-2"}, other)
+    assert session.query(GarminActivityFileChunk).filter(GarminActivityFileChunk.content_hash == other_hash).count() == 4
+
+    later = datetime.utcnow() + timedelta(hours=1)
+    assert prune_activity_file_chunks(session, now=later) == 0
+    # Garmin re-sends f-1 with the other content; the first file is no longer referenced.
+    write_activity_file_content(session, 1, {"summaryId": "f-1"}, other)
+    assert prune_activity_file_chunks(session) == 0  # within the grace period
+    assert prune_activity_file_chunks(session, now=later) == 1
+    assert {row.content_hash for row in session.query(GarminActivityFileChunk)} == {other_hash}
@@ -1,11 +1,14 @@
 """Regression tests for Garmin OAuth token storage."""
+import threading
+import time
 from datetime import datetime, timedelta
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from app.database.models import Base, GarminToken, UserProfile
-from app.tools.garmin_oauth import GarminOAuthService
+from app.tools.garmin_oauth import GarminOAuthService, invalidate_access_token
 
 
 def test_store_tokens_relinks_existing_garmin_account_to_current_user():
@@ -47,3 +50,61 @@ def test_store_tokens_relinks_existing_garmin_account_to_current_user():
     assert token.user_id == 100
     assert session.get(UserProfile, 200).garmin_user_id is None
     assert session.get(UserProfile, 100).garmin_user_id == "garmin-123"
+
+
+def test_access_token_is_cached_and_refreshed_once_for_concurrent_callers():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    session.add_all(
+        [
+            UserProfile(user_id=1, garmin_user_id="garmin-1"),
+            GarminToken(
+                user_id=1,
+                garmin_user_id="garmin-1",
+                access_token="encrypted:old-access",
+                refresh_token="encrypted:old-refresh",
+                expires_at=datetime.utcnow() + timedelta(minutes=5),
+                refresh_expires_at=datetime.utcnow() + timedelta(days=30),
+            ),
+        ]
+    )
+    session.commit()
+    invalidate_access_token(1)
+
+    refreshes = []
+    decrypts = []
+
+    def refresh(refresh_token):
+        refreshes.append(refresh_token)
+        time.sleep(0.05)
+        return {"access_token": "new-access", "refresh_token": "new-refresh", "expires_in": 3600}
+
+    def decrypt(token):
+        decrypts.append(token)
+        return token.removeprefix("encrypted:")
+
+    service = object.__new__(GarminOAuthService)
+    service.get_user_id = lambda _access_token: "garmin-1"
+    service.encrypt_token = lambda token: f"encrypted:{token}"
+    service.decrypt_token = decrypt
+    service.refresh_access_token = refresh
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(service.get_valid_access_token(Session(), 1)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["new-access"] * 5
+    assert refreshes == ["old-refresh"]
+    assert service.get_valid_access_token(session, 1) == "new-access"
+    assert decrypts == ["encrypted:old-refresh"]
+
+    service.delete_tokens(session, 1)
+    assert service.get_valid_access_token(session, 1) is None
@@ -0,0 +1,47 @@
+"""Tests for replica routing of read-only sessions."""
+from sqlalchemy import create_engine
+
+from app.database.database import RoutingSession, user_wrote_recently
+from app.database.models import Base, UserProfile
+
+
+def _engines():
+    primary = create_engine("sqlite:///:memory:")
+    replica = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(primary)
+    Base.metadata.create_all(replica)
+    return primary, replica
+
+
+def test_reads_use_replica_until_the_session_writes():
+    primary, replica = _engines()
+    session = RoutingSession(bind=primary, replica=replica)
+
+    assert session.get_bind() is replica
+    session.add(UserProfile(user_id=1))
+    session.commit()
+
+    # The write went to the primary, and later reads follow it there.
+    assert session.get_bind() is primary
+    assert session.query(UserProfile).count() == 1
+    assert RoutingSession(bind=primary, replica=replica).query(UserProfile).count() == 0
+
+
+def test_recent_ingest_keeps_user_reads_on_primary():
+    from sqlalchemy.orm import Session
+
+    from app.core.data_version import bump_data_version
+
+    primary, replica = _engines()
+    # The ingest commits through its own session, as another worker process would
+    writer = Session(bind=primary)
+    writer.add(UserProfile(user_id=7))
+    writer.commit()
+    bump_data_version(writer, 7)
+    writer.commit()
+
+    assert RoutingSession(bind=primary, replica=replica).for_user(7).get_bind() is primary
+    assert RoutingSession(bind=primary, replica=replica).for_user(8).get_bind() is replica
+    assert user_wrote_recently(primary, 7)
+    assert not user_wrote_recently(primary, 7, window_seconds=0)
+    assert RoutingSession(bind=primary).for_user(8).get_bind() is primary
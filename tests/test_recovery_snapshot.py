@@ -75,3 +75,141 @@ def test_metrics_hrv_trend_uses_nightly_history(monkeypatch):
 
     snapshot = build_live_recovery_snapshot(db, user_id=1, lookback_days=14, readiness_version="readiness_v4")
     assert snapshot["metrics"]["hrvTrend"] == [51, 54, 58]
+
+
+def _session():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.database.models import Base, UserProfile
+
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(UserProfile(user_id=1))
+    session.commit()
+    return session
+
+
+def _add_health(session, summary_type, summary_id, start_time, payload):
+    import json
+
+    from app.database.models import GarminHealthData
+
+    session.add(
+        GarminHealthData(
+            user_id=1,
+            summary_type=summary_type,
+            summary_id=summary_id,
+            start_time=start_time,
+            data=json.dumps(payload),
+        )
+    )
+    session.commit()
+
+
+def test_stored_snapshot_matches_live_and_follows_ingest():
+    from app.core.recovery_snapshot import load_recovery_snapshot, refresh_recovery_snapshot
+    from app.database.models import GarminActivityData, RecoverySnapshot
+
+    session = _session()
+    now = datetime.utcnow()
+    stress_start = int((now - timedelta(hours=1) - datetime(1970, 1, 1)).total_seconds())
+    _add_health(session, "sleeps", "sleep-1", now - timedelta(hours=9), {"calendarDate": "2026-03-20", "durationInSeconds": 28800})
+    _add_health(
+        session,
+        "stressDetails",
+        "stress-1",
+        now - timedelta(hours=1),
+        {"startTimeInSeconds": stress_start, "timeOffsetStressLevelValues": {"0": 30}, "timeOffsetBodyBatteryValues": {"0": 70}},
+    )
+    for days, value in [(1, 60), (2, 55), (20, 40)]:
+        _add_health(session, "hrv", f"hrv-{days}", now - timedelta(days=days), {"lastNightAvg": value})
+    session.add(
+        GarminActivityData(
+            user_id=1,
+            summary_id="a-1",
+            summary_type="activities",
+            activity_id="1",
+            activity_type="RUNNING",
+            start_time=now - timedelta(hours=5),
+            duration=3600,
+            average_heart_rate=150,
+            max_heart_rate=175,
+            data="{}",
+        )
+    )
+    session.commit()
+
+    stored = load_recovery_snapshot(session, 1, lookback_days=14, readiness_version="readiness_v4")
+    live = build_live_recovery_snapshot(session, 1, lookback_days=14, readiness_version="readiness_v4")
+    assert session.query(RecoverySnapshot).count() == 1
+    for snapshot in (stored, live):
+        snapshot["recent_training"]["sessions"][0].pop("hours_ago", None)
+        snapshot["metrics"]["recentTrainingSessions"][0].pop("hours_ago", None)
+        snapshot["metrics"]["hardestRecentActivity"].pop("hours_ago", None)
+        snapshot["scoreInputs"].pop("bodyBatteryCurrentAgeHours", None)
+        snapshot["score_model"]["inputs"].pop("bodyBatteryCurrentAgeHours", None)
+    assert stored == live
+    assert stored["metrics"]["hrvTrend"] == [55, 60]
+
+    _add_health(session, "sleeps", "sleep-2", now - timedelta(hours=2), {"calendarDate": "2026-03-21", "durationInSeconds": 25200})
+    assert load_recovery_snapshot(session, 1)["records"]["sleep"] == "sleep-1"
+    refresh_recovery_snapshot(session, 1, ["sleeps"])
+    refreshed = load_recovery_snapshot(session, 1)
+    assert refreshed["records"]["sleep"] == "sleep-2"
+    assert refreshed["records"]["stress"] == "stress-1"
+    assert refreshed["metrics"]["recentActivityCount48h"] == 1
+
+
+def test_concurrent_refreshes_of_different_sections_both_survive(tmp_path, monkeypatch):
+    import json
+    import threading
+    import time
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.core import recovery_snapshot
+    from app.database.models import Base, RecoverySnapshot, UserProfile
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'snapshot.db'}", connect_args={"timeout": 10})
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    session = session_factory()
+    session.add(UserProfile(user_id=1))
+    session.commit()
+    now = datetime.utcnow()
+    _add_health(session, "sleeps", "sleep-1", now - timedelta(hours=9), {"durationInSeconds": 28800})
+    _add_health(session, "stressDetails", "stress-1", now - timedelta(hours=3), {"timeOffsetStressLevelValues": {"0": 30}})
+    recovery_snapshot.refresh_recovery_snapshot(session, 1)
+    _add_health(session, "sleeps", "sleep-2", now - timedelta(hours=2), {"durationInSeconds": 25200})
+    _add_health(session, "stressDetails", "stress-2", now - timedelta(hours=1), {"timeOffsetStressLevelValues": {"0": 40}})
+
+    # The sleep refresh is slow, so the stress refresh runs while it is merging
+    record_entry = recovery_snapshot._record_entry
+
+    def slow_record_entry(record):
+        if record is not None and record.summary_type == "sleeps":
+            time.sleep(0.3)
+        return record_entry(record)
+
+    monkeypatch.setattr(recovery_snapshot, "_record_entry", slow_record_entry)
+
+    def refresh(summary_type):
+        db = session_factory()
+        try:
+            recovery_snapshot.refresh_recovery_snapshot(db, 1, [summary_type])
+        finally:
+            db.close()
+
+    sleep_thread = threading.Thread(target=refresh, args=("sleeps",))
+    sleep_thread.start()
+    time.sleep(0.1)
+    refresh("stressDetails")
+    sleep_thread.join()
+
+    session.expire_all()
+    records = json.loads(session.query(RecoverySnapshot).one().inputs)["records"]
+    assert records["sleeps"]["summary_id"] == "sleep-2"
+    assert records["stressDetails"]["summary_id"] == "stress-2"
@@ -0,0 +1,62 @@
+"""Tests for ETag validation and caching of Garmin read responses."""
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from app.core.data_version import get_data_version
+from app.core.garmin_ingest import upsert_health_summaries
+from app.core.response_cache import cached_response, response_cache
+from app.database.models import Base, UserProfile
+
+
+def _session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(UserProfile(user_id=1))
+    session.commit()
+    return session
+
+
+def _request(etag=None):
+    headers = [(b"if-none-match", etag.encode())] if etag else []
+    return Request({"type": "http", "method": "GET", "path": "/garmin/recovery", "headers": headers})
+
+
+def test_etag_revalidates_and_changes_after_ingest():
+    response_cache.clear()
+    session = _session()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {"build": len(builds)}
+
+    def call(etag=None, params=None):
+        return cached_response(
+            _request(etag), session, 1, "recovery", params or {"lookback_days": 14}, build, freshness_seconds=300
+        )
+
+    first = call()
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.body == b'{"build":1}'
+
+    assert call(etag).status_code == 304
+    assert call(f'W/{etag}, "other"').status_code == 304
+    assert call().body == b'{"build":1}'
+    assert call(params={"lookback_days": 7}).body == b'{"build":2}'
+    assert len(builds) == 2
+
+    upsert_health_summaries(
+        session,
+        1,
+        "dailies",
+        [{"summaryId": "d-1", "calendarDate": "2026-01-01", "startTimeInSeconds": 1767225600, "steps": 10}],
+    )
+    assert get_data_version(session, 1) == 1
+
+    fresh = call(etag)
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+    assert fresh.body == b'{"build":3}'
@@ -0,0 +1,116 @@
+"""Tests for the shared activityDetails sample decoder."""
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.garmin import _build_activity_detail_index
+from app.core import detail_segments
+from app.core.detail_segments import detail_segments_for, extract_detail_segments
+from app.core.garmin_ingest import upsert_auxiliary_summaries
+from app.core.payload_memo import payload_memo
+from app.core.sample_columns import decode_detail_samples, split_sorted
+from app.database.models import Base, GarminActivityAuxiliaryData, UserProfile
+from app.tools.activity_analysis import _response_blocks, _sample_series
+
+
+def _detail(seconds=1500, laps=None):
+    samples = [
+        {
+            "startTimeInSeconds": 1_000 + second,
+            "heartRate": 120 + (second % 30),
+            "speedMetersPerSecond": 3.0,
+            "totalDistanceInMeters": second * 3.0,
+        }
+        for second in range(0, seconds, 5)
+    ]
+    samples.reverse()  # Garmin does not guarantee ordering
+    samples.append({"heartRate": 150})  # no timestamp: ignored
+    return {"activityType": "RUNNING", "samples": samples, "laps": laps or []}
+
+
+def test_decode_sorts_once_and_memoises_per_payload():
+    detail = _detail()
+
+    with payload_memo():
+        columns = decode_detail_samples(detail)
+
+        assert len(columns) == 300
+        assert list(columns.start) == sorted(columns.start)
+        assert columns.elapsed[0] == 0.0
+        assert decode_detail_samples(detail) is columns
+    # Nothing outlives the scope.
+    assert decode_detail_samples(detail) is not columns
+
+
+def test_payload_memo_decodes_each_detail_once_per_scope():
+    details = [_detail(seconds=300) for _ in range(70)]
+
+    with payload_memo() as memo:
+        for _ in range(2):
+            for detail in details:
+                detail_segments_for(detail, "RUNNING")
+        first = detail_segments_for(details[0], "RUNNING")
+        first[0]["source"] = "edited"
+
+        assert detail_segments_for(details[0], "RUNNING")[0]["source"] == "sample_window"
+
+    # One segment computation and one sample decode per detail; everything else is reused.
+    assert memo.misses == 2 * len(details)
+    assert memo.hits == len(details) + 2
+
+
+def test_split_sorted_matches_half_open_ranges():
+    keys = [0.0, 1.0, 1.0, 2.0, 5.0]
+
+    assert split_sorted(keys, [0.0, 1.0, 2.0, 6.0]) == [(0, 1), (1, 3), (3, 5)]
+
+
+def test_segments_use_lap_and_bucket_splits():
+    bucketed = detail_segments_for(_detail(), "RUNNING")
+    assert [segment["sample_count"] for segment in bucketed] == [60] * 5
+    assert {segment["source"] for segment in bucketed} == {"sample_window"}
+
+    lapped = detail_segments_for(
+        _detail(laps=[{"startTimeInSeconds": 1_000}, {"startTimeInSeconds": 1_600}]),
+        "RUNNING",
+    )
+    assert [segment["sample_count"] for segment in lapped] == [120, 180]
+
+
+def test_response_blocks_split_series_at_laps():
+    detail = _detail(laps=[{"startTimeInSeconds": 1_000}, {"startTimeInSeconds": 1_600}])
+    series = _sample_series(None, detail, "RUNNING")
+
+    blocks = _response_blocks(series, detail)
+
+    assert [len(block) for block in blocks] == [120, 180]
+
+
+def test_segments_stored_at_ingest_match_extraction_per_sport(monkeypatch):
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(UserProfile(user_id=1))
+    session.commit()
+
+    detail = _detail(seconds=900)
+    for sample in detail["samples"]:
+        if 1_300 <= sample.get("startTimeInSeconds", 0) < 1_600:  # standing still
+            sample["speedMetersPerSecond"] = None
+            sample["totalDistanceInMeters"] = 900.0
+    detail["summaryId"] = "d-1"
+    del detail["activityType"]
+    upsert_auxiliary_summaries(session, 1, "activityDetails", [detail])
+    record = session.query(GarminActivityAuxiliaryData).one()
+    assert record.segments["version"] == 1
+
+    stored_detail = record.data
+    expected = {sport: extract_detail_segments(stored_detail, sport) for sport in ["RUNNING", "SWIMMING"]}
+    assert len(expected["SWIMMING"]) == len(expected["RUNNING"]) + 1
+
+    def no_extraction(*args):
+        raise AssertionError("stored segments should be used")
+
+    monkeypatch.setattr(detail_segments, "extract_detail_segments", no_extraction)
+    index = _build_activity_detail_index([record])
+    for sport, segments in expected.items():
+        assert detail_segments_for(index["d-1"], sport, index) == segments
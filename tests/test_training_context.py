@@ -0,0 +1,98 @@
+"""Tests for the materialized training context."""
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.data_version import bump_data_version
+from app.core.garmin_ingest import upsert_activity_summaries
+from app.core.training_context import build_training_context, get_training_context, refresh_training_contexts
+from app.database.models import Base, GarminActivityData, UserProfile
+
+
+def _session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(UserProfile(user_id=1))
+    session.commit()
+    return session
+
+
+def _add_activity(session, summary_id):
+    session.add(
+        GarminActivityData(
+            user_id=1,
+            summary_id=summary_id,
+            activity_type="RUNNING",
+            start_time=datetime.utcnow(),
+            data="{}",
+        )
+    )
+    bump_data_version(session, 1)
+    session.commit()
+
+
+def test_context_is_reused_until_activity_data_changes():
+    session = _session()
+    builds = []
+
+    def builder(db, user_id, days, current_days):
+        builds.append((user_id, days, current_days))
+        return {"period_days": days, "activities": db.query(GarminActivityData).count()}
+
+    _add_activity(session, "a-1")
+    first = get_training_context(session, 1, 120, 7, builder)
+    second = get_training_context(session, 1, 120, 7, builder)
+    assert first == second == {"period_days": 120, "activities": 1}
+    assert len(builds) == 1
+
+    _add_activity(session, "a-2")
+    assert get_training_context(session, 1, 120, 7, builder)["activities"] == 2
+    assert len(builds) == 2
+
+
+def test_refresh_rebuilds_stored_windows_only():
+    session = _session()
+    builds = []
+
+    def builder(db, user_id, days, current_days):
+        builds.append(days)
+        return {"period_days": days}
+
+    assert refresh_training_contexts(session, 1, builder) == 0
+    get_training_context(session, 1, 90, 7, builder)
+    _add_activity(session, "a-1")
+
+    assert refresh_training_contexts(session, 1, builder) == 1
+    get_training_context(session, 1, 90, 7, builder)
+    assert builds == [90, 90]
+
+
+def test_default_builder_serves_the_training_profile_shape():
+    session = _session()
+    start = datetime.utcnow() - timedelta(days=1)
+    upsert_activity_summaries(
+        session,
+        1,
+        [
+            {
+                "summaryId": "a-1",
+                "activityId": 1001,
+                "activityType": "RUNNING",
+                "activityName": "Easy run",
+                "startTimeInSeconds": int((start - datetime(1970, 1, 1)).total_seconds()),
+                "durationInSeconds": 2400,
+                "distanceInMeters": 7000,
+                "averageHeartRateInBeatsPerMinute": 140,
+            }
+        ],
+    )
+
+    built = build_training_context(session, 1, 120, 7)
+    stored = get_training_context(session, 1, 120, 7)
+    assert json.loads(json.dumps(built, default=str)) == {**stored, "generated_at": built["generated_at"]}
+    assert built["sport_baselines"]["RUNNING"]["current"]["sessions"] == 1
+    assert built["dominant_sport"] == "RUNNING"
+    assert built["method"]["activity_details"] == 0
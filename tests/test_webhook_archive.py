@@ -0,0 +1,95 @@
+"""Tests for the compressed Garmin webhook payload archive."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.webhook_archive import (
+    archive_webhook_payload,
+    load_webhook_payload,
+    prune_webhook_payloads,
+    summarize_webhook_payload,
+)
+from app.database.models import Base, GarminWebhookEvent, GarminWebhookPayload
+
+
+def _session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+def test_identical_payloads_share_one_compressed_row():
+    session = _session()
+    payload = {"dailies": [{"summaryId": f"d-{index}", "steps": 1000} for index in range(200)]}
+
+    first = archive_webhook_payload(session, payload)
+    second = archive_webhook_payload(session, {"dailies": list(payload["dailies"])})
+    session.commit()
+
+    assert first == second
+    archived = session.query(GarminWebhookPayload).one()
+    assert len(archived.body) < archived.size_bytes / 5
+    event = GarminWebhookEvent(source="health", payload_hash=first)
+    legacy = GarminWebhookEvent(source="health", payload='{"epochs": []}')
+    assert load_webhook_payload(session, event) == payload
+    assert load_webhook_payload(session, legacy) == {"epochs": []}
+
+
+def test_prune_drops_old_processed_payloads_but_keeps_events_and_replayable_ones():
+    session = _session()
+    old = datetime.utcnow() - timedelta(days=10)
+    processed_hash = archive_webhook_payload(session, {"dailies": [{"summaryId": "a"}]})
+    failed_hash = archive_webhook_payload(session, {"dailies": [{"summaryId": "b"}]})
+    session.add_all(
+        [
+            GarminWebhookEvent(source="health", status="processed", item_count=1, payload_hash=processed_hash, created_at=old),
+            GarminWebhookEvent(source="health", status="failed", item_count=1, payload_hash=failed_hash, created_at=old),
+            GarminWebhookEvent(source="health", status="processed", item_count=1, payload='{"sleeps": []}', created_at=old),
+        ]
+    )
+    session.commit()
+
+    later = datetime.utcnow() + timedelta(hours=1)  # past the grace of the rows archived above
+    assert prune_webhook_payloads(session, retention_days=7, now=later) == 2
+
+    events = session.query(GarminWebhookEvent).order_by(GarminWebhookEvent.id).all()
+    assert [(event.status, event.item_count, event.payload_hash) for event in events] == [
+        ("processed", 1, None),
+        ("failed", 1, failed_hash),
+        ("processed", 1, None),
+    ]
+    assert events[2].payload is None
+    assert [row.content_hash for row in session.query(GarminWebhookPayload)] == [failed_hash]
+
+
+def test_prune_keeps_rows_reused_by_events_not_yet_committed():
+    session = _session()
+    payload = {"dailies": [{"summaryId": "a"}]}
+    content_hash = archive_webhook_payload(session, payload)
+    session.commit()
+    later = datetime.utcnow() + timedelta(hours=1)
+    assert prune_webhook_payloads(session, retention_days=0, now=later) == 0
+    assert session.query(GarminWebhookPayload).count() == 0
+
+    archive_webhook_payload(session, payload)
+    session.commit()
+    session.query(GarminWebhookPayload).update({"created_at": datetime.utcnow() - timedelta(days=30)})
+    session.commit()
+    # A re-delivery reuses the old row; its event is not committed when prune runs.
+    assert archive_webhook_payload(session, payload) == content_hash
+    session.commit()
+    prune_webhook_payloads(session, retention_days=0)
+
+    assert [row.content_hash for row in session.query(GarminWebhookPayload)] == [content_hash]
+
+
+def test_log_summary_is_bounded():
+    payload = {f"type{index}": [{}] * index for index in range(20)}
+
+    summary = summarize_webhook_payload(payload, 123)
+
+    assert summary.startswith("type0=0, type1=1")
+    assert "+12 more types" in summary
+    assert summary.endswith("123 bytes")
+    assert len(summary) < 200
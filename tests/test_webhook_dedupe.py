@@ -0,0 +1,72 @@
+"""Tests for skipping re-delivered Garmin webhook items."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.garmin import _create_webhook_event, process_health_webhook_event
+from app.core.garmin_import import invalidate_garmin_user
+from app.core.webhook_dedupe import item_fingerprint
+from app.database.models import Base, GarminHealthData, GarminToken, UserProfile
+
+
+def _session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all(
+        [
+            UserProfile(user_id=1, garmin_user_id="garmin-dedupe"),
+            GarminToken(
+                user_id=1,
+                garmin_user_id="garmin-dedupe",
+                access_token="a",
+                refresh_token="r",
+                expires_at=datetime.utcnow() + timedelta(hours=1),
+                refresh_expires_at=datetime.utcnow() + timedelta(days=30),
+            ),
+        ]
+    )
+    session.commit()
+    invalidate_garmin_user("garmin-dedupe")
+    return session
+
+
+def _daily(summary_id, steps):
+    return {
+        "userId": "garmin-dedupe",
+        "summaryId": summary_id,
+        "calendarDate": "2026-01-01",
+        "startTimeInSeconds": 1767225600,
+        "steps": steps,
+    }
+
+
+def test_ping_fingerprint_ignores_the_delivery_token():
+    first = {"callbackURL": "https://apis.garmin.com/wellness-api/rest/dailies?uploadStartTimeInSeconds=1&uploadEndTimeInSeconds=2&token=a"}
+    retry = {"callbackURL": "https://apis.garmin.com/wellness-api/rest/dailies?token=b&uploadEndTimeInSeconds=2&uploadStartTimeInSeconds=1"}
+    other = {"callbackURL": "https://apis.garmin.com/wellness-api/rest/dailies?uploadStartTimeInSeconds=2&uploadEndTimeInSeconds=3&token=a"}
+
+    assert item_fingerprint("dailies", first) == item_fingerprint("dailies", retry)
+    assert item_fingerprint("dailies", first) != item_fingerprint("dailies", other)
+    assert item_fingerprint("dailies", first) != item_fingerprint("epochs", first)
+
+
+def test_redelivered_push_items_are_skipped_and_counted():
+    session = _session()
+
+    first = _create_webhook_event(session, "health", {"dailies": [_daily("d-1", 10), _daily("d-1", 10)]})
+    process_health_webhook_event(session, first)
+    assert first.status == "processed"
+    assert first.skipped_count == 1  # same item twice in one delivery
+
+    retry = _create_webhook_event(session, "health", {"dailies": [_daily("d-1", 10)]})
+    assert retry.status == "duplicate"
+    assert retry.skipped_count == 1
+    assert retry.payload_hash is None
+
+    overlap = _create_webhook_event(session, "health", {"dailies": [_daily("d-1", 10), _daily("d-1", 25)]})
+    assert overlap.status == "received"
+    process_health_webhook_event(session, overlap)
+    assert overlap.skipped_count == 1
+    assert session.query(GarminHealthData).one().data["steps"] == 25
@@ -0,0 +1,189 @@
+"""Tests for the in-process Garmin webhook queue."""
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.webhook_queue import RetryPolicy, WebhookQueue, prune_webhook_events
+from app.database.models import Base, GarminWebhookEvent
+
+
+def _queue_with_event(status="received"):
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    session = session_factory()
+    event = GarminWebhookEvent(source="health", status=status, payload="{}")
+    session.add(event)
+    session.commit()
+    return WebhookQueue(session_factory, workers=1, maxsize=10), session_factory, event.id
+
+
+def test_process_event_claims_and_runs_registered_processor():
+    queue, session_factory, event_id = _queue_with_event()
+    seen = []
+
+    def processor(db, event):
+        seen.append(event.status)
+        event.status = "processed"
+        db.commit()
+
+    queue.register("health", processor)
+    queue.process_event(event_id)
+    queue.process_event(event_id)
+
+    assert seen == ["processing"]
+    assert session_factory().get(GarminWebhookEvent, event_id).status == "processed"
+
+
+def test_process_event_marks_failed_when_processor_raises():
+    queue, session_factory, event_id = _queue_with_event()
+
+    def processor(db, event):
+        raise RuntimeError("callback exploded")
+
+    queue.register("health", processor)
+    queue.process_event(event_id)
+
+    event = session_factory().get(GarminWebhookEvent, event_id)
+    assert event.status == "failed"
+    assert "callback exploded" in event.error
+
+
+def test_enqueue_starts_workers_and_drains_queue():
+    queue, session_factory, event_id = _queue_with_event()
+    processed = []
+    queue.register("health", lambda db, event: processed.append(event.id))
+
+    async def run():
+        await queue.enqueue(event_id)
+        await queue._queue.join()
+        await queue.stop()
+
+    asyncio.run(run())
+    assert processed == [event_id]
+
+
+def test_events_that_overflow_the_queue_are_swept_in_without_a_restart(tmp_path, monkeypatch):
+    from app.core import webhook_queue
+
+    monkeypatch.setattr(webhook_queue, "RECOVER_POLL_INTERVAL", timedelta(milliseconds=20))
+    engine = create_engine(f"sqlite:///{tmp_path / 'events.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    session = session_factory()
+    events = [GarminWebhookEvent(source="health", status="received", payload="{}") for _ in range(6)]
+    stale = GarminWebhookEvent(
+        source="health", status="processing", payload="{}", updated_at=datetime.utcnow() - timedelta(hours=1)
+    )
+    session.add_all(events + [stale])
+    session.commit()
+    queue = WebhookQueue(session_factory, workers=1, maxsize=2)
+    processed = []
+
+    def processor(db, event):
+        processed.append(event.id)
+        event.status = "processed"
+        db.commit()
+
+    queue.register("health", processor)
+
+    async def run():
+        accepted = [await queue.enqueue(event.id) for event in events]
+        assert accepted.count(False) == 4
+        for _ in range(200):
+            if len(processed) == 7:
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+
+    asyncio.run(run())
+    assert sorted(processed) == sorted([event.id for event in events] + [stale.id])
+
+
+def test_prune_deletes_only_finished_events_past_retention():
+    _, session_factory, pending_id = _queue_with_event()
+    session = session_factory()
+    old = datetime.utcnow() - timedelta(days=40)
+    session.add_all(
+        [
+            GarminWebhookEvent(source="health", status="processed", payload="{}", created_at=old),
+            GarminWebhookEvent(source="health", status="failed", payload="{}", created_at=old),
+            GarminWebhookEvent(source="health", status="processed", payload="{}"),
+        ]
+    )
+    session.query(GarminWebhookEvent).filter(GarminWebhookEvent.id == pending_id).update({"created_at": old})
+    session.commit()
+
+    assert prune_webhook_events(session, retention_days=0) == 0
+    assert prune_webhook_events(session, retention_days=30) == 2
+    assert sorted(status for (status,) in session.query(GarminWebhookEvent.status)) == ["processed", "received"]
+
+
+def test_failed_events_are_retried_with_backoff_then_dead_lettered():
+    _, session_factory, event_id = _queue_with_event()
+    queue = WebhookQueue(session_factory, workers=1, maxsize=10, retry=RetryPolicy(max_attempts=2, base_seconds=60))
+    runs = []
+
+    def processor(db, event):
+        runs.append(event.attempts)
+        event.status = "partial"
+        db.commit()
+
+    queue.register("health", processor)
+    queue.process_event(event_id)
+    session = session_factory()
+    event = session.get(GarminWebhookEvent, event_id)
+    assert (event.status, event.attempts) == ("partial", 0)
+    assert timedelta(seconds=50) < event.next_attempt_at - datetime.utcnow() <= timedelta(seconds=60)
+
+    assert asyncio.run(queue.retry_due()) == 0  # not due yet
+    for expected_delay in (120, None):
+        session.query(GarminWebhookEvent).update({"next_attempt_at": datetime.utcnow() - timedelta(seconds=1)})
+        session.commit()
+        assert asyncio.run(queue.retry_due()) == 1
+        session.expire_all()
+        event = session.get(GarminWebhookEvent, event_id)
+        if expected_delay is None:
+            assert (event.status, event.next_attempt_at) == ("dead_letter", None)
+        else:
+            assert event.status == "partial"
+            assert event.next_attempt_at - datetime.utcnow() > timedelta(seconds=expected_delay - 10)
+
+    assert runs == [0, 1, 2]
+    assert asyncio.run(queue.retry_due()) == 0
+
+
+def test_retries_run_users_in_parallel_and_each_user_in_order(tmp_path):
+    # A file database: parallel retries use one connection per thread
+    engine = create_engine(f"sqlite:///{tmp_path / 'events.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    session = session_factory()
+    events = [GarminWebhookEvent(source="health", status="failed", payload="{}", user_id=user_id) for user_id in (1, 2, 1, 2)]
+    expired = GarminWebhookEvent(source="health", status="failed", payload="{}", created_at=datetime.utcnow() - timedelta(days=4))
+    session.add_all(events + [expired])
+    session.commit()
+    ids = [event.id for event in events]
+    queue = WebhookQueue(session_factory, workers=1, maxsize=10, retry=RetryPolicy(concurrency=2))
+    order = []
+
+    def processor(db, event):
+        order.append((event.user_id, event.id))
+        event.status = "processed"
+        db.commit()
+
+    queue.register("health", processor)
+    assert asyncio.run(queue.retry_due()) == 4
+
+    assert [event_id for user_id, event_id in order if user_id == 1] == [ids[0], ids[2]]
+    assert [event_id for user_id, event_id in order if user_id == 2] == [ids[1], ids[3]]
+    session.expire_all()
+    assert [event.status for event in events] == ["processed"] * 4
+    assert expired.status == "dead_letter"
@@ -27,6 +27,7 @@ export type ActivitiesResponse = {
   activities: GarminActivity[];
   count: number;
   period_days: number;
+  next_cursor: string | null;
   summary: {
     sessions: number;
     distance_meters: number;